@@ -1,30 +1,39 @@
 """E-shop module containing Product, ShoppingCart, Order, and Shipment classes."""
 
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Mapping
+from array import array
+from bisect import bisect_left, bisect_right
+import asyncio
+import heapq
+from operator import ge, mul
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import MappingProxyType
 from services import ShippingService
+from services.metrics import timed
 
 
-class Product:
-    """Represents a product in the store."""
+class BaseProduct:
+    """Product behaviour shared by stored products and catalog views."""
 
-    def __init__(self, name, price, available_amount):
-        """Initialize product with name, price and available quantity."""
-        self.name = name
-        self.price = price
-        self.available_amount = available_amount
+    __slots__ = ()
+    name: str
+    price: Decimal
+    available_amount: int
 
     def is_available(self, requested_amount):
         """Check if requested amount is available."""
         return self.available_amount >= requested_amount
 
-    def buy(self, requested_amount):
+    def buy(self, requested_amount, inventory=None):
         """Purchase requested amount of product if available."""
-        if not self.is_available(requested_amount):
-            raise ValueError(f"Not enough {self.name} available")
-        self.available_amount -= requested_amount
+        (inventory or _COMMITTING.get() or INVENTORY).buy(self, requested_amount)
 
     def __eq__(self, other):
         """Check equality by name."""
@@ -43,43 +52,473 @@ class Product:
         return self.name
 
 
+class Product(BaseProduct):
+    """Represents a product in the store."""
+
+    def __init__(self, name, price, available_amount):
+        """Initialize product with name, price and available quantity."""
+        self.name = name
+        self.price = price
+        self.available_amount = available_amount
+
+
+class CatalogProduct(BaseProduct):
+    """Product view backed by one row of a catalog's arrays."""
+
+    __slots__ = ("catalog", "row")
+
+    def __init__(self, catalog, row):
+        """Initialize a view of the given catalog row."""
+        self.catalog = catalog
+        self.row = row
+
+    @property
+    def name(self):
+        """Product name stored in the catalog."""
+        return self.catalog.names[self.row]
+
+    @property
+    def price(self) -> Decimal:
+        """Exact product price stored in the catalog."""
+        return Decimal(self.catalog.cents[self.row]).scaleb(-2)
+
+    @price.setter
+    def price(self, value):
+        """Update the price in the catalog."""
+        self.catalog.set_price(self.name, value)
+
+    @property
+    def available_amount(self):
+        """Available quantity stored in the catalog."""
+        return self.catalog.stock[self.row]
+
+    @available_amount.setter
+    def available_amount(self, value):
+        """Update the available quantity in the catalog."""
+        self.catalog.stock[self.row] = value
+
+
+def to_cents(price) -> int:
+    """Convert a price to a whole number of cents, rejecting fractions of a cent."""
+    cents = to_decimal(price).scaleb(2)
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Price {price} has fractions of a cent")
+    return int(cents)
+
+
+class Catalog:
+    """Stores products in contiguous arrays with name and price indexes."""
+
+    def __init__(self, products: Iterable[BaseProduct] = ()):
+        """Initialize the catalog, optionally loading existing products."""
+        self.names: List[str] = []
+        self.cents = array("q")
+        self.stock = array("q")
+        self._rows: Dict[str, int] = {}
+        self._price_index = None
+        for product in products:
+            self.add(product.name, product.price, product.available_amount)
+
+    def __len__(self):
+        """Return the number of products."""
+        return len(self.names)
+
+    def __contains__(self, name):
+        """Check if a product with the name is in the catalog."""
+        return str(name) in self._rows
+
+    def __getitem__(self, name) -> CatalogProduct:
+        """Return a view of the product with the given name."""
+        return CatalogProduct(self, self._rows[str(name)])
+
+    def __iter__(self) -> Iterator[CatalogProduct]:
+        """Iterate over views of all products."""
+        return (CatalogProduct(self, row) for row in range(len(self.names)))
+
+    def add(self, name, price, available_amount) -> CatalogProduct:
+        """Add a product or replace the price and stock of an existing one."""
+        name = str(name)
+        row = self._rows.get(name)
+        if row is None:
+            row = self._rows[name] = len(self.names)
+            self.names.append(name)
+            self.cents.append(to_cents(price))
+            self.stock.append(available_amount)
+        else:
+            self.cents[row] = to_cents(price)
+            self.stock[row] = available_amount
+        self._price_index = None
+        return CatalogProduct(self, row)
+
+    def set_price(self, name, price):
+        """Change the price of a product."""
+        self.cents[self._rows[str(name)]] = to_cents(price)
+        self._price_index = None
+
+    def in_price_range(self, low=float("-inf"), high=float("inf")) -> List[CatalogProduct]:
+        """Return products priced between low and high inclusive, cheapest first."""
+        if self._price_index is None:
+            rows = sorted(range(len(self.cents)), key=self.cents.__getitem__)
+            self._price_index = (array("q", (self.cents[row] for row in rows)), array("q", rows))
+        sorted_cents, rows = self._price_index
+        start = bisect_left(sorted_cents, to_decimal(low).scaleb(2))
+        end = bisect_right(sorted_cents, to_decimal(high).scaleb(2))
+        return [CatalogProduct(self, row) for row in rows[start:end]]
+
+    def compile(self, cart: Mapping):
+        """Resolve a cart of names or products to arrays of rows and amounts."""
+        rows = self._rows
+        return (
+            array("q", [rows[key if isinstance(key, str) else str(key.name)] for key in cart]),
+            array("q", cart.values()),
+        )
+
+    def _compiled(self, carts: Iterable):
+        """Yield carts as row and amount arrays, compiling mappings on the fly."""
+        for cart in carts:
+            yield cart if isinstance(cart, tuple) else self.compile(cart)
+
+    def are_available(self, carts: Iterable) -> List[bool]:
+        """Check for each cart whether every line is in stock."""
+        stock = self.stock.__getitem__
+        return [
+            all(map(ge, map(stock, rows), amounts)) for rows, amounts in self._compiled(carts)
+        ]
+
+    def totals(self, carts: Iterable) -> List[Decimal]:
+        """Calculate the exact total price of each cart."""
+        cents = self.cents.__getitem__
+        return [
+            Decimal(sum(map(mul, map(cents, rows), amounts))).scaleb(-2)
+            for rows, amounts in self._compiled(carts)
+        ]
+
+
+class CartLine:
+    """Compact cart line holding a product, its amount and the unit price."""
+
+    __slots__ = ("product", "amount", "unit_price")
+
+    def __init__(self, product: BaseProduct, amount: int, unit_price: Decimal):
+        """Initialize the line with the price captured when it was added."""
+        self.product = product
+        self.amount = amount
+        self.unit_price = unit_price
+
+    @property
+    def subtotal(self) -> Decimal:
+        """Exact price of the line."""
+        return self.unit_price * self.amount
+
+    def to_list(self) -> List:
+        """Return the line as a JSON-serializable [name, amount, unit price] list."""
+        return [self.product.name, self.amount, str(self.unit_price)]
+
+
+def to_decimal(value) -> Decimal:
+    """Convert a price to Decimal without picking up binary float artifacts."""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
 class ShoppingCart:
-    """Represents a shopping cart containing products."""
+    """Represents a shopping cart containing products.
 
-    products: Dict[Product, int]
+    Each line keeps the unit price captured when the product was added, so
+    later price changes do not affect the cart total until the product is
+    added again.
+    """
 
-    def __init__(self):
-        """Initialize empty shopping cart."""
-        self.products = {}
+    def __init__(self, inventory=None):
+        """Initialize empty shopping cart, optionally backed by a shared inventory."""
+        self.lines: Dict[str, CartLine] = {}
+        self.inventory = inventory
+        self._total = Decimal(0)
+
+    def __len__(self):
+        """Return the number of lines in the cart."""
+        return len(self.lines)
+
+    @property
+    def products(self) -> Mapping[BaseProduct, int]:
+        """Read-only view of the products in the cart mapped to their amounts.
+
+        Use add_product, remove_product or assign the whole mapping to change
+        the cart.
+        """
+        return MappingProxyType({line.product: line.amount for line in self.lines.values()})
+
+    @products.setter
+    def products(self, products: Mapping):
+        """Replace the cart content without availability checks."""
+        self.clear()
+        for product, amount in products.items():
+            self._set_line(product, amount)
 
     def contains_product(self, product):
         """Check if product is in cart."""
-        return product in self.products
+        return product.name in self.lines
 
     def calculate_total(self):
-        """Calculate total price of products in cart."""
-        return sum(p.price * count for p, count in self.products.items())
+        """Return the running total of products in cart."""
+        return self._total
 
-    def add_product(self, product: Product, amount: int):
+    def add_product(self, product: BaseProduct, amount: int):
         """Add product to cart if available in required amount."""
-        if not product.is_available(amount):
-            raise ValueError(f"Product {product} has only {product.available_amount} items")
-        self.products[product] = amount
+        self._check_available(product, amount)
+        self._set_line(product, amount)
+
+    def add_products(self, products: Mapping):
+        """Add several products, or none if any of them is unavailable."""
+        for product, amount in products.items():
+            self._check_available(product, amount)
+        for product, amount in products.items():
+            self._set_line(product, amount)
 
     def remove_product(self, product):
         """Remove product from cart."""
-        if product in self.products:
-            del self.products[product]
-
-    def submit_cart_order(self):
-        """Buy all products and return their IDs."""
-        product_ids = []
-        for product, count in self.products.items():
-            product.buy(count)
-            product_ids.append(str(product))
-        self.products.clear()
+        line = self.lines.pop(product.name, None)
+        if line is not None:
+            self._total -= line.subtotal
+
+    def remove_products(self, products: Iterable[BaseProduct]):
+        """Remove several products from cart."""
+        for product in products:
+            self.remove_product(product)
+
+    def clear(self):
+        """Remove all products from cart."""
+        self.lines.clear()
+        self._total = Decimal(0)
+
+    def snapshot(self) -> Dict:
+        """Return a JSON-serializable copy of the cart for session storage."""
+        return {
+            "lines": [line.to_list() for line in self.lines.values()],
+            "total": str(self._total),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict, products: Mapping, inventory=None):
+        """Rebuild a cart from a snapshot, resolving names through products."""
+        cart = cls(inventory)
+        for name, amount, unit_price in snapshot["lines"]:
+            line = cart.lines[name] = CartLine(products[name], amount, Decimal(unit_price))
+            cart._total += line.subtotal
+        return cart
+
+    def submit_cart_order(self, inventory=None):
+        """Buy all products or none of them and return their IDs."""
+        inventory = inventory or self.inventory or INVENTORY
+        product_ids = inventory.checkout(self.products)
+        self.clear()
         return product_ids
 
+    def _check_available(self, product, amount):
+        """Raise if the amount of product cannot be added."""
+        if self.inventory is not None:
+            if not self.inventory.is_available(product, amount):
+                raise ValueError(f"Product {product} is not available in amount {amount}")
+        elif not product.is_available(amount):
+            raise ValueError(f"Product {product} has only {product.available_amount} items")
+
+    def _set_line(self, product, amount):
+        """Set the amount of a line and adjust the running total."""
+        self.remove_product(product)
+        line = self.lines[product.name] = CartLine(product, amount, to_decimal(product.price))
+        self._total += line.subtotal
+
+
+@dataclass
+class Reservation:
+    """Stock held for a cart until it is committed, released or expires."""
+
+    reservation_id: str
+    items: Dict[BaseProduct, int]
+    expires_at: float
+
+    def __lt__(self, other):
+        """Order reservations by expiry time."""
+        return self.expires_at < other.expires_at
+
+
+class _Stripe:
+    """Lock guarding a subset of products together with their reserved amounts."""
+
+    def __init__(self):
+        """Initialize an unlocked stripe without reservations."""
+        self.lock = threading.RLock()
+        self.reserved = {}
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self):
+        """Acquire the stripe lock and record whether it had to wait."""
+        if not self.lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            started = time.perf_counter()
+            self.lock.acquire()  # pylint: disable=consider-using-with
+            self.contended += 1
+            self.wait_seconds += time.perf_counter() - started
+        self.acquisitions += 1
+
+    def release(self):
+        """Release the stripe lock."""
+        self.lock.release()
+
+
+class InventoryReservationEngine:
+    """Reserves stock for several products at once under striped locks."""
+
+    def __init__(self, stripes: int = 64, reservation_timeout: float = 300.0,
+                 clock=time.monotonic):
+        """Initialize the engine with a fixed number of lock stripes."""
+        self.reservation_timeout = reservation_timeout
+        self._clock = clock
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._active = {}
+        self._expiry = []
+        self._state_lock = threading.Lock()
+        self._counters = {"reserved": 0, "committed": 0, "released": 0, "expired": 0, "rejected": 0}
+
+    def _stripe(self, product):
+        """Return the stripe that guards the product."""
+        return self._stripes[hash(product) % len(self._stripes)]
+
+    @contextmanager
+    def locked(self, products: Iterable[BaseProduct]):
+        """Hold the stripes of all products, acquired in a fixed order."""
+        indexes = sorted({hash(product) % len(self._stripes) for product in products})
+        acquired = []
+        try:
+            for index in indexes:
+                self._stripes[index].acquire()
+                acquired.append(self._stripes[index])
+            yield
+        finally:
+            for stripe in reversed(acquired):
+                stripe.release()
+
+    def reserved(self, product: BaseProduct):
+        """Return the amount of the product held by open reservations."""
+        return self._stripe(product).reserved.get(product, 0)
+
+    def available(self, product: BaseProduct):
+        """Return the amount of the product that can still be reserved."""
+        with self.locked([product]):
+            return product.available_amount - self.reserved(product)
+
+    def is_available(self, product: BaseProduct, amount: int):
+        """Check if the amount can be reserved right now."""
+        return self.available(product) >= amount
+
+    def reserve(self, items: Dict[BaseProduct, int], timeout: float = None):
+        """Hold stock for every item or raise without holding anything."""
+        self.expire_reservations()
+        items = dict(items)
+        with self.locked(items):
+            for product, amount in items.items():
+                if not product.is_available(amount + self.reserved(product)):
+                    self._count("rejected")
+                    raise ValueError(f"Not enough {product} available")
+            for product, amount in items.items():
+                stripe = self._stripe(product)
+                stripe.reserved[product] = stripe.reserved.get(product, 0) + amount
+        timeout = self.reservation_timeout if timeout is None else timeout
+        reservation = Reservation(str(uuid.uuid4()), items, self._clock() + timeout)
+        with self._state_lock:
+            self._active[reservation.reservation_id] = reservation
+            heapq.heappush(self._expiry, reservation)
+            self._counters["reserved"] += 1
+        return reservation
+
+    def commit(self, reservation: Reservation) -> List[str]:
+        """Buy the reserved stock and return the product IDs."""
+        self._claim(reservation)
+        if self._clock() > reservation.expires_at:
+            self._unhold(reservation)
+            self._count("expired")
+            raise ValueError(f"Reservation {reservation.reservation_id} has expired")
+        with self.locked(reservation.items):
+            self._unhold(reservation)
+            token = _COMMITTING.set(self)
+            try:
+                for product, amount in reservation.items.items():
+                    product.buy(amount)
+            finally:
+                _COMMITTING.reset(token)
+        self._count("committed")
+        return [str(product) for product in reservation.items]
+
+    def buy(self, product: BaseProduct, amount: int):
+        """Take stock that is not held by open reservations of this engine."""
+        with self.locked([product]):
+            if not product.is_available(amount + self.reserved(product)):
+                raise ValueError(f"Not enough {product.name} available")
+            product.available_amount -= amount
+
+    def checkout(self, items: Dict[BaseProduct, int]) -> List[str]:
+        """Reserve and buy all items at once and return the product IDs."""
+        return self.commit(self.reserve(items))
+
+    def release(self, reservation: Reservation):
+        """Return the reserved stock; releasing twice is a no-op."""
+        try:
+            self._claim(reservation)
+        except ValueError:
+            return False
+        self._unhold(reservation)
+        self._count("released")
+        return True
+
+    def expire_reservations(self):
+        """Release every reservation whose timeout has passed."""
+        now = self._clock()
+        expired = []
+        with self._state_lock:
+            while self._expiry and self._expiry[0].expires_at <= now:
+                reservation = heapq.heappop(self._expiry)
+                if self._active.pop(reservation.reservation_id, None) is not None:
+                    expired.append(reservation)
+            self._counters["expired"] += len(expired)
+        for reservation in expired:
+            self._unhold(reservation)
+        return len(expired)
+
+    def stats(self):
+        """Return reservation counters and lock contention metrics."""
+        with self._state_lock:
+            stats = dict(self._counters, active=len(self._active))
+        stats["lock_acquisitions"] = sum(stripe.acquisitions for stripe in self._stripes)
+        stats["lock_contended"] = sum(stripe.contended for stripe in self._stripes)
+        stats["lock_wait_seconds"] = sum(stripe.wait_seconds for stripe in self._stripes)
+        acquisitions = stats["lock_acquisitions"]
+        stats["contention_ratio"] = stats["lock_contended"] / acquisitions if acquisitions else 0.0
+        return stats
+
+    def _claim(self, reservation):
+        """Take the reservation out of the active set or raise if it is gone."""
+        with self._state_lock:
+            if self._active.pop(reservation.reservation_id, None) is None:
+                raise ValueError(f"Reservation {reservation.reservation_id} is not active")
+
+    def _unhold(self, reservation):
+        """Drop the reserved amounts of the reservation."""
+        with self.locked(reservation.items):
+            for product, amount in reservation.items.items():
+                stripe = self._stripe(product)
+                stripe.reserved[product] -= amount
+                if not stripe.reserved[product]:
+                    del stripe.reserved[product]
+
+    def _count(self, counter):
+        """Increment a reservation counter."""
+        with self._state_lock:
+            self._counters[counter] += 1
+
+
+INVENTORY = InventoryReservationEngine()
+_COMMITTING: ContextVar = ContextVar("committing_inventory", default=None)
+
 
 @dataclass
 class Order:
@@ -89,16 +528,34 @@ class Order:
     shipping_service: ShippingService
     order_id: str = str(uuid.uuid4())
 
+    @timed("order.place_order")
     def place_order(self, shipping_type, due_date: datetime = None):
         """Place the order and create shipment."""
+        product_ids, due_date = self._submit(due_date)
+        return self.shipping_service.create_shipping(
+            shipping_type, product_ids, self.order_id, due_date
+        )
+
+    @timed("order.place_order_async")
+    async def place_order_async(self, shipping_type, due_date: datetime = None):
+        """Place the order and create shipment through an AsyncShippingService.
+
+        Reserving the cart takes inventory locks, so it runs in the default
+        executor instead of blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        product_ids, due_date = await loop.run_in_executor(None, self._submit, due_date)
+        return await self.shipping_service.create_shipping(
+            shipping_type, product_ids, self.order_id, due_date
+        )
+
+    def _submit(self, due_date):
+        """Reserve the cart contents and default the shipment due date."""
         if not self.cart.products:
             raise ValueError("Cannot place order with empty cart")
         if not due_date:
             due_date = datetime.now(timezone.utc) + timedelta(seconds=3)
-        product_ids = self.cart.submit_cart_order()
-        return self.shipping_service.create_shipping(
-            shipping_type, product_ids, self.order_id, due_date
-        )
+        return self.cart.submit_cart_order(), due_date
 
 
 @dataclass
@@ -0,0 +1,254 @@
+"""Benchmarks for the order-to-shipment hot path.
+
+Usage: python -m benchmarks.hot_path --backend mock --backend localstack --output bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from app.eshop import Catalog, Product, ShoppingCart, Order
+from services import ShippingService
+from services.backends import MemoryBackend
+from services.clients import registry
+from services.config import SHIPPING_TABLE_NAME
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher
+from services.schema import shipping_table_definition
+
+BACKENDS = ("mock", "memory", "localstack")
+SHIPPING_TYPE = ShippingService.list_available_shipping_type()[0]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(name, timings, operations_per_call=1, operations=None):
+    ordered = sorted(timings)
+    total = sum(ordered)
+    if operations is None:
+        operations = len(ordered) * operations_per_call
+    return {
+        "name": name,
+        "calls": len(ordered),
+        "operations": operations,
+        "throughput_per_second": operations / total if total else 0.0,
+        "mean_ms": total / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def measure(name, operation, iterations, setup=None, warmup=3, operations_per_call=1, count=None):
+    for _ in range(warmup):
+        operation(setup() if setup else None)
+    timings = []
+    operations = 0
+    for _ in range(iterations):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        result = operation(state)
+        timings.append(time.perf_counter() - started)
+        operations += count(result) if count else operations_per_call
+    return summarize(name, timings, operations=operations)
+
+
+def mock_service():
+    repository = mock.Mock()
+    publisher = mock.Mock()
+    response = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+    due_date = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    repository.create_shipping.side_effect = lambda *args, **kwargs: str(uuid.uuid4())
+    repository.update_shipping_status.return_value = response
+    repository.get_shipping.return_value = {"shipping_status": ShippingService.SHIPPING_IN_PROGRESS, "due_date": due_date}
+    repository.get_shippings.side_effect = lambda shipping_ids, fields=None: {
+        shipping_id: {"shipping_id": shipping_id, "due_date": due_date} for shipping_id in shipping_ids
+    }
+    repository.update_shipping_statuses.side_effect = lambda statuses, expected_status=None: (
+        {shipping_id: response for shipping_id in statuses}, {}
+    )
+    publisher.poll_shipping.side_effect = lambda batch_size=10: [str(uuid.uuid4()) for _ in range(batch_size)]
+    return ShippingService(repository, publisher)
+
+
+def memory_service():
+    backend = MemoryBackend()
+    repository = ShippingRepository()
+    repository._table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    publisher = ShippingPublisher()
+    publisher._client = backend.client("sqs")
+    return ShippingService(repository, publisher)
+
+
+def localstack_service():
+    dynamo_client = registry.client("dynamodb")
+    if SHIPPING_TABLE_NAME not in dynamo_client.list_tables()["TableNames"]:
+        dynamo_client.create_table(**shipping_table_definition())
+        dynamo_client.get_waiter("table_exists").wait(TableName=SHIPPING_TABLE_NAME)
+    repository = ShippingRepository()
+    repository._table = registry.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    publisher = ShippingPublisher()
+    publisher._client = registry.client("sqs")
+    return ShippingService(repository, publisher)
+
+
+SERVICE_FACTORIES = {"mock": mock_service, "memory": memory_service, "localstack": localstack_service}
+
+
+def build_cart(size, rng):
+    cart = ShoppingCart()
+    for index in range(size):
+        cart.add_product(Product("SKU-%d" % index, round(rng.uniform(1, 1000), 2), 1000), rng.randint(1, 5))
+    return cart
+
+
+def due_date():
+    return datetime.now(timezone.utc) + timedelta(minutes=10)
+
+
+def run_cart_benchmarks(iterations, cart_size, seed):
+    rng = random.Random(seed)
+    products = [Product("SKU-%d" % index, round(rng.uniform(1, 1000), 2), 1000) for index in range(cart_size)]
+    large_cart = build_cart(cart_size, random.Random(seed))
+
+    def add_products(cart):
+        for product in products:
+            cart.add_product(product, 1)
+
+    return [
+        measure("ShoppingCart.add_product", add_products, iterations, setup=ShoppingCart,
+                operations_per_call=cart_size),
+        measure("ShoppingCart.calculate_total", lambda _: large_cart.calculate_total(), iterations),
+        measure("ShoppingCart.submit_cart_order", lambda cart: cart.submit_cart_order(), iterations,
+                setup=lambda: build_cart(cart_size, random.Random(seed))),
+    ]
+
+
+def allocated_bytes(build):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        kept = build()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def run_catalog_benchmarks(iterations, cart_size, seed):
+    rng = random.Random(seed)
+    rows = [("SKU-%d" % index, round(rng.uniform(1, 1000), 2), rng.randint(0, 1000)) for index in range(cart_size)]
+    products = [Product(*row) for row in rows]
+    catalog = Catalog(products)
+    carts = [
+        {products[rng.randrange(cart_size)]: rng.randint(1, 5) for _ in range(10)}
+        for _ in range(100)
+    ]
+    compiled = [catalog.compile(cart) for cart in carts]
+
+    def per_object_totals(_):
+        return [sum(product.price * amount for product, amount in cart.items()) for cart in carts]
+
+    return {
+        "memory_bytes_per_sku": {
+            "Product": allocated_bytes(lambda: [Product(*row) for row in rows]) / cart_size,
+            "Catalog": allocated_bytes(lambda: Catalog(Product(*row) for row in rows)) / cart_size,
+        },
+        "results": [
+            measure("Product per-object totals", per_object_totals, iterations, operations_per_call=len(carts)),
+            measure("Catalog.totals", lambda _: catalog.totals(carts), iterations, operations_per_call=len(carts)),
+            measure("Catalog.totals (compiled carts)", lambda _: catalog.totals(compiled), iterations,
+                    operations_per_call=len(carts)),
+            measure("Catalog.are_available", lambda _: catalog.are_available(compiled), iterations,
+                    operations_per_call=len(carts)),
+            measure("Catalog.in_price_range", lambda _: catalog.in_price_range(100, 200), iterations),
+        ],
+    }
+
+
+def run_service_benchmarks(service, iterations, seed, fill_queue=True):
+    rng = random.Random(seed)
+
+    def order_setup():
+        return Order(build_cart(3, rng), service, str(uuid.uuid4()))
+
+    def batch_setup():
+        if not fill_queue:
+            return None
+        service.create_shippings([
+            {"shipping_type": SHIPPING_TYPE, "product_ids": ["SKU-1"], "order_id": "benchmark", "due_date": due_date()}
+            for _ in range(10)
+        ])
+        return None
+
+    shipping_id = service.create_shipping(SHIPPING_TYPE, ["SKU-1"], "benchmark", due_date())
+    return [
+        measure("Order.place_order", lambda order: order.place_order(SHIPPING_TYPE, due_date()), iterations,
+                setup=order_setup),
+        measure("ShippingService.create_shipping",
+                lambda _: service.create_shipping(SHIPPING_TYPE, ["SKU-1"], "benchmark", due_date()), iterations),
+        measure("ShippingService.process_shipping_batch", lambda _: service.process_shipping_batch(),
+                iterations, setup=batch_setup, count=len),
+        measure("ShippingService.check_status", lambda _: service.check_status(shipping_id), iterations),
+    ]
+
+
+def run(backends, iterations, cart_size, seed):
+    report = {
+        "metadata": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "cart_size": cart_size,
+            "seed": seed,
+        },
+        "cart": run_cart_benchmarks(iterations, cart_size, seed),
+        "catalog": run_catalog_benchmarks(iterations, cart_size, seed),
+        "backends": {},
+    }
+    for backend in backends:
+        try:
+            service = SERVICE_FACTORIES[backend]()
+        except Exception as error:
+            report["backends"][backend] = {"skipped": "%s: %s" % (type(error).__name__, error)}
+            continue
+        report["backends"][backend] = {
+            "results": run_service_benchmarks(service, iterations, seed, fill_queue=backend != "mock")
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the order-to-shipment hot path")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="repository/publisher backend to benchmark, repeatable (default: mock and localstack)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--cart-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    report = run(args.backend or ["mock", "localstack"], args.iterations, args.cart_size, args.seed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from .config import ASYNC_MAX_WORKERS, ASYNC_MAX_CONCURRENCY, PROCESSED_CACHE_SIZE, PROCESSED_CACHE_TTL_SECONDS
+from .cache import TTLCache
+from .metrics import metrics, timed
+from .publisher import ShippingPublisher, ShardedPublisher
+from .repository import ShippingRepository, is_condition_failure
+from .service import ShippingService
+from botocore.exceptions import ClientError
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+import asyncio
+import weakref
+
+
+class AsyncBridge:
+    def __init__(self, max_workers: int = ASYNC_MAX_WORKERS, max_concurrency: int = ASYNC_MAX_CONCURRENCY):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shipping-async")
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, partial(function, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_default_bridge = None
+
+
+def default_bridge():
+    global _default_bridge
+    if _default_bridge is None:
+        _default_bridge = AsyncBridge()
+    return _default_bridge
+
+
+class AsyncShippingRepository:
+    def __init__(self, repository: ShippingRepository = None, bridge: AsyncBridge = None):
+        self.repository = repository or ShippingRepository()
+        self.bridge = bridge or default_bridge()
+
+    async def get_shipping(self, shipping_id, fields: list = None):
+        return await self.bridge.run(self.repository.get_shipping, shipping_id, fields)
+
+    async def get_shippings(self, shipping_ids: list, fields: list = None):
+        return await self.bridge.run(self.repository.get_shippings, shipping_ids, fields)
+
+    async def create_shipping(self, shipping_type, product_ids, order_id, status, due_date, pending_publish=False):
+        return await self.bridge.run(
+            self.repository.create_shipping, shipping_type, product_ids, order_id, status, due_date, pending_publish
+        )
+
+    async def create_shippings(self, shippings: list, status: str, pending_publish: bool = False):
+        return await self.bridge.run(self.repository.create_shippings, shippings, status, pending_publish)
+
+    async def update_shipping_status(self, shipping_id, status, expected_status=None, due_before: datetime = None,
+                                     due_not_before: datetime = None):
+        return await self.bridge.run(
+            self.repository.update_shipping_status, shipping_id, status, expected_status, due_before, due_not_before
+        )
+
+    async def update_shipping_statuses(self, statuses: dict, expected_status=None):
+        return await self.bridge.run(self.repository.update_shipping_statuses, statuses, expected_status)
+
+    async def find_shippings_by_order(self, order_id: str, fields: list = None):
+        return await self.bridge.run(lambda: list(self.repository.find_shippings_by_order(order_id, fields)))
+
+
+class AsyncShippingPublisher:
+    def __init__(self, publisher=None, bridge: AsyncBridge = None):
+        self.publisher = publisher or ShippingPublisher()
+        self.bridge = bridge or default_bridge()
+
+    async def send_new_shipping(self, shipping_id: str, **params):
+        return await self.bridge.run(self.publisher.send_new_shipping, shipping_id, **params)
+
+    async def send_new_shippings(self, shipping_ids: list, **params):
+        return await self.bridge.run(self.publisher.send_new_shippings, shipping_ids, **params)
+
+    async def poll_shipping(self, batch_size: int = 10):
+        return await self.bridge.run(self.publisher.poll_shipping, batch_size)
+
+    async def receive_shippings(self, batch_size: int = 10, wait_time: int = 10, visibility_timeout: int = None):
+        return await self.bridge.run(self.publisher.receive_shippings, batch_size, wait_time, visibility_timeout)
+
+    async def delete_shippings(self, receipt_handles: list):
+        return await self.bridge.run(self.publisher.delete_shippings, receipt_handles)
+
+
+class AsyncShippingService:
+    SHIPPING_CREATED = ShippingService.SHIPPING_CREATED
+    SHIPPING_IN_PROGRESS = ShippingService.SHIPPING_IN_PROGRESS
+    SHIPPING_COMPLETED = ShippingService.SHIPPING_COMPLETED
+    SHIPPING_FAILED = ShippingService.SHIPPING_FAILED
+    ACTIVE_STATUSES = ShippingService.ACTIVE_STATUSES
+    PROCESSING_SKIPPED = ShippingService.PROCESSING_SKIPPED
+
+    list_available_shipping_type = staticmethod(ShippingService.list_available_shipping_type)
+    validate_shipping = ShippingService.validate_shipping
+    _resolve_status = ShippingService._resolve_status
+    _seen = ShippingService._seen
+    _finished = ShippingService._finished
+    _track = ShippingService._track
+    _untrack = ShippingService._untrack
+
+    def __init__(self, repository: AsyncShippingRepository, publisher: AsyncShippingPublisher, scheduler=None,
+                 processed: TTLCache = None):
+        self.repository = repository
+        self.publisher = publisher
+        self.scheduler = scheduler
+        if processed is None and PROCESSED_CACHE_SIZE > 0:
+            processed = TTLCache(PROCESSED_CACHE_SIZE, PROCESSED_CACHE_TTL_SECONDS)
+        self.processed = processed
+
+    @timed('async_service.create_shipping')
+    async def create_shipping(self, shipping_type, product_ids, order_id, due_date, allow_past_due=False):
+        self.validate_shipping(shipping_type, due_date, allow_past_due)
+        shipping_id = await self.repository.create_shipping(
+            shipping_type, product_ids, order_id, self.SHIPPING_CREATED, due_date
+        )
+        params = {}
+        if self.scheduler is not None:
+            params['delay_seconds'] = self.scheduler.processing_delay(due_date)
+        if isinstance(self.publisher.publisher, ShardedPublisher):
+            params['shipping_type'] = shipping_type
+        sent = await self.publisher.send_new_shipping(shipping_id, **params)
+        if isinstance(sent, Future):
+            await asyncio.wrap_future(sent)
+        await self.repository.update_shipping_status(shipping_id, self.SHIPPING_IN_PROGRESS)
+        self._track(shipping_id, due_date)
+        return shipping_id
+
+    @timed('async_service.process_shipping_batch')
+    async def process_shipping_batch(self):
+        return await self.process_shippings(await self.publisher.poll_shipping())
+
+    @timed('async_service.process_shippings')
+    async def process_shippings(self, shipping_ids):
+        unique_ids = list(dict.fromkeys(shipping_ids))
+        results = await asyncio.gather(
+            *(self.process_shipping(shipping_id) for shipping_id in unique_ids), return_exceptions=True
+        )
+        responses = dict(zip(unique_ids, results))
+        for result in results:
+            if isinstance(result, Exception):
+                metrics.increment('async_service.process_shippings', 'errors')
+        return [responses[shipping_id] for shipping_id in shipping_ids]
+
+    @timed('async_service.process_shipping')
+    async def process_shipping(self, shipping_id):
+        if self._seen(shipping_id, 'async_service.process_shipping'):
+            return self.PROCESSING_SKIPPED
+        now = datetime.now(timezone.utc)
+        response = await self._update_if_active(shipping_id, self.SHIPPING_COMPLETED, due_not_before=now)
+        if response is None:
+            response = await self._update_if_active(shipping_id, self.SHIPPING_FAILED, due_before=now)
+        self._finished(shipping_id)
+        if response is None:
+            metrics.increment('async_service.process_shipping', 'duplicates')
+            return self.PROCESSING_SKIPPED
+        return response['ResponseMetadata']
+
+    async def _update_if_active(self, shipping_id, status, **due):
+        try:
+            return await self.repository.update_shipping_status(
+                shipping_id, status, expected_status=self.ACTIVE_STATUSES, **due
+            )
+        except ClientError as error:
+            if not is_condition_failure(error):
+                raise
+            return None
+
+    @timed('async_service.check_status')
+    async def check_status(self, shipping_id):
+        shipping = await self.repository.get_shipping(shipping_id, fields=['shipping_status'])
+        return shipping['shipping_status']
+
+    @timed('async_service.fail_shipping')
+    async def fail_shipping(self, shipping_id):
+        response = await self.repository.update_shipping_status(shipping_id, self.SHIPPING_FAILED)
+        self._untrack(shipping_id)
+        return response['ResponseMetadata']
+
+    @timed('async_service.complete_shipping')
+    async def complete_shipping(self, shipping_id):
+        response = await self.repository.update_shipping_status(shipping_id, self.SHIPPING_COMPLETED)
+        self._untrack(shipping_id)
+        return response['ResponseMetadata']
@@ -0,0 +1,96 @@
+import threading
+from .config import SHIPPING_BACKEND, SHIPPING_QUEUE
+from .schema import shipping_table_definition, inventory_table_definition
+from .clients import registry
+from .memory import MemoryDynamoResource, MemorySQSClient
+
+
+class Backend:
+    name = None
+
+    def client(self, service_name: str):
+        raise NotImplementedError
+
+    def resource(self, service_name: str):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class AwsBackend(Backend):
+    name = "aws"
+
+    def __init__(self, clients=registry):
+        self.clients = clients
+
+    def client(self, service_name: str):
+        return self.clients.client(service_name)
+
+    def resource(self, service_name: str):
+        return self.clients.resource(service_name)
+
+    def stats(self):
+        return self.clients.stats()
+
+
+class MemoryBackend(Backend):
+    name = "memory"
+
+    def __init__(self, provision: bool = True):
+        self.dynamodb = MemoryDynamoResource()
+        self.sqs = MemorySQSClient()
+        if provision:
+            self.dynamodb.create_table(**shipping_table_definition())
+            self.dynamodb.create_table(**inventory_table_definition())
+            self.sqs.create_queue(QueueName=SHIPPING_QUEUE)
+
+    def client(self, service_name: str):
+        if service_name == "sqs":
+            return self.sqs
+        if service_name == "dynamodb":
+            return self.dynamodb.meta.client
+        raise ValueError("Memory backend does not provide %s" % service_name)
+
+    def resource(self, service_name: str):
+        if service_name == "dynamodb":
+            return self.dynamodb
+        raise ValueError("Memory backend does not provide a %s resource" % service_name)
+
+    def stats(self):
+        return {
+            "tables": {
+                name: self.dynamodb.Table(name).item_count()
+                for name in self.dynamodb.meta.client.list_tables()["TableNames"]
+            }
+        }
+
+
+BACKENDS = {"aws": AwsBackend, "memory": MemoryBackend}
+
+_backend = None
+_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            if SHIPPING_BACKEND not in BACKENDS:
+                raise ValueError("Unknown shipping backend %s" % SHIPPING_BACKEND)
+            _backend = BACKENDS[SHIPPING_BACKEND]()
+        return _backend
+
+
+def set_backend(backend: Backend):
+    global _backend
+    with _lock:
+        _backend = backend
+
+
+def get_client(service_name: str):
+    return get_backend().client(service_name)
+
+
+def get_resource(service_name: str):
+    return get_backend().resource(service_name)
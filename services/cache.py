@@ -0,0 +1,114 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False
+
+
+class TTLCache:
+    def __init__(self, max_size: int, ttl: float, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'shared_loads': 0}
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['shared_loads'] += 1
+                owner = False
+            else:
+                flight = self._flights[key] = _Flight()
+                owner = True
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = loader(key)
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                if flight.error is None and flight.value is not None and not flight.stale:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def put(self, key, value):
+        with self._lock:
+            self._mark_stale(key)
+            self._store(key, value)
+
+    def update(self, key, modify):
+        with self._lock:
+            self._mark_stale(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (modify(entry[0]), entry[1])
+
+    def invalidate(self, key):
+        with self._lock:
+            self._mark_stale(key)
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for key in self._flights:
+                self._mark_stale(key)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats['hits'] += 1
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (value, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _mark_stale(self, key):
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.stale = True
@@ -0,0 +1,241 @@
+from .config import (
+    CARRIER_WEIGHTS, CARRIER_MAX_IN_FLIGHT, CARRIER_IDLE_BACKOFF_SECONDS, CARRIER_DEPTH_INTERVAL_SECONDS,
+    WORKER_PROCESSORS, WORKER_VISIBILITY_TIMEOUT
+)
+from .metrics import metrics
+from .publisher import CARRIER_QUEUE_SUFFIXES, SQS_BATCH_LIMIT
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+DEFAULT_CARRIER = 'default'
+MIN_IDLE_BACKOFF_SECONDS = 0.05
+COUNTERS = ('received', 'processed', 'failed', 'acknowledged', 'ack_failed', 'polls', 'empty_polls')
+
+
+def parse_weights(text: str = CARRIER_WEIGHTS):
+    weights = {}
+    for entry in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = entry.partition('=')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class _Carrier:
+    def __init__(self, name, publisher, weight, max_in_flight):
+        self.name = name
+        self.publisher = publisher
+        self.weight = weight
+        self.max_in_flight = max_in_flight
+        self.pass_value = 0.0
+        self.in_flight = 0
+        self.idle_until = 0.0
+        self.idle_backoff = 0.0
+        self.acks = []
+        self.acks_since = None
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.depth = None
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def capacity(self):
+        return min(SQS_BATCH_LIMIT, self.max_in_flight - self.in_flight)
+
+
+class CarrierConsumer:
+    def __init__(self, service, weights: dict = None, max_in_flight=CARRIER_MAX_IN_FLIGHT,
+                 processors: int = WORKER_PROCESSORS, visibility_timeout: int = WORKER_VISIBILITY_TIMEOUT,
+                 ack_linger: float = 0.5, idle_backoff: float = CARRIER_IDLE_BACKOFF_SECONDS,
+                 depth_interval: float = CARRIER_DEPTH_INTERVAL_SECONDS, clock=time.monotonic):
+        self.service = service
+        self.processors = processors
+        self.visibility_timeout = visibility_timeout
+        self.ack_linger = ack_linger
+        self.idle_backoff = idle_backoff
+        self.depth_interval = depth_interval
+        self.clock = clock
+        weights = parse_weights() if weights is None else weights
+        publishers = [(DEFAULT_CARRIER, service.publisher.default)] + [
+            (CARRIER_QUEUE_SUFFIXES.get(shipping_type, shipping_type), publisher)
+            for shipping_type, publisher in service.publisher.carriers.items()
+        ]
+        self.carriers = [
+            _Carrier(
+                name, publisher, weights.get(name, 1.0),
+                max_in_flight.get(name, CARRIER_MAX_IN_FLIGHT) if isinstance(max_in_flight, dict) else max_in_flight
+            )
+            for name, publisher in publishers
+        ]
+        self._virtual_time = 0.0
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._started_at = None
+        self._depth_at = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Carrier consumer is already running")
+        self._stopping.clear()
+        self._started_at = self.clock()
+        self._executor = ThreadPoolExecutor(max_workers=self.processors, thread_name_prefix="shipping-carrier")
+        self._thread = threading.Thread(target=self._schedule_loop, name="shipping-carrier-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        if self._thread is not None:
+            self._stopping.set()
+            with self._condition:
+                self._condition.notify_all()
+            self._thread.join(timeout)
+            self._thread = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._flush_acks(force=True)
+
+    def poll_once(self):
+        carrier = self._next_carrier()
+        if carrier is not None:
+            self._poll(carrier)
+        return carrier
+
+    def lag(self):
+        with self._condition:
+            return {
+                carrier.name: {'lag_seconds': carrier.lag, 'max_lag_seconds': carrier.max_lag, 'depth': carrier.depth}
+                for carrier in self.carriers
+            }
+
+    def stats(self):
+        with self._condition:
+            carriers = {}
+            for carrier in self.carriers:
+                carriers[carrier.name] = dict(
+                    carrier.counters, weight=carrier.weight, in_flight=carrier.in_flight,
+                    max_in_flight=carrier.max_in_flight, lag_seconds=carrier.lag,
+                    max_lag_seconds=carrier.max_lag, depth=carrier.depth
+                )
+        stats = {counter: sum(carrier[counter] for carrier in carriers.values()) for counter in COUNTERS}
+        stats['in_flight'] = sum(carrier['in_flight'] for carrier in carriers.values())
+        elapsed = self.clock() - self._started_at if self._started_at else 0
+        stats['throughput'] = stats['processed'] / elapsed if elapsed else 0.0
+        stats['carriers'] = carriers
+        return stats
+
+    def _schedule_loop(self):
+        while not self._stopping.is_set():
+            if self.clock() >= self._depth_at:
+                self._sample_depths()
+            if self.poll_once() is None:
+                with self._condition:
+                    self._condition.wait(self._idle_wait())
+            self._flush_acks()
+
+    def _next_carrier(self):
+        now = self.clock()
+        with self._condition:
+            eligible = [
+                carrier for carrier in self.carriers
+                if carrier.capacity() > 0 and carrier.idle_until <= now
+            ]
+            if not eligible:
+                return None
+            carrier = min(eligible, key=lambda candidate: candidate.pass_value)
+            self._virtual_time = max(self._virtual_time, carrier.pass_value)
+            return carrier
+
+    def _idle_wait(self):
+        now = self.clock()
+        waits = [self.ack_linger]
+        for carrier in self.carriers:
+            if carrier.capacity() > 0:
+                waits.append(max(0.0, carrier.idle_until - now))
+        return min(waits)
+
+    def _poll(self, carrier):
+        with self._condition:
+            count = carrier.capacity()
+        try:
+            messages = carrier.publisher.receive_shippings(
+                count, 0, self.visibility_timeout, attributes=['SentTimestamp']
+            )
+        except Exception:
+            messages = []
+        now = self.clock()
+        sent_now = time.time()
+        with self._condition:
+            carrier.counters['polls'] += 1
+            if not messages:
+                carrier.counters['empty_polls'] += 1
+                carrier.idle_backoff = min(self.idle_backoff, max(MIN_IDLE_BACKOFF_SECONDS, carrier.idle_backoff * 2))
+                carrier.idle_until = now + carrier.idle_backoff
+                return
+            carrier.idle_backoff = 0.0
+            carrier.pass_value = max(carrier.pass_value, self._virtual_time) + len(messages) / carrier.weight
+            carrier.in_flight += len(messages)
+            carrier.counters['received'] += len(messages)
+            for message in messages:
+                sent_at = message.get('Attributes', {}).get('SentTimestamp')
+                if sent_at is not None:
+                    carrier.lag = max(0.0, sent_now - int(sent_at) / 1000)
+                    carrier.max_lag = max(carrier.max_lag, carrier.lag)
+                    metrics.observe('carrier.%s.lag' % carrier.name, carrier.lag)
+        for message in messages:
+            if self._executor is None:
+                self._process(carrier, message)
+            else:
+                self._executor.submit(self._process, carrier, message)
+
+    def _process(self, carrier, message):
+        try:
+            self.service.process_shipping(message['Body'])
+        except Exception:
+            processed = False
+        else:
+            processed = True
+        with self._condition:
+            carrier.in_flight -= 1
+            if processed:
+                carrier.counters['processed'] += 1
+                if not carrier.acks:
+                    carrier.acks_since = self.clock()
+                carrier.acks.append(message['ReceiptHandle'])
+            else:
+                carrier.counters['failed'] += 1
+            self._condition.notify_all()
+
+    def _flush_acks(self, force: bool = False):
+        now = self.clock()
+        batches = []
+        with self._condition:
+            for carrier in self.carriers:
+                if carrier.acks and (force or len(carrier.acks) >= SQS_BATCH_LIMIT or
+                                     now - carrier.acks_since >= self.ack_linger):
+                    batches.append((carrier, carrier.acks))
+                    carrier.acks = []
+        for carrier, receipt_handles in batches:
+            try:
+                errors = carrier.publisher.delete_shippings(receipt_handles)
+            except Exception:
+                errors = receipt_handles
+            with self._condition:
+                carrier.counters['acknowledged'] += len(receipt_handles) - len(errors)
+                carrier.counters['ack_failed'] += len(errors)
+
+    def _sample_depths(self):
+        self._depth_at = self.clock() + self.depth_interval
+        for carrier in self.carriers:
+            try:
+                depth = carrier.publisher.queue_depth()
+            except Exception:
+                continue
+            with self._condition:
+                carrier.depth = depth
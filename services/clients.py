@@ -0,0 +1,116 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from .config import (
+    AWS_ENDPOINT_URL, AWS_REGION, AWS_MAX_POOL_CONNECTIONS, AWS_RETRY_MODE,
+    AWS_MAX_ATTEMPTS, AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT
+)
+
+
+def build_client_config():
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": AWS_RETRY_MODE, "total_max_attempts": AWS_MAX_ATTEMPTS},
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+    )
+
+
+class ClientRegistry:
+    def __init__(self, config: Config = None):
+        self._config = config
+        self._lock = threading.Lock()
+        self._session = None
+        self._clients = {}
+        self._resources = {}
+        self._local = threading.local()
+        self._requests = 0
+        self._created = 0
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = build_client_config()
+        return self._config
+
+    def session(self):
+        with self._lock:
+            return self._get_session()
+
+    def client(self, service_name: str):
+        with self._lock:
+            self._requests += 1
+            client = self._clients.get(service_name)
+            if client is None:
+                client = self._clients[service_name] = self._get_session().client(
+                    service_name, endpoint_url=AWS_ENDPOINT_URL, config=self.config
+                )
+                self._created += 1
+            return client
+
+    def resource(self, service_name: str):
+        resources = getattr(self._local, "resources", None)
+        if resources is None:
+            resources = self._local.resources = {}
+        with self._lock:
+            self._requests += 1
+            resource = resources.get(service_name)
+            if resource is None:
+                shared = self._resources.get(service_name)
+                if shared is None:
+                    shared = self._resources[service_name] = self._get_session().resource(
+                        service_name, endpoint_url=AWS_ENDPOINT_URL, config=self.config
+                    )
+                resource = resources[service_name] = type(shared)(client=shared.meta.client)
+                self._created += 1
+            return resource
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._clients = {}
+        self._resources = {}
+        self._local = threading.local()
+        self._requests = 0
+        self._created = 0
+
+    def stats(self):
+        with self._lock:
+            clients = dict(self._clients)
+            clients.update({"%s:resource" % name: resource.meta.client for name, resource in self._resources.items()})
+            stats = {
+                "requests": self._requests, "created": self._created, "clients": sorted(self._clients), "pools": {}
+            }
+        for name, client in clients.items():
+            stats["pools"][name] = _pool_usage(client)
+        return stats
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = boto3.session.Session(
+                aws_access_key_id="test",
+                aws_secret_access_key="test",
+                region_name=AWS_REGION,
+            )
+        return self._session
+
+
+def _pool_usage(client):
+    usage = {"max_pool_connections": client.meta.config.max_pool_connections, "opened": 0, "in_use": 0, "requests": 0}
+    try:
+        pools = client._endpoint.http_session._manager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            usage["opened"] += pool.num_connections
+            usage["requests"] += pool.num_requests
+            usage["in_use"] += pool.pool.maxsize - pool.pool.qsize()
+    except AttributeError:
+        pass
+    return usage
+
+
+registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset)
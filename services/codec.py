@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+LEGACY_ITEM_FORMAT = 1
+COMPACT_ITEM_FORMAT = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Read-shape fields that can be decoded from more than one stored attribute.
+SOURCE_FIELDS = {
+    "due_date": ["due_date", "due_at"],
+    "due_at": ["due_at", "due_date"],
+}
+
+
+def encode_timestamp(value: datetime):
+    return Decimal("%.6f" % value.timestamp())
+
+
+def encode_shipping_item(shipping_id, shipping_type, product_ids, order_id, status, due_date, item_format):
+    created_date = datetime.now(timezone.utc)
+    due_date = due_date.replace(tzinfo=timezone.utc)
+    if item_format == COMPACT_ITEM_FORMAT:
+        return {
+            "shipping_id": shipping_id,
+            "item_format": COMPACT_ITEM_FORMAT,
+            "shipping_type": shipping_type,
+            "order_id": str(order_id),
+            "product_ids": list(product_ids),
+            "shipping_status": status,
+            "created_date": encode_timestamp(created_date),
+            "due_at": encode_timestamp(due_date)
+        }
+    return {
+        "shipping_id": shipping_id,
+        "shipping_type": shipping_type,
+        "order_id": str(order_id),
+        "product_ids": ",".join(product_ids),
+        "shipping_status": status,
+        "created_date": created_date.isoformat(),
+        "due_date": due_date.isoformat(),
+        "due_at": encode_timestamp(due_date)
+    }
+
+
+def decode_timestamp(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def decode_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return EPOCH + timedelta(microseconds=int(Decimal(value) * 1000000))
+
+
+def decode_shipping_item(item):
+    """Return a legacy or compact item in the one shape reads expose.
+
+    product_ids is a list, created_date and due_date are ISO strings and due_at is the numeric due timestamp,
+    whichever format the item was stored in.
+    """
+    if item is None:
+        return None
+    item = dict(item)
+    item.pop("item_format", None)
+    if isinstance(item.get("product_ids"), str):
+        item["product_ids"] = item["product_ids"].split(",") if item["product_ids"] else []
+    elif "product_ids" in item:
+        item["product_ids"] = list(item["product_ids"])
+    if "created_date" in item and not isinstance(item["created_date"], str):
+        item["created_date"] = decode_datetime(item["created_date"]).isoformat()
+    if "due_at" in item and "due_date" not in item:
+        item["due_date"] = decode_datetime(item["due_at"]).isoformat()
+    elif "due_date" in item and "due_at" not in item:
+        item["due_at"] = encode_timestamp(decode_datetime(item["due_date"]))
+    return item
+
+
+def source_fields(fields):
+    if fields is None:
+        return None
+    return list(dict.fromkeys(source for field in fields for source in SOURCE_FIELDS.get(field, [field])))
+
+
+def decode_due_at(item):
+    # Items written before the due_at index key existed only carry due_date.
+    return decode_timestamp(item["due_at"] if "due_at" in item else item["due_date"])
+
+
+def project(item, fields, key="shipping_id"):
+    if item is None or fields is None:
+        return item
+    return {field: item[field] for field in [key] + list(fields) if field in item}
+
+
+def projection_params(fields, key="shipping_id"):
+    names = list(dict.fromkeys([key] + list(fields)))
+    return {
+        "ProjectionExpression": ", ".join("#f%d" % index for index in range(len(names))),
+        "ExpressionAttributeNames": {"#f%d" % index: name for index, name in enumerate(names)}
+    }
@@ -3,4 +3,71 @@ import os
 AWS_ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL", "http://localhost:4566")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 SHIPPING_TABLE_NAME = os.getenv("SHIPPING_TABLE_NAME", "ShippingTable")
-SHIPPING_QUEUE = os.getenv("SHIPPING_QUEUE_NAME", "ShippingQueue")
\ No newline at end of file
+INVENTORY_TABLE_NAME = os.getenv("INVENTORY_TABLE_NAME", "InventoryTable")
+SHIPPING_QUEUE = os.getenv("SHIPPING_QUEUE_NAME", "ShippingQueue")
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "5"))
+STATUS_UPDATE_WORKERS = int(os.getenv("STATUS_UPDATE_WORKERS", "8"))
+WORKER_POLLERS = int(os.getenv("WORKER_POLLERS", "2"))
+WORKER_PROCESSORS = int(os.getenv("WORKER_PROCESSORS", "8"))
+WORKER_VISIBILITY_TIMEOUT = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", "30"))
+CONSUMER_BUFFER_SIZE = int(os.getenv("CONSUMER_BUFFER_SIZE", "2"))
+POLL_MIN_WAIT_SECONDS = int(os.getenv("POLL_MIN_WAIT_SECONDS", "1"))
+POLL_MAX_WAIT_SECONDS = int(os.getenv("POLL_MAX_WAIT_SECONDS", "20"))
+SHIPPING_CACHE_SIZE = int(os.getenv("SHIPPING_CACHE_SIZE", "0"))
+SHIPPING_CACHE_TTL_SECONDS = float(os.getenv("SHIPPING_CACHE_TTL_SECONDS", "5"))
+SHIPPING_ITEM_FORMAT = int(os.getenv("SHIPPING_ITEM_FORMAT", "1"))
+OUTBOX_RECOVERY_GRACE_SECONDS = int(os.getenv("OUTBOX_RECOVERY_GRACE_SECONDS", "60"))
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "30"))
+SHIPPING_BACKEND = os.getenv("SHIPPING_BACKEND", "aws")
+SHIPPING_ORDER_INDEX = os.getenv("SHIPPING_ORDER_INDEX", "order_id-index")
+SHIPPING_STATUS_INDEX = os.getenv("SHIPPING_STATUS_INDEX", "shipping_status-due_at-index")
+SHIPPING_PUBLISH_INDEX = os.getenv("SHIPPING_PUBLISH_INDEX", "publish_shard-publish_pending-index")
+PUBLISH_PENDING_SHARDS = int(os.getenv("PUBLISH_PENDING_SHARDS", "4"))
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "1"))
+SCHEDULER_LEAD_SECONDS = int(os.getenv("SCHEDULER_LEAD_SECONDS", "5"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "100"))
+EXPORT_SEGMENTS = int(os.getenv("EXPORT_SEGMENTS", "4"))
+EXPORT_SHARD_ROWS = int(os.getenv("EXPORT_SHARD_ROWS", "100000"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "4"))
+IMPORT_CHECKPOINT_ROWS = int(os.getenv("IMPORT_CHECKPOINT_ROWS", "1000"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "100"))
+WRITE_BEHIND_LINGER_SECONDS = float(os.getenv("WRITE_BEHIND_LINGER_SECONDS", "0.05"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "3"))
+PUBLISH_LINGER_SECONDS = float(os.getenv("PUBLISH_LINGER_SECONDS", "0.01"))
+PUBLISH_BUFFER_SIZE = int(os.getenv("PUBLISH_BUFFER_SIZE", "1000"))
+INVENTORY_CACHE_SIZE = int(os.getenv("INVENTORY_CACHE_SIZE", "1024"))
+INVENTORY_CACHE_TTL_SECONDS = float(os.getenv("INVENTORY_CACHE_TTL_SECONDS", "1"))
+METRICS_ENABLED = int(os.getenv("METRICS_ENABLED", "1"))
+PROCESSED_CACHE_SIZE = int(os.getenv("PROCESSED_CACHE_SIZE", "10000"))
+PROCESSED_CACHE_TTL_SECONDS = float(os.getenv("PROCESSED_CACHE_TTL_SECONDS", "3600"))
+PUBLISH_DEDUP_CACHE_SIZE = int(os.getenv("PUBLISH_DEDUP_CACHE_SIZE", "0"))
+PUBLISH_DEDUP_TTL_SECONDS = float(os.getenv("PUBLISH_DEDUP_TTL_SECONDS", "300"))
+RATE_LIMIT_READ_PER_SECOND = float(os.getenv("RATE_LIMIT_READ_PER_SECOND", "0"))
+RATE_LIMIT_WRITE_PER_SECOND = float(os.getenv("RATE_LIMIT_WRITE_PER_SECOND", "0"))
+RATE_LIMIT_SEND_PER_SECOND = float(os.getenv("RATE_LIMIT_SEND_PER_SECOND", "0"))
+RATE_LIMIT_RECEIVE_PER_SECOND = float(os.getenv("RATE_LIMIT_RECEIVE_PER_SECOND", "0"))
+RATE_LIMIT_ACK_PER_SECOND = float(os.getenv("RATE_LIMIT_ACK_PER_SECOND", "0"))
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "1"))
+RATE_LIMIT_MIN_PER_SECOND = float(os.getenv("RATE_LIMIT_MIN_PER_SECOND", "1"))
+RATE_LIMIT_INCREASE_PER_SECOND = float(os.getenv("RATE_LIMIT_INCREASE_PER_SECOND", "10"))
+RATE_LIMIT_DECREASE_FACTOR = float(os.getenv("RATE_LIMIT_DECREASE_FACTOR", "0.5"))
+THROTTLE_MAX_ATTEMPTS = int(os.getenv("THROTTLE_MAX_ATTEMPTS", "5"))
+THROTTLE_BASE_DELAY_SECONDS = float(os.getenv("THROTTLE_BASE_DELAY_SECONDS", "0.05"))
+THROTTLE_MAX_DELAY_SECONDS = float(os.getenv("THROTTLE_MAX_DELAY_SECONDS", "5"))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "fork")
+WORKER_STATS_INTERVAL_SECONDS = float(os.getenv("WORKER_STATS_INTERVAL_SECONDS", "1"))
+WORKER_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT_SECONDS", "30"))
+WORKER_RESTART_DELAY_SECONDS = float(os.getenv("WORKER_RESTART_DELAY_SECONDS", "1"))
+WORKER_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT_SECONDS", "60"))
+CARRIER_QUEUES_ENABLED = int(os.getenv("CARRIER_QUEUES_ENABLED", "0"))
+CARRIER_WEIGHTS = os.getenv("CARRIER_WEIGHTS", "")
+CARRIER_MAX_IN_FLIGHT = int(os.getenv("CARRIER_MAX_IN_FLIGHT", "8"))
+CARRIER_IDLE_BACKOFF_SECONDS = float(os.getenv("CARRIER_IDLE_BACKOFF_SECONDS", "1"))
+CARRIER_DEPTH_INTERVAL_SECONDS = float(os.getenv("CARRIER_DEPTH_INTERVAL_SECONDS", "5"))
+ASYNC_MAX_WORKERS = int(os.getenv("ASYNC_MAX_WORKERS", str(AWS_MAX_POOL_CONNECTIONS)))
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", str(AWS_MAX_POOL_CONNECTIONS)))
@@ -0,0 +1,125 @@
+from .config import CONSUMER_BUFFER_SIZE, POLL_MIN_WAIT_SECONDS, POLL_MAX_WAIT_SECONDS
+import queue
+import threading
+import time
+
+SQS_MAX_BATCH = 10
+
+
+class AdaptivePollTuner:
+    def __init__(self, publisher, min_wait: int = POLL_MIN_WAIT_SECONDS, max_wait: int = POLL_MAX_WAIT_SECONDS,
+                 depth_interval: float = 5.0, smoothing: float = 0.2):
+        self.publisher = publisher
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.depth_interval = depth_interval
+        self.smoothing = smoothing
+        self.empty_rate = 0.0
+        self.queue_depth = None
+        self._depth_checked_at = None
+
+    def next_params(self):
+        depth = self._sample_depth()
+        if depth:
+            return min(SQS_MAX_BATCH, depth), 0 if depth >= SQS_MAX_BATCH else self.min_wait
+        wait_time = self.min_wait + (self.max_wait - self.min_wait) * self.empty_rate
+        return SQS_MAX_BATCH, int(round(wait_time))
+
+    def record(self, received: int):
+        empty = 1.0 if received == 0 else 0.0
+        self.empty_rate += self.smoothing * (empty - self.empty_rate)
+        if self.queue_depth is not None:
+            self.queue_depth = max(0, self.queue_depth - received)
+
+    def _sample_depth(self):
+        now = time.monotonic()
+        if self._depth_checked_at is None or now - self._depth_checked_at >= self.depth_interval:
+            self._depth_checked_at = now
+            try:
+                self.queue_depth = self.publisher.queue_depth()
+            except Exception:
+                self.queue_depth = None
+        return self.queue_depth
+
+
+class PrefetchingConsumer:
+    def __init__(self, service, buffer_size: int = CONSUMER_BUFFER_SIZE, tuner: AdaptivePollTuner = None):
+        self.service = service
+        self.publisher = service.publisher
+        self.tuner = tuner or AdaptivePollTuner(service.publisher)
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._stopping = threading.Event()
+        self._prefetcher = None
+        self._counters = {'receives': 0, 'empty_receives': 0, 'received': 0, 'processed': 0}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._prefetcher is not None:
+            raise RuntimeError("Consumer is already running")
+        self._stopping.clear()
+        self._prefetcher = threading.Thread(target=self._prefetch_loop, name="shipping-prefetcher", daemon=True)
+        self._prefetcher.start()
+
+    def stop(self, timeout: float = None):
+        if self._prefetcher is None:
+            return
+        self._stopping.set()
+        self._prefetcher.join(timeout)
+        self._prefetcher = None
+
+    def process_next_batch(self, timeout: float = None):
+        try:
+            messages = self._buffer.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        results = self.service.process_shippings([message['Body'] for message in messages])
+        processed = [
+            message['ReceiptHandle'] for message, result in zip(messages, results)
+            if result is not None and not isinstance(result, Exception)
+        ]
+        if processed:
+            self.publisher.delete_shippings(processed)
+        with self._lock:
+            self._counters['processed'] += len(processed)
+        return results
+
+    def run(self, stop_event: threading.Event):
+        with self:
+            while not stop_event.is_set():
+                self.process_next_batch(timeout=1)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['buffered'] = self._buffer.qsize()
+        stats['empty_rate'] = self.tuner.empty_rate
+        stats['queue_depth'] = self.tuner.queue_depth
+        return stats
+
+    def _prefetch_loop(self):
+        while not self._stopping.is_set():
+            batch_size, wait_time = self.tuner.next_params()
+            try:
+                messages = self.publisher.receive_shippings(batch_size, wait_time)
+            except Exception:
+                self._stopping.wait(1)
+                continue
+            self.tuner.record(len(messages))
+            with self._lock:
+                self._counters['receives'] += 1
+                self._counters['received'] += len(messages)
+                if not messages:
+                    self._counters['empty_receives'] += 1
+            while messages and not self._stopping.is_set():
+                try:
+                    self._buffer.put(messages, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
@@ -0,0 +1,112 @@
+from .config import INVENTORY_TABLE_NAME, INVENTORY_CACHE_SIZE, INVENTORY_CACHE_TTL_SECONDS
+from .db import get_dynamodb_resource
+from .cache import TTLCache
+from .throttle import limiter
+from botocore.exceptions import ClientError
+from uuid import uuid4
+import threading
+
+DYNAMODB_TRANSACT_LIMIT = 100
+
+
+class InventoryRepository:
+    def __init__(self, cache: TTLCache = None):
+        self._table = None
+        self._local = threading.local()
+        if cache is None and INVENTORY_CACHE_SIZE > 0:
+            cache = TTLCache(INVENTORY_CACHE_SIZE, INVENTORY_CACHE_TTL_SECONDS)
+        self.cache = cache
+
+    @property
+    def table(self):
+        if self._table is not None:
+            return self._table
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = self._local.table = get_dynamodb_resource().Table(INVENTORY_TABLE_NAME)
+        return table
+
+    def set_stock(self, product_id, amount: int):
+        limiter.call(
+            'dynamodb.put_item', self.table.put_item,
+            Item={'product_id': str(product_id), 'available_amount': amount}
+        )
+        if self.cache is not None:
+            self.cache.put(str(product_id), amount)
+
+    def restock(self, product_id, amount: int):
+        response = limiter.call(
+            'dynamodb.update_item', self.table.update_item,
+            Key={'product_id': str(product_id)},
+            UpdateExpression='SET available_amount = if_not_exists(available_amount, :zero) + :amount',
+            ExpressionAttributeValues={':amount': amount, ':zero': 0},
+            ReturnValues='UPDATED_NEW'
+        )
+        stock = int(response['Attributes']['available_amount'])
+        if self.cache is not None:
+            self.cache.put(str(product_id), stock)
+        return stock
+
+    def get_stock(self, product_id):
+        if self.cache is None:
+            return self._read_stock(str(product_id))
+        return self.cache.get_or_load(str(product_id), self._read_stock)
+
+    def is_available(self, product_id, amount: int):
+        stock = self.get_stock(product_id)
+        return stock is not None and stock >= amount
+
+    def checkout(self, items: dict, client_request_token: str = None):
+        lines = [(str(product), amount) for product, amount in items.items()]
+        if not lines:
+            return []
+        if len(lines) > DYNAMODB_TRANSACT_LIMIT:
+            raise ValueError("Cannot check out more than %d products at once" % DYNAMODB_TRANSACT_LIMIT)
+        params = {
+            'TransactItems': [
+                {
+                    'Update': {
+                        'TableName': INVENTORY_TABLE_NAME,
+                        'Key': {'product_id': product_id},
+                        'UpdateExpression': 'SET available_amount = available_amount - :amount',
+                        'ConditionExpression': 'available_amount >= :amount',
+                        'ExpressionAttributeValues': {':amount': amount}
+                    }
+                }
+                for product_id, amount in lines
+            ]
+        }
+        # One token for every attempt, so a retried checkout that already committed is not applied twice.
+        params['ClientRequestToken'] = client_request_token or str(uuid4())
+        try:
+            limiter.call(
+                'dynamodb.transact_write_items', self.table.meta.client.transact_write_items,
+                cost=2 * len(lines), **params
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = error.response.get('CancellationReasons', [])
+            failed = [
+                product_id for (product_id, _), reason in zip(lines, reasons)
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            ]
+            if self.cache is not None:
+                for product_id in failed:
+                    self.cache.invalidate(product_id)
+            if failed:
+                raise ValueError("Not enough %s available" % ", ".join(failed)) from error
+            raise
+        if self.cache is not None:
+            for product_id, amount in lines:
+                self.cache.update(product_id, lambda stock, amount=amount: stock - amount)
+        return [product_id for product_id, _ in lines]
+
+    def _read_stock(self, product_id):
+        response = limiter.call(
+            'dynamodb.get_item', self.table.get_item,
+            Key={'product_id': product_id},
+            ProjectionExpression='available_amount'
+        )
+        item = response.get('Item')
+        return int(item['available_amount']) if item is not None else None
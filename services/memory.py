@@ -0,0 +1,1085 @@
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from decimal import Decimal
+from collections import deque
+from contextlib import ExitStack
+import bisect
+import hashlib
+import heapq
+import itertools
+import re
+import threading
+import time
+import uuid
+
+DYNAMODB_BATCH_WRITE_LIMIT = 25
+DYNAMODB_BATCH_GET_LIMIT = 100
+DYNAMODB_TRANSACT_LIMIT = 100
+SCAN_PAGE_SIZE = 1000
+SQS_BATCH_LIMIT = 10
+
+
+def _response(**fields):
+    fields['ResponseMetadata'] = {'HTTPStatusCode': 200, 'RequestId': str(uuid.uuid4())}
+    return fields
+
+
+def _client_error(code, message, operation, **fields):
+    return ClientError(
+        dict(fields, Error={'Code': code, 'Message': message}, ResponseMetadata={'HTTPStatusCode': 400}),
+        operation
+    )
+
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, list):
+        return [_normalize(element) for element in value]
+    if isinstance(value, dict):
+        return {key: _normalize(element) for key, element in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return {_normalize(element) for element in value}
+    raise TypeError("Unsupported type %s for value %r" % (type(value), value))
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [_copy(element) for element in value]
+    if isinstance(value, dict):
+        return {key: _copy(element) for key, element in value.items()}
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+_TOKEN = re.compile(r"\s*(<>|<=|>=|[=<>(),+\-]|:[A-Za-z0-9_]+|#[A-Za-z0-9_]+|[A-Za-z_][A-Za-z0-9_.]*)")
+
+
+class _Expression:
+    def __init__(self, text, names, values):
+        self.tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if match is None:
+                raise _client_error('ValidationException', "Invalid expression: %s" % text, 'Expression')
+            self.tokens.append(match.group(1))
+            position = match.end()
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def keyword(self, word):
+        token = self.peek()
+        if token is not None and token.upper() == word:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise _client_error('ValidationException', "Expected %r in expression" % token, 'Expression')
+        self.position += 1
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def path(self):
+        token = self.take()
+        if token is None:
+            raise _client_error('ValidationException', "Unexpected end of expression", 'Expression')
+        return self.names.get(token, token)
+
+    def operand(self):
+        token = self.peek()
+        if token is None:
+            raise _client_error('ValidationException', "Unexpected end of expression", 'Expression')
+        if token.startswith(':'):
+            self.position += 1
+            if token not in self.values:
+                raise _client_error('ValidationException', "Value %s is not defined" % token, 'Expression')
+            return lambda item: self.values[token]
+        if token.lower() == 'size':
+            self.position += 1
+            self.expect('(')
+            name = self.path()
+            self.expect(')')
+            return lambda item: Decimal(len(item[name])) if name in item else None
+        name = self.path()
+        return lambda item: item.get(name)
+
+
+def _compare(operator, left, right):
+    if operator == '<>':
+        return left != right
+    if left is None or right is None:
+        return False
+    try:
+        if operator == '=':
+            return left == right
+        if operator == '<':
+            return left < right
+        if operator == '<=':
+            return left <= right
+        if operator == '>':
+            return left > right
+        return left >= right
+    except TypeError:
+        return False
+
+
+class _Condition(_Expression):
+    def parse(self):
+        condition = self._or()
+        if self.peek() is not None:
+            raise _client_error('ValidationException', "Unexpected token %r" % self.peek(), 'Expression')
+        return condition
+
+    def _or(self):
+        left = self._and()
+        while self.keyword('OR'):
+            right = self._and()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self.keyword('AND'):
+            right = self._not()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def _not(self):
+        if self.keyword('NOT'):
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._primary()
+
+    def _primary(self):
+        token = self.peek()
+        if token == '(':
+            self.position += 1
+            inner = self._or()
+            self.expect(')')
+            return inner
+        function = token.lower() if token else None
+        if function in ('attribute_exists', 'attribute_not_exists', 'begins_with', 'contains'):
+            self.position += 1
+            self.expect('(')
+            name = self.path()
+            argument = None
+            if function in ('begins_with', 'contains'):
+                self.expect(',')
+                argument = self.operand()
+            self.expect(')')
+            if function == 'attribute_exists':
+                return lambda item: name in item
+            if function == 'attribute_not_exists':
+                return lambda item: name not in item
+            if function == 'begins_with':
+                return lambda item: isinstance(item.get(name), str) and item[name].startswith(argument(item))
+            return lambda item: name in item and argument(item) in item[name]
+        left = self.operand()
+        if self.keyword('BETWEEN'):
+            low = self.operand()
+            if not self.keyword('AND'):
+                raise _client_error('ValidationException', "BETWEEN requires AND", 'Expression')
+            high = self.operand()
+            return lambda item: _compare('>=', left(item), low(item)) and _compare('<=', left(item), high(item))
+        if self.keyword('IN'):
+            self.expect('(')
+            options = [self.operand()]
+            while self.peek() == ',':
+                self.position += 1
+                options.append(self.operand())
+            self.expect(')')
+            return lambda item: any(_compare('=', left(item), option(item)) for option in options)
+        operator = self.take()
+        if operator not in ('=', '<>', '<', '<=', '>', '>='):
+            raise _client_error('ValidationException', "Unknown operator %r" % operator, 'Expression')
+        right = self.operand()
+        return lambda item: _compare(operator, left(item), right(item))
+
+
+class _KeyCondition(_Expression):
+    def parse(self):
+        bounds = {}
+        self._and(bounds)
+        if self.peek() is not None:
+            raise _client_error('ValidationException', "Unexpected token %r" % self.peek(), 'Expression')
+        return bounds
+
+    def _and(self, bounds):
+        self._clause(bounds)
+        while self.keyword('AND'):
+            self._clause(bounds)
+
+    def _clause(self, bounds):
+        if self.peek() == '(':
+            self.position += 1
+            self._and(bounds)
+            self.expect(')')
+            return
+        if (self.peek() or '').lower() == 'begins_with':
+            self.position += 1
+            self.expect('(')
+            name = self.path()
+            self.expect(',')
+            bounds[name] = ('begins_with', self._value())
+            self.expect(')')
+            return
+        name = self.path()
+        if self.keyword('BETWEEN'):
+            low = self._value()
+            if not self.keyword('AND'):
+                raise _client_error('ValidationException', "BETWEEN requires AND", 'Expression')
+            bounds[name] = ('between', low, self._value())
+            return
+        operator = self.take()
+        if operator not in ('=', '<', '<=', '>', '>='):
+            raise _client_error('ValidationException', "Unsupported key condition %r" % operator, 'Expression')
+        bounds[name] = (operator, self._value())
+
+    def _value(self):
+        token = self.take()
+        if token not in self.values:
+            raise _client_error('ValidationException', "Value %s is not defined" % token, 'Expression')
+        return self.values[token]
+
+
+class _Bound:
+    def __init__(self, high):
+        self.high = high
+
+    def __lt__(self, other):
+        return not self.high
+
+    def __gt__(self, other):
+        return self.high
+
+
+_LOW = _Bound(False)
+_HIGH = _Bound(True)
+
+
+def _prefix_end(prefix):
+    for index in range(len(prefix) - 1, -1, -1):
+        if isinstance(prefix, str) and ord(prefix[index]) < 0x10FFFF:
+            return prefix[:index] + chr(ord(prefix[index]) + 1)
+        if isinstance(prefix, bytes) and prefix[index] < 0xFF:
+            return prefix[:index] + bytes([prefix[index] + 1])
+    return None
+
+
+class _Update(_Expression):
+    def parse(self):
+        actions = []
+        while self.peek() is not None:
+            clause = self.take().upper()
+            while True:
+                if clause == 'SET':
+                    name = self.path()
+                    self.expect('=')
+                    value = self._value()
+                    actions.append((lambda n, v: lambda item: item.__setitem__(n, _normalize(v(item))))(name, value))
+                elif clause == 'REMOVE':
+                    name = self.path()
+                    actions.append((lambda n: lambda item: item.pop(n, None))(name))
+                elif clause == 'ADD':
+                    name = self.path()
+                    value = self.operand()
+                    actions.append((lambda n, v: lambda item: _add(item, n, v(item)))(name, value))
+                else:
+                    raise _client_error('ValidationException', "Unsupported update clause %s" % clause, 'Expression')
+                if self.peek() != ',':
+                    break
+                self.position += 1
+
+        def apply(item):
+            for action in actions:
+                action(item)
+        return apply
+
+    def _value(self):
+        left = self._term()
+        token = self.peek()
+        if token in ('+', '-'):
+            self.position += 1
+            right = self._term()
+            if token == '+':
+                return lambda item: left(item) + right(item)
+            return lambda item: left(item) - right(item)
+        return left
+
+    def _term(self):
+        token = self.peek()
+        if token and token.lower() == 'if_not_exists':
+            self.position += 1
+            self.expect('(')
+            name = self.path()
+            self.expect(',')
+            default = self._value()
+            self.expect(')')
+            return lambda item: item[name] if name in item else default(item)
+        if token and token.lower() == 'list_append':
+            self.position += 1
+            self.expect('(')
+            first = self._value()
+            self.expect(',')
+            second = self._value()
+            self.expect(')')
+            return lambda item: list(first(item)) + list(second(item))
+        operand = self.operand()
+        return lambda item: _copy(operand(item))
+
+
+def _add(item, name, value):
+    if name not in item:
+        item[name] = _normalize(value)
+    elif isinstance(item[name], set):
+        item[name] = item[name] | value
+    else:
+        item[name] = item[name] + value
+
+
+def _condition(expression, names, values, operation, is_key_condition=False):
+    if expression is None:
+        return None
+    return _parse(_Condition, expression, names, values, operation, is_key_condition)
+
+
+def _key_bounds(expression, names, values, operation):
+    return _parse(_KeyCondition, expression, names, values, operation, True)
+
+
+def _parse(parser, expression, names, values, operation, is_key_condition=False):
+    if isinstance(expression, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(expression, is_key_condition=is_key_condition)
+        names = dict(names or {}, **built.attribute_name_placeholders)
+        values = dict(values or {}, **built.attribute_value_placeholders)
+        expression = built.condition_expression
+    try:
+        return parser(expression, names, _normalize(values or {})).parse()
+    except ClientError as error:
+        raise _client_error('ValidationException', error.response['Error']['Message'], operation)
+
+
+def _projection(expression, names):
+    if not expression:
+        return None
+    return [(names or {}).get(path.strip(), path.strip()) for path in expression.split(',')]
+
+
+def _project(item, paths):
+    if paths is None:
+        return _copy(item)
+    return {path: _copy(item[path]) for path in paths if path in item}
+
+
+_ATTRIBUTE_TYPES = {'S': str, 'N': Decimal, 'B': bytes}
+
+
+class MemoryTable:
+    def __init__(self, name, key_schema, client, attribute_definitions=None, indexes=None):
+        self.name = name
+        self.table_name = name
+        self.key_schema = key_schema
+        self.key_names = [key['AttributeName'] for key in key_schema]
+        self.meta = type('Meta', (), {'client': client})()
+        self.attribute_types = {}
+        self.indexes = {}
+        self._items = {}
+        self._positions = {}
+        self._order = []
+        self._keys_at = {}
+        self._sorted = {None: {}}
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+        self.define_attributes(attribute_definitions or [])
+        for index in indexes or []:
+            self.add_index(index)
+
+    def _key(self, key, operation):
+        if set(key) != set(self.key_names) or any(key[name] is None for name in self.key_names):
+            raise _client_error(
+                'ValidationException', "The provided key element does not match the schema", operation
+            )
+        return tuple(key[name] for name in self.key_names)
+
+    def define_attributes(self, attribute_definitions):
+        for definition in attribute_definitions:
+            self.attribute_types[definition['AttributeName']] = _ATTRIBUTE_TYPES[definition['AttributeType']]
+
+    def add_index(self, index):
+        with self._lock:
+            self.indexes[index['IndexName']] = dict(index, IndexStatus='ACTIVE')
+            self._sorted[index['IndexName']] = {}
+            schema = [(index['IndexName'], self._key_names(index['IndexName']))]
+            for key, item in self._items.items():
+                self._link(key, item, schema)
+
+    def remove_index(self, index_name):
+        with self._lock:
+            self.indexes.pop(index_name, None)
+            self._sorted.pop(index_name, None)
+
+    def _key_names(self, index_name):
+        if index_name is None:
+            return self.key_names
+        return [key['AttributeName'] for key in self.indexes[index_name]['KeySchema']]
+
+    def _schemas(self):
+        return [(index_name, self._key_names(index_name)) for index_name in self._sorted]
+
+    @staticmethod
+    def _entry(key, item, key_names):
+        if any(name not in item for name in key_names):
+            return None
+        return (item[key_names[1]], key) if len(key_names) > 1 else (key,)
+
+    def _link(self, key, item, schemas):
+        for index_name, key_names in schemas:
+            entry = self._entry(key, item, key_names)
+            if entry is not None:
+                bisect.insort(self._sorted[index_name].setdefault(item[key_names[0]], []), entry)
+
+    def _unlink(self, key, item, schemas):
+        for index_name, key_names in schemas:
+            entry = self._entry(key, item, key_names)
+            if entry is None:
+                continue
+            entries = self._sorted[index_name].get(item[key_names[0]], [])
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+                if not entries:
+                    del self._sorted[index_name][item[key_names[0]]]
+
+    def describe(self):
+        with self._lock:
+            description = {
+                'TableName': self.name,
+                'TableStatus': 'ACTIVE',
+                'KeySchema': self.key_schema,
+                'ItemCount': len(self._items),
+            }
+            if self.indexes:
+                description['GlobalSecondaryIndexes'] = [dict(index) for index in self.indexes.values()]
+            return description
+
+    def _check_types(self, item, operation):
+        names = list(self.key_names)
+        for index in self.indexes.values():
+            names.extend(key['AttributeName'] for key in index['KeySchema'])
+        for name in names:
+            expected = self.attribute_types.get(name)
+            if expected is not None and name in item and not isinstance(item[name], expected):
+                raise _client_error(
+                    'ValidationException', "Type mismatch for key %s, expected %s" % (name, expected.__name__),
+                    operation
+                )
+
+    def _store(self, key, item):
+        self._check_types(item, 'Write')
+        schemas = self._schemas()
+        current = self._items.get(key)
+        if current is None:
+            position = self._positions[key] = next(self._counter)
+            self._order.append(position)
+            self._keys_at[position] = key
+        else:
+            self._unlink(key, current, schemas)
+        self._items[key] = item
+        self._link(key, item, schemas)
+
+    def _discard(self, key):
+        current = self._items.pop(key, None)
+        if current is None:
+            return
+        self._unlink(key, current, self._schemas())
+        position = self._positions[key]
+        del self._order[bisect.bisect_left(self._order, position)]
+        del self._keys_at[position]
+
+    def _check(self, current, expression, names, values, operation):
+        condition = _condition(expression, names, values, operation)
+        if condition is not None and not condition(current or {}):
+            raise _client_error('ConditionalCheckFailedException', "The conditional request failed", operation)
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE'):
+        item = _normalize(Item)
+        key = self._key({name: item.get(name) for name in self.key_names}, 'PutItem')
+        with self._lock:
+            current = self._items.get(key)
+            self._check(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+            self._store(key, item)
+        if ReturnValues == 'ALL_OLD' and current is not None:
+            return _response(Attributes=_copy(current))
+        return _response()
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False):
+        key = self._key(Key, 'GetItem')
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return _response()
+            return _response(Item=_project(item, _projection(ProjectionExpression, ExpressionAttributeNames)))
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE'):
+        key = self._key(Key, 'UpdateItem')
+        update = _Update(UpdateExpression, ExpressionAttributeNames, _normalize(ExpressionAttributeValues or {})).parse()
+        with self._lock:
+            current = self._items.get(key)
+            self._check(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+            item = _copy(current) if current is not None else dict(_normalize(Key))
+            update(item)
+            self._store(key, item)
+        if ReturnValues == 'ALL_NEW':
+            return _response(Attributes=_copy(item))
+        if ReturnValues == 'ALL_OLD' and current is not None:
+            return _response(Attributes=_copy(current))
+        if ReturnValues == 'UPDATED_NEW':
+            return _response(Attributes={
+                name: _copy(value) for name, value in item.items() if current is None or current.get(name) != value
+            })
+        return _response()
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE'):
+        key = self._key(Key, 'DeleteItem')
+        with self._lock:
+            current = self._items.get(key)
+            self._check(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'DeleteItem')
+            self._discard(key)
+        if ReturnValues == 'ALL_OLD' and current is not None:
+            return _response(Attributes=_copy(current))
+        return _response()
+
+    def scan(self, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, ExclusiveStartKey=None, Limit=None, Segment=None, TotalSegments=None,
+             ConsistentRead=False):
+        condition = _condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'Scan')
+        paths = _projection(ProjectionExpression, ExpressionAttributeNames)
+        page_size = Limit or SCAN_PAGE_SIZE
+        with self._lock:
+            start = 0
+            if ExclusiveStartKey is not None:
+                cursor = self._positions.get(self._key(_normalize(ExclusiveStartKey), 'Scan'), -1)
+                start = bisect.bisect_right(self._order, cursor)
+            page = []
+            more = False
+            for index in range(start, len(self._order)):
+                key = self._keys_at[self._order[index]]
+                if TotalSegments and _segment(key, TotalSegments) != Segment:
+                    continue
+                if len(page) == page_size:
+                    more = True
+                    break
+                page.append(key)
+            items = [self._items[key] for key in page]
+            matched = [_project(item, paths) for item in items if condition is None or condition(item)]
+        response = _response(Items=matched, Count=len(matched), ScannedCount=len(items))
+        if more:
+            response['LastEvaluatedKey'] = dict(zip(self.key_names, page[-1]))
+        return response
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, ExclusiveStartKey=None, Limit=None,
+              ScanIndexForward=True, ConsistentRead=False, Select=None):
+        if IndexName is not None and IndexName not in self.indexes:
+            raise _client_error('ValidationException', "The table does not have the specified index", 'Query')
+        key_names = self._key_names(IndexName)
+        range_name = key_names[1] if len(key_names) > 1 else None
+        bounds = _key_bounds(KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'Query')
+        if bounds.get(key_names[0], (None,))[0] != '=' or set(bounds) - set(key_names):
+            raise _client_error('ValidationException', "Query condition missed key schema element", 'Query')
+        condition = _condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'Query')
+        paths = _projection(ProjectionExpression, ExpressionAttributeNames)
+        page_size = Limit or SCAN_PAGE_SIZE
+
+        with self._lock:
+            entries = self._sorted[IndexName].get(bounds[key_names[0]][1], [])
+            low, high = _range(entries, bounds.get(range_name))
+            if ExclusiveStartKey is not None:
+                start_key = _normalize(ExclusiveStartKey)
+                cursor = self._entry(
+                    tuple(start_key[name] for name in self.key_names), start_key, key_names
+                )
+                if ScanIndexForward:
+                    low = max(low, bisect.bisect_right(entries, cursor))
+                else:
+                    high = min(high, bisect.bisect_left(entries, cursor))
+            if ScanIndexForward:
+                selected = entries[low:min(high, low + page_size)]
+            else:
+                selected = entries[max(low, high - page_size):high][::-1]
+            page = [self._items[entry[-1]] for entry in selected]
+            items = [_project(item, paths) for item in page if condition is None or condition(item)]
+        response = _response(Items=items, Count=len(items), ScannedCount=len(page))
+        if page_size < high - low:
+            last = page[-1]
+            response['LastEvaluatedKey'] = {
+                name: last[name] for name in dict.fromkeys(self.key_names + key_names)
+            }
+        return response
+
+    def item_count(self):
+        with self._lock:
+            return len(self._items)
+
+
+def _range(entries, bound):
+    if bound is None:
+        return 0, len(entries)
+    operator, value = bound[0], bound[1]
+    if operator == '=':
+        return bisect.bisect_left(entries, (value, _LOW)), bisect.bisect_right(entries, (value, _HIGH))
+    if operator == '<':
+        return 0, bisect.bisect_left(entries, (value, _LOW))
+    if operator == '<=':
+        return 0, bisect.bisect_right(entries, (value, _HIGH))
+    if operator == '>':
+        return bisect.bisect_right(entries, (value, _HIGH)), len(entries)
+    if operator == '>=':
+        return bisect.bisect_left(entries, (value, _LOW)), len(entries)
+    if operator == 'between':
+        return bisect.bisect_left(entries, (value, _LOW)), bisect.bisect_right(entries, (bound[2], _HIGH))
+    end = _prefix_end(value)
+    high = bisect.bisect_left(entries, (end, _LOW)) if end is not None else len(entries)
+    return bisect.bisect_left(entries, (value, _LOW)), high
+
+
+def _segment(key, total_segments):
+    digest = hashlib.md5(repr(key).encode()).digest()
+    return int.from_bytes(digest[:4], 'big') % total_segments
+
+
+class MemoryDynamoClient:
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def create_table(self, TableName, KeySchema, AttributeDefinitions=None, GlobalSecondaryIndexes=None, **kwargs):
+        with self._lock:
+            if TableName in self._tables:
+                raise _client_error('ResourceInUseException', "Table already exists: %s" % TableName, 'CreateTable')
+            table = self._tables[TableName] = MemoryTable(
+                TableName, KeySchema, self, AttributeDefinitions, GlobalSecondaryIndexes
+            )
+        return _response(TableDescription=table.describe())
+
+    def describe_table(self, TableName):
+        return _response(Table=self.table(TableName).describe())
+
+    def update_table(self, TableName, AttributeDefinitions=None, GlobalSecondaryIndexUpdates=None, **kwargs):
+        table = self.table(TableName)
+        table.define_attributes(AttributeDefinitions or [])
+        for update in GlobalSecondaryIndexUpdates or []:
+            if 'Create' in update:
+                table.add_index(update['Create'])
+            elif 'Delete' in update:
+                table.remove_index(update['Delete']['IndexName'])
+        return _response(TableDescription=table.describe())
+
+    def delete_table(self, TableName):
+        with self._lock:
+            if self._tables.pop(TableName, None) is None:
+                raise _client_error('ResourceNotFoundException', "Table not found: %s" % TableName, 'DeleteTable')
+        return _response()
+
+    def list_tables(self):
+        with self._lock:
+            return _response(TableNames=sorted(self._tables))
+
+    def table(self, name):
+        with self._lock:
+            table = self._tables.get(name)
+        if table is None:
+            raise _client_error('ResourceNotFoundException', "Requested resource not found", 'Table')
+        return table
+
+    def batch_write_item(self, RequestItems):
+        requests = [(name, request) for name, table_requests in RequestItems.items() for request in table_requests]
+        if not requests or len(requests) > DYNAMODB_BATCH_WRITE_LIMIT:
+            raise _client_error(
+                'ValidationException', "Member must have length between 1 and 25", 'BatchWriteItem'
+            )
+        for name, request in requests:
+            table = self.table(name)
+            if 'PutRequest' in request:
+                table.put_item(Item=request['PutRequest']['Item'])
+            else:
+                table.delete_item(Key=request['DeleteRequest']['Key'])
+        return _response(UnprocessedItems={})
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        total = 0
+        for name, request in RequestItems.items():
+            table = self.table(name)
+            keys = [tuple(sorted(key.items())) for key in request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise _client_error(
+                    'ValidationException', "Provided list of item keys contains duplicates", 'BatchGetItem'
+                )
+            total += len(keys)
+            responses[name] = []
+            for key in request['Keys']:
+                item = table.get_item(
+                    Key=key,
+                    ProjectionExpression=request.get('ProjectionExpression'),
+                    ExpressionAttributeNames=request.get('ExpressionAttributeNames')
+                ).get('Item')
+                if item is not None:
+                    responses[name].append(item)
+        if total > DYNAMODB_BATCH_GET_LIMIT:
+            raise _client_error('ValidationException', "Too many items requested", 'BatchGetItem')
+        return _response(Responses=responses, UnprocessedKeys={})
+
+    def transact_write_items(self, TransactItems, ClientRequestToken=None):
+        if not TransactItems or len(TransactItems) > DYNAMODB_TRANSACT_LIMIT:
+            raise _client_error(
+                'ValidationException', "Member must have length between 1 and 100", 'TransactWriteItems'
+            )
+        operations = []
+        for request in TransactItems:
+            (kind, params), = request.items()
+            table = self.table(params['TableName'])
+            item = _normalize(params['Item']) if kind == 'Put' else None
+            key = table._key(
+                {name: item.get(name) for name in table.key_names} if kind == 'Put' else _normalize(params['Key']),
+                'TransactWriteItems'
+            )
+            if kind == 'Update':
+                _Update(params['UpdateExpression'], params.get('ExpressionAttributeNames'),
+                        _normalize(params.get('ExpressionAttributeValues') or {})).parse()
+            operations.append((kind, table, key, params))
+        if len({(table.name, key) for _, table, key, _ in operations}) != len(operations):
+            raise _client_error(
+                'ValidationException', "Transaction request cannot include multiple operations on one item",
+                'TransactWriteItems'
+            )
+        tables = sorted({table.name: table for _, table, _, _ in operations}.items())
+        with ExitStack() as stack:
+            for _, table in tables:
+                stack.enter_context(table._lock)
+            reasons = []
+            for kind, table, key, params in operations:
+                try:
+                    table._check(table._items.get(key), params.get('ConditionExpression'),
+                                 params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues'),
+                                 'TransactWriteItems')
+                    reasons.append({'Code': 'None'})
+                except ClientError:
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': "The conditional request failed"})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise _client_error(
+                    'TransactionCanceledException',
+                    "Transaction cancelled, please refer cancellation reasons for specific reasons [%s]"
+                    % ", ".join(reason['Code'] for reason in reasons),
+                    'TransactWriteItems', CancellationReasons=reasons
+                )
+            for kind, table, key, params in operations:
+                names = params.get('ExpressionAttributeNames')
+                values = params.get('ExpressionAttributeValues')
+                if kind == 'Put':
+                    table.put_item(Item=params['Item'])
+                elif kind == 'Update':
+                    table.update_item(Key=params['Key'], UpdateExpression=params['UpdateExpression'],
+                                      ExpressionAttributeNames=names, ExpressionAttributeValues=values)
+                elif kind == 'Delete':
+                    table.delete_item(Key=params['Key'])
+        return _response()
+
+
+class MemoryDynamoResource:
+    def __init__(self, client: MemoryDynamoClient = None):
+        self.meta = type('Meta', (), {'client': client or MemoryDynamoClient()})()
+
+    def Table(self, name):
+        return self.meta.client.table(name)
+
+    def create_table(self, **kwargs):
+        self.meta.client.create_table(**kwargs)
+        return self.Table(kwargs['TableName'])
+
+    def batch_write_item(self, RequestItems):
+        return self.meta.client.batch_write_item(RequestItems=RequestItems)
+
+    def batch_get_item(self, RequestItems):
+        return self.meta.client.batch_get_item(RequestItems=RequestItems)
+
+
+class _Message:
+    __slots__ = ('message_id', 'body', 'attributes', 'receipt_handle', 'visible_at', 'version', 'receive_count',
+                 'sent_at')
+
+    def __init__(self, body, attributes, visible_at):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.attributes = attributes
+        self.receipt_handle = None
+        self.visible_at = visible_at
+        self.version = 0
+        self.receive_count = 0
+        self.sent_at = time.time()
+
+
+class MemoryQueue:
+    def __init__(self, name, url, visibility_timeout=30, delay_seconds=0, clock=time.monotonic):
+        self.name = name
+        self.url = url
+        self.visibility_timeout = visibility_timeout
+        self.delay_seconds = delay_seconds
+        self._clock = clock
+        self._ready = deque()
+        self._hidden = []
+        self._in_flight = {}
+        self._delayed = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def send(self, body, attributes=None, delay_seconds=None):
+        delay = self.delay_seconds if delay_seconds is None else delay_seconds
+        message = _Message(body, attributes or {}, self._clock() + delay)
+        with self._condition:
+            if delay > 0:
+                self._delayed += 1
+                heapq.heappush(self._hidden, (message.visible_at, next(self._sequence), message.version, message))
+            else:
+                self._ready.append(message)
+                self._condition.notify()
+        return message
+
+    def receive(self, max_messages=1, wait_time=0, visibility_timeout=None):
+        visibility_timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        deadline = self._clock() + wait_time
+        with self._condition:
+            while True:
+                now = self._clock()
+                self._promote(now)
+                if self._ready or now >= deadline:
+                    break
+                timeout = deadline - now
+                if self._hidden:
+                    timeout = min(timeout, max(0.0, self._hidden[0][0] - now))
+                self._condition.wait(timeout)
+            messages = []
+            while len(messages) < max_messages and self._ready:
+                message = self._ready.popleft()
+                message.version += 1
+                message.receive_count += 1
+                message.receipt_handle = str(uuid.uuid4())
+                message.visible_at = now + visibility_timeout
+                self._in_flight[message.receipt_handle] = message
+                heapq.heappush(self._hidden, (message.visible_at, next(self._sequence), message.version, message))
+                messages.append(message)
+            return messages
+
+    def delete(self, receipt_handle):
+        with self._condition:
+            message = self._in_flight.pop(receipt_handle, None)
+            if message is None:
+                return False
+            message.version += 1
+            return True
+
+    def change_visibility(self, receipt_handle, visibility_timeout):
+        with self._condition:
+            message = self._in_flight.get(receipt_handle)
+            if message is None:
+                return False
+            message.version += 1
+            message.visible_at = self._clock() + visibility_timeout
+            heapq.heappush(self._hidden, (message.visible_at, next(self._sequence), message.version, message))
+            if visibility_timeout == 0:
+                self._condition.notify()
+            return True
+
+    def purge(self):
+        with self._condition:
+            self._ready = deque()
+            self._hidden = []
+            self._in_flight = {}
+            self._delayed = 0
+
+    def attributes(self):
+        with self._condition:
+            self._promote(self._clock())
+            return {
+                'ApproximateNumberOfMessages': str(len(self._ready)),
+                'ApproximateNumberOfMessagesNotVisible': str(len(self._in_flight)),
+                'ApproximateNumberOfMessagesDelayed': str(self._delayed),
+                'VisibilityTimeout': str(self.visibility_timeout),
+                'DelaySeconds': str(self.delay_seconds),
+            }
+
+    def _promote(self, now):
+        while self._hidden and self._hidden[0][0] <= now:
+            _, _, version, message = heapq.heappop(self._hidden)
+            if version != message.version:
+                continue
+            if message.receipt_handle is None:
+                self._delayed -= 1
+            else:
+                self._in_flight.pop(message.receipt_handle, None)
+                message.receipt_handle = None
+            message.version += 1
+            self._ready.append(message)
+            self._condition.notify()
+
+
+class MemorySQSClient:
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def create_queue(self, QueueName, Attributes=None):
+        attributes = Attributes or {}
+        with self._lock:
+            url = "memory://sqs/%s" % QueueName
+            if url not in self._queues:
+                self._queues[url] = MemoryQueue(
+                    QueueName, url,
+                    visibility_timeout=int(attributes.get('VisibilityTimeout', 30)),
+                    delay_seconds=int(attributes.get('DelaySeconds', 0))
+                )
+        return _response(QueueUrl=url)
+
+    def get_queue_url(self, QueueName):
+        url = "memory://sqs/%s" % QueueName
+        with self._lock:
+            if url not in self._queues:
+                raise _client_error(
+                    'AWS.SimpleQueueService.NonExistentQueue', "The specified queue does not exist", 'GetQueueUrl'
+                )
+        return _response(QueueUrl=url)
+
+    def delete_queue(self, QueueUrl):
+        with self._lock:
+            self._queues.pop(QueueUrl, None)
+        return _response()
+
+    def queue(self, url):
+        with self._lock:
+            queue = self._queues.get(url)
+        if queue is None:
+            raise _client_error(
+                'AWS.SimpleQueueService.NonExistentQueue', "The specified queue does not exist", 'Queue'
+            )
+        return queue
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=None, MessageAttributes=None, **kwargs):
+        message = self.queue(QueueUrl).send(MessageBody, MessageAttributes, DelaySeconds)
+        return _response(MessageId=message.message_id, MD5OfMessageBody=_md5(MessageBody))
+
+    def send_message_batch(self, QueueUrl, Entries):
+        queue = self.queue(QueueUrl)
+        _check_batch(Entries, 'SendMessageBatch')
+        successful = []
+        for entry in Entries:
+            message = queue.send(entry['MessageBody'], entry.get('MessageAttributes'), entry.get('DelaySeconds'))
+            successful.append({
+                'Id': entry['Id'], 'MessageId': message.message_id, 'MD5OfMessageBody': _md5(entry['MessageBody'])
+            })
+        return _response(Successful=successful, Failed=[])
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=None,
+                        MessageAttributeNames=None, AttributeNames=None, **kwargs):
+        if not 1 <= MaxNumberOfMessages <= SQS_BATCH_LIMIT:
+            raise _client_error(
+                'InvalidParameterValue', "MaxNumberOfMessages must be between 1 and 10", 'ReceiveMessage'
+            )
+        messages = self.queue(QueueUrl).receive(MaxNumberOfMessages, WaitTimeSeconds, VisibilityTimeout)
+        if not messages:
+            return _response()
+        return _response(Messages=[
+            {
+                'MessageId': message.message_id,
+                'ReceiptHandle': message.receipt_handle,
+                'MD5OfBody': _md5(message.body),
+                'Body': message.body,
+                'Attributes': {
+                    'ApproximateReceiveCount': str(message.receive_count),
+                    'SentTimestamp': str(int(message.sent_at * 1000)),
+                },
+                'MessageAttributes': dict(message.attributes),
+            }
+            for message in messages
+        ])
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.queue(QueueUrl).delete(ReceiptHandle)
+        return _response()
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        queue = self.queue(QueueUrl)
+        _check_batch(Entries, 'DeleteMessageBatch')
+        for entry in Entries:
+            queue.delete(entry['ReceiptHandle'])
+        return _response(Successful=[{'Id': entry['Id']} for entry in Entries], Failed=[])
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        if not self.queue(QueueUrl).change_visibility(ReceiptHandle, VisibilityTimeout):
+            raise _client_error(
+                'MessageNotInflight', "Message is not in flight", 'ChangeMessageVisibility'
+            )
+        return _response()
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        queue = self.queue(QueueUrl)
+        _check_batch(Entries, 'ChangeMessageVisibilityBatch')
+        successful = []
+        failed = []
+        for entry in Entries:
+            if queue.change_visibility(entry['ReceiptHandle'], entry['VisibilityTimeout']):
+                successful.append({'Id': entry['Id']})
+            else:
+                failed.append({
+                    'Id': entry['Id'], 'Code': 'MessageNotInflight', 'Message': "Message is not in flight",
+                    'SenderFault': True
+                })
+        return _response(Successful=successful, Failed=failed)
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames=None):
+        attributes = self.queue(QueueUrl).attributes()
+        if AttributeNames and 'All' not in AttributeNames:
+            attributes = {name: value for name, value in attributes.items() if name in AttributeNames}
+        return _response(Attributes=attributes)
+
+    def purge_queue(self, QueueUrl):
+        self.queue(QueueUrl).purge()
+        return _response()
+
+
+def _md5(body):
+    return hashlib.md5(body.encode('utf-8')).hexdigest()
+
+
+def _check_batch(entries, operation):
+    if not entries:
+        raise _client_error(
+            'AWS.SimpleQueueService.EmptyBatchRequest', "There should be at least one entry in the request", operation
+        )
+    if len(entries) > SQS_BATCH_LIMIT:
+        raise _client_error(
+            'AWS.SimpleQueueService.TooManyEntriesInBatchRequest', "Maximum number of entries per request are 10",
+            operation
+        )
+    if len({entry['Id'] for entry in entries}) != len(entries):
+        raise _client_error(
+            'AWS.SimpleQueueService.BatchEntryIdsNotDistinct', "Two or more batch entries have the same Id", operation
+        )
@@ -0,0 +1,253 @@
+from .config import METRICS_ENABLED
+from botocore.exceptions import ClientError
+from bisect import bisect_left
+from functools import wraps
+import asyncio
+import os
+import threading
+import time
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+THROTTLE_CODES = frozenset({
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded", "Throttling",
+    "ThrottledException", "TooManyRequestsException",
+})
+COUNTERS = ("errors", "retries", "throttles", "duplicates")
+
+
+class _Shard:
+    __slots__ = ("counts", "count", "sum", "counters")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        for counter, value in other.counters.items():
+            self.counters[counter] += value
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS, max_shards: int = 64):
+        self.buckets = buckets
+        self.max_shards = max_shards
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(len(buckets))
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        shard = self._shard()
+        shard.counts[bisect_left(self.buckets, seconds)] += 1
+        shard.count += 1
+        shard.sum += seconds
+
+    def increment(self, counter: str, amount: int = 1):
+        self._shard().counters[counter] += amount
+
+    def state(self):
+        total = _Shard(len(self.buckets))
+        with self._lock:
+            total.merge(self._retired)
+            for _, shard in self._shards:
+                total.merge(shard)
+        return total.counts, total.count, total.sum, total.counters
+
+    def quantile(self, fraction: float, counts=None, total=None):
+        if counts is None:
+            counts, total, _, _ = self.state()
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else self.buckets[-2]
+        return self.buckets[-2]
+
+    def snapshot(self):
+        counts, total, seconds, counters = self.state()
+        snapshot = dict(counters, count=total, sum=seconds)
+        snapshot["mean_ms"] = seconds / total * 1000 if total else 0.0
+        for name, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            snapshot[name] = self.quantile(fraction, counts, total) * 1000
+        return snapshot
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = self._local.shard = _Shard(len(self.buckets))
+        with self._lock:
+            if len(self._shards) >= self.max_shards:
+                self._retire_finished()
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_finished(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.started)
+        if exc_value is not None:
+            _record_error(self.histogram, exc_value)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True, prefix: str = "shipping"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, operation: str):
+        histogram = self._histograms.get(operation)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(operation, Histogram())
+        return histogram
+
+    def timer(self, operation: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(operation))
+
+    def call(self, operation: str, method, **params):
+        if not self.enabled:
+            return method(**params)
+        histogram = self.histogram(operation)
+        started = time.perf_counter()
+        try:
+            response = method(**params)
+        except Exception as error:
+            _record_error(histogram, error)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+        retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0) if isinstance(response, dict) else 0
+        if retries:
+            histogram.increment("retries", retries)
+        return response
+
+    def observe(self, operation: str, seconds: float):
+        if self.enabled:
+            self.histogram(operation).observe(seconds)
+
+    def increment(self, operation: str, counter: str, amount: int = 1):
+        if self.enabled:
+            self.histogram(operation).increment(counter, amount)
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {operation: histogram.snapshot() for operation, histogram in sorted(histograms.items())}
+
+    def prometheus(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        name = "%s_operation_duration_seconds" % self.prefix
+        lines = [
+            "# HELP %s Latency of shipping operations and AWS calls." % name,
+            "# TYPE %s histogram" % name,
+        ]
+        counters = {counter: [] for counter in COUNTERS}
+        for operation, histogram in histograms:
+            counts, total, seconds, values = histogram.state()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, counts):
+                cumulative += count
+                lines.append('%s_bucket{operation="%s",le="%s"} %d' % (name, operation, _bound(bound), cumulative))
+            lines.append('%s_sum{operation="%s"} %r' % (name, operation, seconds))
+            lines.append('%s_count{operation="%s"} %d' % (name, operation, total))
+            for counter in COUNTERS:
+                counters[counter].append('%s_operation_%s_total{operation="%s"} %d' % (
+                    self.prefix, counter, operation, values[counter]
+                ))
+        for counter in COUNTERS:
+            lines.append("# HELP %s_operation_%s_total Shipping operation %s." % (self.prefix, counter, counter))
+            lines.append("# TYPE %s_operation_%s_total counter" % (self.prefix, counter))
+            lines.extend(counters[counter])
+        return "\n".join(lines) + "\n"
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def _record_error(histogram, error):
+    histogram.increment("errors")
+    if is_throttle(error):
+        histogram.increment("throttles")
+
+
+def timed(operation: str):
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if not metrics.enabled:
+                    return await function(*args, **kwargs)
+                with _Timer(metrics.histogram(operation)):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            with _Timer(metrics.histogram(operation)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=metrics.reset)
@@ -0,0 +1,122 @@
+from .config import OUTBOX_RECOVERY_GRACE_SECONDS
+from .publisher import ShardedPublisher
+from datetime import datetime, timedelta, timezone
+import queue
+import threading
+import time
+
+SQS_MAX_BATCH = 10
+
+
+class OutboxRelay:
+    def __init__(self, repository, publisher, linger: float = 0.05, retry_delay: float = 1.0):
+        self.repository = repository
+        self.publisher = publisher
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self._pending = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'published': 0, 'publish_failed': 0, 'recovered': 0, 'unmark_failed': 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self, recover: bool = True):
+        if self._thread is not None:
+            raise RuntimeError("Outbox relay is already running")
+        self._stopping.clear()
+        if recover:
+            self.recover()
+        self._thread = threading.Thread(target=self._relay_loop, name="shipping-outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, shipping_id: str, shipping_type: str = None):
+        self._increment('enqueued')
+        self._pending.put((shipping_id, shipping_type))
+
+    def recover(self, grace_seconds: int = OUTBOX_RECOVERY_GRACE_SECONDS):
+        older_than = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+        recovered = 0
+        for shipping in self.repository.find_pending_publish(older_than):
+            self._pending.put((shipping['shipping_id'], shipping.get('shipping_type')))
+            recovered += 1
+        self._increment('recovered', recovered)
+        return recovered
+
+    def flush(self):
+        while not self._pending.empty():
+            self._publish(self._take_batch(block=False))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pending'] = self._pending.qsize()
+        return stats
+
+    def _increment(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _relay_loop(self):
+        while not self._stopping.is_set() or not self._pending.empty():
+            batch = self._take_batch(block=not self._stopping.is_set())
+            if batch:
+                self._publish(batch)
+
+    def _take_batch(self, block: bool):
+        try:
+            batch = [self._pending.get(timeout=0.1) if block else self._pending.get_nowait()]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.linger
+        while len(batch) < SQS_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if block and remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _publish(self, batch):
+        if not batch:
+            return
+        shipping_types = dict(batch)
+        params = {}
+        if isinstance(self.publisher, ShardedPublisher):
+            params['shipping_types'] = shipping_types
+        try:
+            _, errors = self.publisher.send_new_shippings(list(shipping_types), **params)
+        except Exception:
+            errors = {shipping_id: None for shipping_id in shipping_types}
+        self._increment('published', len(shipping_types) - len(errors))
+        self._unmark([shipping_id for shipping_id in shipping_types if shipping_id not in errors])
+        if errors:
+            self._increment('publish_failed', len(errors))
+            if not self._stopping.wait(self.retry_delay):
+                for shipping_id in errors:
+                    self._pending.put((shipping_id, shipping_types[shipping_id]))
+
+    def _unmark(self, shipping_ids):
+        # Clear the marker as soon as the send succeeds, so a restart does not publish the shipment again.
+        # If this write fails the marker stays and recovery re-sends it, which the queue already tolerates.
+        if not shipping_ids:
+            return
+        try:
+            errors = self.repository.clear_publish_pending(shipping_ids)
+        except Exception:
+            errors = shipping_ids
+        if errors:
+            self._increment('unmark_failed', len(errors))
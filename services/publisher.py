@@ -1,44 +1,371 @@
-import boto3
-from .config import AWS_ENDPOINT_URL, AWS_REGION, SHIPPING_QUEUE
+from .config import (
+    SHIPPING_QUEUE, BATCH_MAX_ATTEMPTS, PUBLISH_LINGER_SECONDS, PUBLISH_BUFFER_SIZE,
+    PUBLISH_DEDUP_CACHE_SIZE, PUBLISH_DEDUP_TTL_SECONDS
+)
+from .backends import get_client
+from .cache import TTLCache
+from .metrics import metrics
+from .throttle import limiter
+from concurrent.futures import Future
+import hashlib
+import queue
+import threading
+import time
+
+SQS_BATCH_LIMIT = 10
+SQS_MAX_DELAY_SECONDS = 900
+CARRIER_QUEUE_SUFFIXES = {
+    'Нова Пошта': 'nova-poshta',
+    'Укр Пошта': 'ukr-poshta',
+    'Meest Express': 'meest-express',
+    'Самовивіз': 'pickup',
+}
 
 class ShippingPublisher:
-    def __init__(self):
+    def __init__(self, sent: TTLCache = None, queue_name: str = SHIPPING_QUEUE):
+        self.queue_name = queue_name
         self._client = None
         self._queue_url = None
+        if sent is None and PUBLISH_DEDUP_CACHE_SIZE > 0:
+            sent = TTLCache(PUBLISH_DEDUP_CACHE_SIZE, PUBLISH_DEDUP_TTL_SECONDS)
+        self.sent = sent
     
     @property
     def client(self):
         if self._client is None:
-            self._client = boto3.client(
-                "sqs",
-                endpoint_url=AWS_ENDPOINT_URL,
-                region_name=AWS_REGION,
-                aws_access_key_id="test",
-                aws_secret_access_key="test",
-            )
+            self._client = get_client("sqs")
         return self._client
     
     @property
     def queue_url(self):
         if self._queue_url is None:
-            response = self.client.create_queue(QueueName=SHIPPING_QUEUE)
+            response = self.client.create_queue(QueueName=self.queue_name)
             self._queue_url = response["QueueUrl"]
         return self._queue_url
     
-    def send_new_shipping(self, shipping_id: str):
-        response = self.client.send_message(
-            QueueUrl=self.queue_url,
-            MessageBody=shipping_id
-        )
+    def send_new_shipping(self, shipping_id: str, delay_seconds: int = 0):
+        message_id = self._already_sent(shipping_id, 'sqs.send_message')
+        if message_id is not None:
+            return message_id
+        params = {'QueueUrl': self.queue_url, 'MessageBody': shipping_id}
+        if delay_seconds:
+            params['DelaySeconds'] = min(int(delay_seconds), SQS_MAX_DELAY_SECONDS)
+        response = limiter.call('sqs.send_message', self.client.send_message, **params)
+        self._mark_sent(shipping_id, response['MessageId'])
         return response['MessageId']
+
+    def send_new_shippings(self, shipping_ids: list, delays: dict = None):
+        message_ids = {}
+        errors = {}
+        if self.sent is not None:
+            for shipping_id in shipping_ids:
+                message_id = self._already_sent(shipping_id, 'sqs.send_message_batch')
+                if message_id is not None:
+                    message_ids[shipping_id] = message_id
+            shipping_ids = [shipping_id for shipping_id in shipping_ids if shipping_id not in message_ids]
+        for start in range(0, len(shipping_ids), SQS_BATCH_LIMIT):
+            chunk = shipping_ids[start:start + SQS_BATCH_LIMIT]
+            try:
+                response = limiter.call(
+                    'sqs.send_message_batch', self.client.send_message_batch,
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        _batch_entry(index, shipping_id, (delays or {}).get(shipping_id))
+                        for index, shipping_id in enumerate(chunk)
+                    ]
+                )
+            except Exception as error:
+                # Earlier chunks are already on the queue, so report this one as failed and keep going.
+                for shipping_id in chunk:
+                    errors[shipping_id] = str(error)
+                continue
+            for entry in response.get('Successful', []):
+                message_ids[chunk[int(entry['Id'])]] = entry['MessageId']
+                self._mark_sent(chunk[int(entry['Id'])], entry['MessageId'])
+            for entry in response.get('Failed', []):
+                errors[chunk[int(entry['Id'])]] = entry.get('Message', entry['Code'])
+        return message_ids, errors
+
+    def _already_sent(self, shipping_id, operation):
+        if self.sent is None:
+            return None
+        message_id = self.sent.get(shipping_id)
+        if message_id is not None:
+            metrics.increment(operation, 'duplicates')
+        return message_id
+
+    def _mark_sent(self, shipping_id, message_id):
+        if self.sent is not None:
+            self.sent.put(shipping_id, message_id)
     
     def poll_shipping(self, batch_size: int = 10):
-        messages = self.client.receive_message(
+        return [message['Body'] for message in self.receive_shippings(batch_size)]
+
+    def receive_shippings(self, batch_size: int = 10, wait_time: int = 10, visibility_timeout: int = None,
+                          attributes: list = None):
+        params = {
+            'QueueUrl': self.queue_url,
+            'MessageAttributeNames': ['All'],
+            'MaxNumberOfMessages': batch_size,
+            'WaitTimeSeconds': wait_time
+        }
+        if visibility_timeout is not None:
+            params['VisibilityTimeout'] = visibility_timeout
+        if attributes:
+            params['AttributeNames'] = attributes
+        messages = limiter.call('sqs.receive_message', self.client.receive_message, **params)
+        return messages.get('Messages', [])
+
+    def queue_depth(self):
+        response = limiter.call(
+            'sqs.get_queue_attributes', self.client.get_queue_attributes,
             QueueUrl=self.queue_url,
-            MessageAttributeNames=['All'],
-            MaxNumberOfMessages=batch_size,
-            WaitTimeSeconds=10
+            AttributeNames=['ApproximateNumberOfMessages']
         )
-        if 'Messages' not in messages:
+        return int(response['Attributes']['ApproximateNumberOfMessages'])
+
+    def delete_shippings(self, receipt_handles: list):
+        errors = {}
+        for start in range(0, len(receipt_handles), SQS_BATCH_LIMIT):
+            chunk = receipt_handles[start:start + SQS_BATCH_LIMIT]
+            response = limiter.call(
+                'sqs.delete_message_batch', self.client.delete_message_batch,
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(index), 'ReceiptHandle': receipt_handle}
+                    for index, receipt_handle in enumerate(chunk)
+                ]
+            )
+            for entry in response.get('Failed', []):
+                errors[chunk[int(entry['Id'])]] = entry.get('Message', entry['Code'])
+        return errors
+
+    def extend_visibility(self, receipt_handles: list, visibility_timeout: int):
+        errors = {}
+        for start in range(0, len(receipt_handles), SQS_BATCH_LIMIT):
+            chunk = receipt_handles[start:start + SQS_BATCH_LIMIT]
+            response = limiter.call(
+                'sqs.change_message_visibility_batch', self.client.change_message_visibility_batch,
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(index), 'ReceiptHandle': receipt_handle, 'VisibilityTimeout': visibility_timeout}
+                    for index, receipt_handle in enumerate(chunk)
+                ]
+            )
+            for entry in response.get('Failed', []):
+                errors[chunk[int(entry['Id'])]] = entry.get('Message', entry['Code'])
+        return errors
+
+
+class ShardedPublisher:
+    def __init__(self, shipping_types: list, sent: TTLCache = None, queue_name: str = SHIPPING_QUEUE,
+                 publisher_class=ShippingPublisher):
+        self.default = publisher_class(sent=sent, queue_name=queue_name)
+        self.carriers = {
+            shipping_type: publisher_class(sent=sent, queue_name=carrier_queue_name(shipping_type, queue_name))
+            for shipping_type in shipping_types
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        for publisher in self.publishers():
+            if isinstance(publisher, BatchingPublisher):
+                publisher.start()
+
+    def stop(self, timeout: float = None):
+        for publisher in self.publishers():
+            if isinstance(publisher, BatchingPublisher):
+                publisher.stop(timeout)
+
+    def for_carrier(self, shipping_type: str):
+        return self.carriers.get(shipping_type, self.default)
+
+    def publishers(self):
+        return [self.default] + list(self.carriers.values())
+
+    def send_new_shipping(self, shipping_id: str, delay_seconds: int = 0, shipping_type: str = None):
+        return self.for_carrier(shipping_type).send_new_shipping(shipping_id, delay_seconds)
+
+    def send_new_shippings(self, shipping_ids: list, delays: dict = None, shipping_types: dict = None):
+        groups = {}
+        for shipping_id in shipping_ids:
+            publisher = self.for_carrier((shipping_types or {}).get(shipping_id))
+            groups.setdefault(publisher, []).append(shipping_id)
+        message_ids = {}
+        errors = {}
+        for publisher, group in groups.items():
+            sent, failed = publisher.send_new_shippings(group, delays)
+            message_ids.update(sent)
+            errors.update(failed)
+        return message_ids, errors
+
+    def queue_depths(self):
+        return {publisher.queue_name: publisher.queue_depth() for publisher in self.publishers()}
+
+
+class BatchingPublisher(ShippingPublisher):
+    def __init__(self, linger: float = PUBLISH_LINGER_SECONDS, buffer_size: int = PUBLISH_BUFFER_SIZE,
+                 max_attempts: int = BATCH_MAX_ATTEMPTS, sent: TTLCache = None, queue_name: str = SHIPPING_QUEUE):
+        super().__init__(sent, queue_name)
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self._pending = queue.Queue(maxsize=buffer_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._accepting = threading.Lock()
+        self._queue_urls = {}
+        self._counters = {'submitted': 0, 'sent': 0, 'failed': 0, 'retried': 0, 'requests': 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Batching publisher is already running")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._send_loop, name="shipping-batch-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        if self._thread is None:
+            return
+        # Taken with the same lock as send_new_shipping, so every accepted message is in the buffer the loop drains.
+        with self._accepting:
+            self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopping.is_set()
+
+    def send_new_shipping(self, shipping_id: str, delay_seconds: int = 0, shipping_type: str = None,
+                          timeout: float = None):
+        future = Future()
+        message_id = self._already_sent(shipping_id, 'sqs.send_message_batch')
+        if message_id is not None:
+            future.set_result(message_id)
+            return future
+        queue_url = self.carrier_queue_url(shipping_type)
+        with self._accepting:
+            if not self.running:
+                raise RuntimeError("Batching publisher is not running")
+            self._pending.put((shipping_id, delay_seconds, future, queue_url), timeout=timeout)
+        self._increment('submitted')
+        return future
+
+    def carrier_queue_url(self, shipping_type: str = None):
+        if shipping_type is None:
+            return self.queue_url
+        queue_name = carrier_queue_name(shipping_type, self.queue_name)
+        queue_url = self._queue_urls.get(queue_name)
+        if queue_url is None:
+            queue_url = self._queue_urls[queue_name] = self.client.create_queue(QueueName=queue_name)["QueueUrl"]
+        return queue_url
+
+    def flush(self):
+        while not self._pending.empty():
+            self._send(self._take_batch(block=False))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pending'] = self._pending.qsize()
+        stats['messages_per_request'] = stats['sent'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def _increment(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _send_loop(self):
+        while not self._stopping.is_set() or not self._pending.empty():
+            batch = self._take_batch(block=not self._stopping.is_set())
+            if batch:
+                self._send(batch)
+
+    def _take_batch(self, block: bool):
+        try:
+            batch = [self._pending.get(timeout=0.1) if block else self._pending.get_nowait()]
+        except queue.Empty:
             return []
-        return [msg['Body'] for msg in messages['Messages']]
\ No newline at end of file
+        deadline = time.monotonic() + self.linger
+        while len(batch) < SQS_BATCH_LIMIT:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if block and remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        groups = {}
+        for message in batch:
+            groups.setdefault(message[3], []).append(message)
+        for queue_url, group in groups.items():
+            self._send_to(queue_url, group)
+
+    def _send_to(self, queue_url, batch):
+        attempt = 0
+        while batch:
+            attempt += 1
+            self._increment('requests')
+            try:
+                response = limiter.call(
+                    'sqs.send_message_batch', self.client.send_message_batch,
+                    QueueUrl=queue_url,
+                    Entries=[
+                        _batch_entry(index, shipping_id, delay_seconds)
+                        for index, (shipping_id, delay_seconds, _, _) in enumerate(batch)
+                    ]
+                )
+            except Exception as error:
+                response = {'Failed': [
+                    {'Id': str(index), 'Code': type(error).__name__, 'Message': str(error), 'SenderFault': False}
+                    for index in range(len(batch))
+                ]}
+            for entry in response.get('Successful', []):
+                shipping_id, _, future, _ = batch[int(entry['Id'])]
+                self._mark_sent(shipping_id, entry['MessageId'])
+                future.set_result(entry['MessageId'])
+            self._increment('sent', len(response.get('Successful', [])))
+            retry = []
+            for entry in response.get('Failed', []):
+                message = batch[int(entry['Id'])]
+                if entry.get('SenderFault') or attempt >= self.max_attempts:
+                    message[2].set_exception(RuntimeError(
+                        "Shipping %s was not published: %s" % (message[0], entry.get('Message', entry['Code']))
+                    ))
+                    self._increment('failed')
+                else:
+                    retry.append(message)
+            if retry:
+                self._increment('retried', len(retry))
+                metrics.increment('sqs.send_message_batch', 'retries', len(retry))
+                limiter.backoff(attempt)
+            batch = retry
+
+
+def carrier_queue_name(shipping_type: str, queue_name: str = SHIPPING_QUEUE):
+    suffix = CARRIER_QUEUE_SUFFIXES.get(shipping_type)
+    if suffix is None:
+        suffix = hashlib.sha1(shipping_type.encode('utf-8')).hexdigest()[:12]
+    return '%s-%s' % (queue_name, suffix)
+
+
+def _batch_entry(index, shipping_id, delay_seconds):
+    entry = {'Id': str(index), 'MessageBody': shipping_id}
+    if delay_seconds:
+        entry['DelaySeconds'] = min(int(delay_seconds), SQS_MAX_DELAY_SECONDS)
+    return entry
@@ -1,41 +1,386 @@
-from .config import SHIPPING_TABLE_NAME
+from .config import (
+    SHIPPING_TABLE_NAME, BATCH_MAX_ATTEMPTS, STATUS_UPDATE_WORKERS,
+    SHIPPING_CACHE_SIZE, SHIPPING_CACHE_TTL_SECONDS, SHIPPING_ITEM_FORMAT,
+    SHIPPING_ORDER_INDEX, SHIPPING_STATUS_INDEX, SHIPPING_PUBLISH_INDEX, PUBLISH_PENDING_SHARDS,
+    WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_LINGER_SECONDS, WRITE_BEHIND_MAX_ATTEMPTS
+)
 from .db import get_dynamodb_resource
+from .cache import TTLCache
+from .writebuffer import WriteBehindBuffer
+from .metrics import metrics
+from .throttle import limiter
+from .codec import (
+    encode_shipping_item, encode_timestamp, decode_shipping_item, source_fields, project, projection_params
+)
+from .schema import SHIPPING_ATTRIBUTE_DEFINITIONS, SHIPPING_INDEXES
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 from uuid import uuid4
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import zlib
+
+DYNAMODB_BATCH_WRITE_LIMIT = 25
+DYNAMODB_BATCH_GET_LIMIT = 100
+
 
 class ShippingRepository:
-    def __init__(self):
+    def __init__(self, cache: TTLCache = None, item_format: int = SHIPPING_ITEM_FORMAT):
         self._table = None
-    
+        self._local = threading.local()
+        self.item_format = item_format
+        if cache is None and SHIPPING_CACHE_SIZE > 0:
+            cache = TTLCache(SHIPPING_CACHE_SIZE, SHIPPING_CACHE_TTL_SECONDS)
+        self.cache = cache
+        self.write_buffer = None
+
     @property
     def table(self):
-        if self._table is None:
-            dynamo_resource = get_dynamodb_resource()
-            self._table = dynamo_resource.Table(SHIPPING_TABLE_NAME)
-        return self._table
-    
-    def get_shipping(self, shipping_id):
-        response = self.table.get_item(Key={"shipping_id": shipping_id})
+        if self._table is not None:
+            return self._table
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = self._local.table = get_dynamodb_resource().Table(SHIPPING_TABLE_NAME)
+        return table
+
+    def get_shipping(self, shipping_id, fields: list = None):
+        if self.cache is None:
+            item = self._get_item(shipping_id, source_fields(fields))
+        else:
+            item = self.cache.get_or_load(shipping_id, self._get_item)
+        return self._with_pending(project(decode_shipping_item(item), fields), fields)
+
+    def get_shippings(self, shipping_ids: list, fields: list = None):
+        if self.cache is not None:
+            items = {}
+            missing = []
+            for shipping_id in dict.fromkeys(shipping_ids):
+                item = self.cache.get(shipping_id)
+                if item is None:
+                    missing.append(shipping_id)
+                else:
+                    items[shipping_id] = project(decode_shipping_item(item), fields)
+            for shipping_id, item in self._batch_get(missing).items():
+                self.cache.put(shipping_id, dict(item))
+                items[shipping_id] = project(decode_shipping_item(item), fields)
+        else:
+            items = self._batch_get(list(dict.fromkeys(shipping_ids)), source_fields(fields))
+            items = {shipping_id: project(decode_shipping_item(item), fields) for shipping_id, item in items.items()}
+        if self.write_buffer is not None:
+            items = {shipping_id: self._with_pending(item, fields) for shipping_id, item in items.items()}
+        return items
+
+    def write_behind(self, max_pending: int = WRITE_BEHIND_MAX_PENDING, linger: float = WRITE_BEHIND_LINGER_SECONDS,
+                     max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS):
+        if self.write_buffer is not None and self.write_buffer.running:
+            raise RuntimeError("Write-behind buffering is already enabled")
+        self.write_buffer = WriteBehindBuffer(self._write_statuses, max_pending, linger, max_attempts)
+        self.write_buffer.start()
+        return self.write_buffer
+
+    def flush(self):
+        if self.write_buffer is None:
+            return {}
+        return self.write_buffer.flush()
+
+    def _buffering(self):
+        return self.write_buffer is not None and self.write_buffer.running
+
+    def _with_pending(self, item, fields):
+        if item is None or self.write_buffer is None or (fields is not None and 'shipping_status' not in fields):
+            return item
+        status = self.write_buffer.get(item['shipping_id'])
+        return _with_status(item, status) if status is not None else item
+
+    def _get_item(self, shipping_id, fields=None):
+        params = projection_params(fields) if fields else {}
+        response = limiter.call("dynamodb.get_item", self.table.get_item, Key={"shipping_id": shipping_id}, **params)
         return response.get("Item")
-    
-    def create_shipping(self, shipping_type: str, product_ids: list, order_id: str, status: str, due_date: datetime):
-        shipping_id = str(uuid4())
-        item = {
-            "shipping_id": shipping_id,
-            "shipping_type": shipping_type,
-            "order_id": order_id,
-            "product_ids": ",".join(product_ids),
-            "shipping_status": status,
-            "created_date": datetime.now(timezone.utc).isoformat(),
-            "due_date": due_date.replace(tzinfo=timezone.utc).isoformat()
+
+    def _batch_get(self, shipping_ids, fields=None):
+        client = self.table.meta.client
+        keys = [{"shipping_id": shipping_id} for shipping_id in shipping_ids]
+        params = projection_params(fields) if fields else {}
+        items = {}
+        for start in range(0, len(keys), DYNAMODB_BATCH_GET_LIMIT):
+            request = {SHIPPING_TABLE_NAME: dict(params, Keys=keys[start:start + DYNAMODB_BATCH_GET_LIMIT])}
+            attempt = 0
+            while request:
+                response = limiter.call(
+                    "dynamodb.batch_get_item", client.batch_get_item,
+                    cost=len(request[SHIPPING_TABLE_NAME]["Keys"]), RequestItems=request
+                )
+                for item in response.get("Responses", {}).get(SHIPPING_TABLE_NAME, []):
+                    items[item["shipping_id"]] = item
+                request = response.get("UnprocessedKeys")
+                attempt += 1
+                if request and attempt >= BATCH_MAX_ATTEMPTS:
+                    raise RuntimeError("Shippings were not read after %d attempts" % attempt)
+                if request:
+                    metrics.increment("dynamodb.batch_get_item", "retries")
+                    limiter.throttled("dynamodb.batch_get_item")
+                    limiter.backoff(attempt)
+        return items
+
+    def create_shipping(self, shipping_type: str, product_ids: list, order_id: str, status: str, due_date: datetime,
+                        pending_publish: bool = False):
+        item = self._build_item(shipping_type, product_ids, order_id, status, due_date, pending_publish)
+        limiter.call("dynamodb.put_item", self.table.put_item, Item=item)
+        if self.cache is not None:
+            self.cache.put(item["shipping_id"], dict(item))
+        return item["shipping_id"]
+
+    def create_shippings(self, shippings: list, status: str, pending_publish: bool = False):
+        items = [
+            self._build_item(shipping_type, product_ids, order_id, status, due_date, pending_publish)
+            for shipping_type, product_ids, order_id, due_date in shippings
+        ]
+        unprocessed = self._batch_write(items)
+        shipping_ids = []
+        errors = {}
+        for index, item in enumerate(items):
+            if item["shipping_id"] in unprocessed:
+                shipping_ids.append(None)
+                errors[index] = "Shipping was not written after %d attempts" % BATCH_MAX_ATTEMPTS
+            else:
+                shipping_ids.append(item["shipping_id"])
+                if self.cache is not None:
+                    self.cache.put(item["shipping_id"], dict(item))
+        return shipping_ids, errors
+
+    def update_shipping_status(self, shipping_id, status, expected_status=None, due_before: datetime = None,
+                               due_not_before: datetime = None):
+        conditional = expected_status is not None or due_before is not None or due_not_before is not None
+        if self._buffering():
+            if not conditional:
+                self.write_buffer.put(shipping_id, status)
+                if self.cache is not None:
+                    self.cache.update(shipping_id, lambda item: _with_status(item, status))
+                return {'ResponseMetadata': {'HTTPStatusCode': 202}}
+            self.write_buffer.flush([shipping_id])
+        return self._write_status(shipping_id, status, expected_status, due_before, due_not_before)
+
+    def update_shipping_statuses(self, statuses: dict, expected_status=None):
+        if self._buffering():
+            if expected_status is None:
+                return {
+                    shipping_id: self.update_shipping_status(shipping_id, status)
+                    for shipping_id, status in statuses.items()
+                }, {}
+            self.write_buffer.flush(list(statuses))
+        return self._write_statuses(statuses, expected_status)
+
+    def _write_status(self, shipping_id, status, expected_status=None, due_before=None, due_not_before=None):
+        params = {
+            'Key': {'shipping_id': shipping_id},
+            'UpdateExpression': 'SET shipping_status = :sh_status REMOVE publish_pending, publish_shard',
+            'ExpressionAttributeValues': {':sh_status': status}
         }
-        self.table.put_item(Item=item)
-        return shipping_id
-    
-    def update_shipping_status(self, shipping_id, status):
-        response = self.table.update_item(
+        conditions = []
+        if isinstance(expected_status, str):
+            conditions.append('shipping_status = :expected_status')
+            params['ExpressionAttributeValues'][':expected_status'] = expected_status
+        elif expected_status is not None:
+            names = [':expected_status_%d' % index for index in range(len(expected_status))]
+            conditions.append('shipping_status IN (%s)' % ', '.join(names))
+            params['ExpressionAttributeValues'].update(zip(names, expected_status))
+        for name, operator, due in (('due_before', '<', due_before), ('due_not_before', '>=', due_not_before)):
+            if due is None:
+                continue
+            # Items written before due_at existed only carry the ISO due_date, which is always UTC with a
+            # +00:00 offset and therefore orders correctly as a string.
+            conditions.append('(due_at {0} :{1}_at OR (attribute_not_exists(due_at) AND due_date {0} :{1}_date))'
+                              .format(operator, name))
+            params['ExpressionAttributeValues'][':%s_at' % name] = encode_timestamp(due)
+            params['ExpressionAttributeValues'][':%s_date' % name] = due.astimezone(timezone.utc).isoformat()
+        if conditions:
+            params['ConditionExpression'] = ' AND '.join(conditions)
+        try:
+            response = limiter.call("dynamodb.update_item", self.table.update_item, **params)
+        except Exception:
+            if self.cache is not None:
+                self.cache.invalidate(shipping_id)
+            raise
+        if self.cache is not None:
+            self.cache.update(shipping_id, lambda item: _with_status(item, status))
+        return response
+
+    def _write_statuses(self, statuses, expected_status=None):
+        results = {}
+        errors = {}
+        if not statuses:
+            return results, errors
+        workers = min(STATUS_UPDATE_WORKERS, len(statuses))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                shipping_id: executor.submit(self._write_status, shipping_id, status, expected_status)
+                for shipping_id, status in statuses.items()
+            }
+            for shipping_id, future in futures.items():
+                try:
+                    results[shipping_id] = future.result()
+                except Exception as error:
+                    errors[shipping_id] = error
+        return results, errors
+
+    def clear_publish_pending(self, shipping_ids: list):
+        errors = {}
+        if not shipping_ids:
+            return errors
+        workers = min(STATUS_UPDATE_WORKERS, len(shipping_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                shipping_id: executor.submit(self._clear_publish_pending, shipping_id)
+                for shipping_id in shipping_ids
+            }
+            for shipping_id, future in futures.items():
+                try:
+                    future.result()
+                except Exception as error:
+                    # A failed condition means the status write already removed the marker.
+                    if not is_condition_failure(error):
+                        errors[shipping_id] = error
+        return errors
+
+    def _clear_publish_pending(self, shipping_id):
+        limiter.call(
+            "dynamodb.update_item", self.table.update_item,
             Key={'shipping_id': shipping_id},
-            UpdateExpression='SET shipping_status = :sh_status',
-            ExpressionAttributeValues={':sh_status': status}
+            UpdateExpression='REMOVE publish_pending, publish_shard',
+            ConditionExpression='attribute_exists(publish_pending)'
         )
-        return response
\ No newline at end of file
+        if self.cache is not None:
+            self.cache.update(shipping_id, _without_publish_pending)
+
+    def find_shippings_by_order(self, order_id: str, fields: list = None, page_size: int = None):
+        return self._query(SHIPPING_ORDER_INDEX, Key("order_id").eq(str(order_id)), fields, page_size)
+
+    def find_shippings_by_status(self, status: str, due_before: datetime = None, due_after: datetime = None,
+                                 fields: list = None, page_size: int = None):
+        condition = Key("shipping_status").eq(status)
+        if due_before is not None and due_after is not None:
+            condition &= Key("due_at").between(encode_timestamp(due_after), encode_timestamp(due_before))
+        elif due_before is not None:
+            condition &= Key("due_at").lt(encode_timestamp(due_before))
+        elif due_after is not None:
+            condition &= Key("due_at").gt(encode_timestamp(due_after))
+        return self._query(SHIPPING_STATUS_INDEX, condition, fields, page_size)
+
+    def ensure_indexes(self):
+        client = self.table.meta.client
+        existing = {
+            index["IndexName"]
+            for index in client.describe_table(TableName=SHIPPING_TABLE_NAME)["Table"].get("GlobalSecondaryIndexes", [])
+        }
+        created = []
+        for index in SHIPPING_INDEXES:
+            if index["IndexName"] in existing:
+                continue
+            client.update_table(
+                TableName=SHIPPING_TABLE_NAME,
+                AttributeDefinitions=SHIPPING_ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexUpdates=[{"Create": index}]
+            )
+            self._wait_for_index(index["IndexName"])
+            created.append(index["IndexName"])
+        return created
+
+    def _wait_for_index(self, index_name, timeout: float = 300):
+        client = self.table.meta.client
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            indexes = client.describe_table(TableName=SHIPPING_TABLE_NAME)["Table"].get("GlobalSecondaryIndexes", [])
+            if any(index["IndexName"] == index_name and index.get("IndexStatus") == "ACTIVE" for index in indexes):
+                return
+            time.sleep(1)
+        raise TimeoutError("Index %s did not become active" % index_name)
+
+    def _query(self, index_name, key_condition, fields, page_size):
+        params = {"IndexName": index_name, "KeyConditionExpression": key_condition}
+        if fields:
+            params.update(projection_params(fields))
+        if page_size:
+            params["Limit"] = page_size
+        while True:
+            response = limiter.call("dynamodb.query", self.table.query, **params)
+            for item in response.get("Items", []):
+                yield item
+            if "LastEvaluatedKey" not in response:
+                break
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def find_pending_publish(self, older_than: datetime):
+        for shard in range(PUBLISH_PENDING_SHARDS):
+            condition = Key("publish_shard").eq(shard) & Key("publish_pending").lt(encode_timestamp(older_than))
+            yield from self._query(SHIPPING_PUBLISH_INDEX, condition, ["shipping_type"], None)
+
+    def scan_shippings(self, segment: int = None, total_segments: int = None, page_size: int = None):
+        params = {}
+        if total_segments:
+            params["Segment"] = segment
+            params["TotalSegments"] = total_segments
+        if page_size:
+            params["Limit"] = page_size
+        while True:
+            response = limiter.call("dynamodb.scan", self.table.scan, **params)
+            for item in response.get("Items", []):
+                yield item
+            if "LastEvaluatedKey" not in response:
+                break
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def put_shippings(self, items: list):
+        unprocessed = self._batch_write(items)
+        if self.cache is not None:
+            for item in items:
+                self.cache.invalidate(item["shipping_id"])
+        return unprocessed
+
+    def _build_item(self, shipping_type, product_ids, order_id, status, due_date, pending_publish=False):
+        item = encode_shipping_item(
+            str(uuid4()), shipping_type, product_ids, order_id, status, due_date, self.item_format
+        )
+        if pending_publish:
+            item["publish_pending"] = encode_timestamp(datetime.now(timezone.utc))
+            item["publish_shard"] = zlib.crc32(item["shipping_id"].encode()) % PUBLISH_PENDING_SHARDS
+        return item
+
+    def _batch_write(self, items):
+        client = self.table.meta.client
+        unprocessed = set()
+        for start in range(0, len(items), DYNAMODB_BATCH_WRITE_LIMIT):
+            requests = [{"PutRequest": {"Item": item}} for item in items[start:start + DYNAMODB_BATCH_WRITE_LIMIT]]
+            attempt = 0
+            while requests:
+                response = limiter.call(
+                    "dynamodb.batch_write_item", client.batch_write_item,
+                    cost=len(requests), RequestItems={SHIPPING_TABLE_NAME: requests}
+                )
+                requests = response.get("UnprocessedItems", {}).get(SHIPPING_TABLE_NAME, [])
+                attempt += 1
+                if requests and attempt >= BATCH_MAX_ATTEMPTS:
+                    unprocessed.update(request["PutRequest"]["Item"]["shipping_id"] for request in requests)
+                    break
+                if requests:
+                    metrics.increment("dynamodb.batch_write_item", "retries")
+                    limiter.throttled("dynamodb.batch_write_item")
+                    limiter.backoff(attempt)
+        return unprocessed
+
+
+def is_condition_failure(error):
+    return isinstance(error, ClientError) and \
+        error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def _with_status(item, status):
+    return _without_publish_pending(dict(item, shipping_status=status))
+
+
+def _without_publish_pending(item):
+    item = dict(item)
+    item.pop("publish_pending", None)
+    item.pop("publish_shard", None)
+    return item
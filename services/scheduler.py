@@ -0,0 +1,164 @@
+from .config import SCHEDULER_TICK_SECONDS, SCHEDULER_LEAD_SECONDS, SCHEDULER_BATCH_SIZE
+from .codec import decode_timestamp
+from .publisher import SQS_MAX_DELAY_SECONDS
+from .service import ShippingService
+from .repository import is_condition_failure
+from datetime import datetime
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    def __init__(self, repository, tick: float = SCHEDULER_TICK_SECONDS, lead: int = SCHEDULER_LEAD_SECONDS,
+                 batch_size: int = SCHEDULER_BATCH_SIZE, clock=time.time):
+        self.repository = repository
+        self.tick = tick
+        self.lead = lead
+        self.batch_size = batch_size
+        self.clock = clock
+        self._heap = []
+        self._due = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._counters = {'tracked': 0, 'recovered': 0, 'expired': 0, 'skipped': 0, 'expire_failed': 0}
+        self._last_lag = 0.0
+        self._retry_at = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self, recover: bool = True):
+        if self._thread is not None:
+            raise RuntimeError("Expiry scheduler is already running")
+        self._stopping.clear()
+        if recover:
+            self.recover()
+        self._thread = threading.Thread(target=self._expiry_loop, name="shipping-expiry-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def track(self, shipping_id: str, due_date):
+        due_at = due_date.timestamp() if isinstance(due_date, datetime) else decode_timestamp(due_date)
+        with self._lock:
+            self._due[shipping_id] = due_at
+            heapq.heappush(self._heap, (due_at, shipping_id))
+            self._counters['tracked'] += 1
+
+    def untrack(self, shipping_id: str):
+        with self._lock:
+            self._due.pop(shipping_id, None)
+
+    def recover(self):
+        recovered = 0
+        for shipping in self.repository.find_shippings_by_status(
+            ShippingService.SHIPPING_IN_PROGRESS, fields=['due_at']
+        ):
+            if 'due_at' in shipping:
+                self.track(shipping['shipping_id'], shipping['due_at'])
+                recovered += 1
+        with self._lock:
+            self._counters['recovered'] += recovered
+        return recovered
+
+    def processing_delay(self, due_date: datetime):
+        delay = due_date.timestamp() - self.clock() - self.lead
+        return int(min(max(delay, 0), SQS_MAX_DELAY_SECONDS))
+
+    def expire_due(self):
+        expired = []
+        while True:
+            batch = self._take_overdue()
+            if not batch:
+                return expired
+            try:
+                results, errors = self.repository.update_shipping_statuses(
+                    {shipping_id: ShippingService.SHIPPING_FAILED for shipping_id, _ in batch},
+                    expected_status=ShippingService.SHIPPING_IN_PROGRESS
+                )
+            except Exception:
+                self._retry(batch)
+                raise
+            retry = [
+                (shipping_id, due_at) for shipping_id, due_at in batch
+                if shipping_id in errors and not is_condition_failure(errors[shipping_id])
+            ]
+            with self._lock:
+                self._counters['expired'] += len(results)
+                self._counters['skipped'] += len(errors) - len(retry)
+            expired.extend(shipping_id for shipping_id, _ in batch if shipping_id in results)
+            if retry:
+                self._retry(retry)
+                return expired
+
+    def pending(self):
+        with self._lock:
+            return len(self._due)
+
+    def lag(self):
+        with self._lock:
+            self._discard_stale()
+            if not self._heap:
+                return 0.0
+            return max(0.0, self.clock() - self._heap[0][0])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._due)
+            stats['last_lag'] = self._last_lag
+        stats['lag'] = self.lag()
+        return stats
+
+    def _take_overdue(self):
+        now = self.clock()
+        batch = []
+        with self._lock:
+            while self._heap and len(batch) < self.batch_size:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due_at, shipping_id = heapq.heappop(self._heap)
+                del self._due[shipping_id]
+                self._last_lag = now - due_at
+                batch.append((shipping_id, due_at))
+        return batch
+
+    def _retry(self, batch):
+        for shipping_id, due_at in batch:
+            self.track(shipping_id, due_at)
+        with self._lock:
+            self._counters['expire_failed'] += len(batch)
+        self._retry_at = self.clock() + self.tick
+
+    def _discard_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _expiry_loop(self):
+        while not self._stopping.wait(self._next_wait()):
+            try:
+                self.expire_due()
+            except Exception:
+                logger.exception("Expiring overdue shipments failed, will retry")
+
+    def _next_wait(self):
+        with self._lock:
+            self._discard_stale()
+            if not self._heap or self._retry_at > self.clock():
+                return self.tick
+            return min(self.tick, max(0.0, self._heap[0][0] - self.clock()))
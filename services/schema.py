@@ -0,0 +1,56 @@
+from .config import (
+    SHIPPING_TABLE_NAME, INVENTORY_TABLE_NAME, SHIPPING_ORDER_INDEX, SHIPPING_STATUS_INDEX, SHIPPING_PUBLISH_INDEX
+)
+
+SHIPPING_ATTRIBUTE_DEFINITIONS = [
+    {"AttributeName": "shipping_id", "AttributeType": "S"},
+    {"AttributeName": "order_id", "AttributeType": "S"},
+    {"AttributeName": "shipping_status", "AttributeType": "S"},
+    {"AttributeName": "due_at", "AttributeType": "N"},
+    {"AttributeName": "publish_shard", "AttributeType": "N"},
+    {"AttributeName": "publish_pending", "AttributeType": "N"},
+]
+
+SHIPPING_INDEXES = [
+    {
+        "IndexName": SHIPPING_ORDER_INDEX,
+        "KeySchema": [{"AttributeName": "order_id", "KeyType": "HASH"}],
+        "Projection": {"ProjectionType": "ALL"},
+    },
+    {
+        "IndexName": SHIPPING_STATUS_INDEX,
+        "KeySchema": [
+            {"AttributeName": "shipping_status", "KeyType": "HASH"},
+            {"AttributeName": "due_at", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "ALL"},
+    },
+    {
+        # Sparse: only shipments still waiting for the outbox carry publish_shard and publish_pending.
+        "IndexName": SHIPPING_PUBLISH_INDEX,
+        "KeySchema": [
+            {"AttributeName": "publish_shard", "KeyType": "HASH"},
+            {"AttributeName": "publish_pending", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["shipping_type"]},
+    },
+]
+
+
+def shipping_table_definition():
+    return {
+        "TableName": SHIPPING_TABLE_NAME,
+        "KeySchema": [{"AttributeName": "shipping_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": SHIPPING_ATTRIBUTE_DEFINITIONS,
+        "GlobalSecondaryIndexes": SHIPPING_INDEXES,
+        "BillingMode": "PAY_PER_REQUEST",
+    }
+
+
+def inventory_table_definition():
+    return {
+        "TableName": INVENTORY_TABLE_NAME,
+        "KeySchema": [{"AttributeName": "product_id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [{"AttributeName": "product_id", "AttributeType": "S"}],
+        "BillingMode": "PAY_PER_REQUEST",
+    }
@@ -1,5 +1,12 @@
 from .repository import ShippingRepository
-from .publisher import ShippingPublisher
+from .publisher import ShippingPublisher, ShardedPublisher
+from .codec import decode_due_at
+from .config import PROCESSED_CACHE_SIZE, PROCESSED_CACHE_TTL_SECONDS
+from .cache import TTLCache
+from .metrics import metrics, timed
+from .repository import is_condition_failure
+from botocore.exceptions import ClientError
+from concurrent.futures import Future
 from datetime import datetime, timezone
 
 class ShippingService:
@@ -7,47 +14,214 @@ class ShippingService:
     SHIPPING_IN_PROGRESS: str = 'in progress'
     SHIPPING_COMPLETED: str = 'completed'
     SHIPPING_FAILED: str = 'failed'
+    ACTIVE_STATUSES: tuple = (SHIPPING_CREATED, SHIPPING_IN_PROGRESS)
+    PROCESSING_SKIPPED: str = 'skipped'
     
-    def __init__(self, repository, publisher):
+    def __init__(self, repository, publisher, outbox=None, scheduler=None, processed: TTLCache = None):
         self.repository = repository
         self.publisher = publisher
+        self.outbox = outbox
+        self.scheduler = scheduler
+        if processed is None and PROCESSED_CACHE_SIZE > 0:
+            processed = TTLCache(PROCESSED_CACHE_SIZE, PROCESSED_CACHE_TTL_SECONDS)
+        self.processed = processed
     
     @staticmethod
     def list_available_shipping_type():
         return ['Нова Пошта', 'Укр Пошта', 'Meest Express', 'Самовивіз']
     
-    def create_shipping(self, shipping_type, product_ids, order_id, due_date, allow_past_due=False):
+    def validate_shipping(self, shipping_type, due_date, allow_past_due=False):
         if shipping_type not in self.list_available_shipping_type():
             raise ValueError("Shipping type is not available")
         if not allow_past_due and due_date <= datetime.now(timezone.utc):
             raise ValueError("Shipping due datetime must be greater than datetime now")
+
+    @timed('service.create_shipping')
+    def create_shipping(self, shipping_type, product_ids, order_id, due_date, allow_past_due=False):
+        self.validate_shipping(shipping_type, due_date, allow_past_due)
+        if self.outbox is not None:
+            shipping_id = self.repository.create_shipping(
+                shipping_type, product_ids, order_id, self.SHIPPING_IN_PROGRESS, due_date, pending_publish=True
+            )
+            self.outbox.enqueue(shipping_id, shipping_type)
+            self._track(shipping_id, due_date)
+            return shipping_id
         shipping_id = self.repository.create_shipping(shipping_type, product_ids, order_id, self.SHIPPING_CREATED, due_date)
-        self.publisher.send_new_shipping(shipping_id)
+        params = {}
+        if self.scheduler is not None:
+            params['delay_seconds'] = self.scheduler.processing_delay(due_date)
+        if isinstance(self.publisher, ShardedPublisher):
+            params['shipping_type'] = shipping_type
+        sent = self.publisher.send_new_shipping(shipping_id, **params)
         self.repository.update_shipping_status(shipping_id, self.SHIPPING_IN_PROGRESS)
+        self._track(shipping_id, due_date)
+        if isinstance(sent, Future):
+            sent.add_done_callback(lambda future: self._published(shipping_id, future))
         return shipping_id
+
+    @timed('service.create_shippings')
+    def create_shippings(self, requests, allow_past_due=False):
+        shipping_ids = [None] * len(requests)
+        errors = {}
+        valid = []
+        for index, request in enumerate(requests):
+            try:
+                self.validate_shipping(request['shipping_type'], request['due_date'], allow_past_due)
+            except ValueError as error:
+                errors[index] = str(error)
+                continue
+            valid.append(index)
+        created_ids, write_errors = self.repository.create_shippings(
+            [
+                (requests[index]['shipping_type'], requests[index]['product_ids'],
+                 requests[index]['order_id'], requests[index]['due_date'])
+                for index in valid
+            ],
+            self.SHIPPING_CREATED if self.outbox is None else self.SHIPPING_IN_PROGRESS,
+            pending_publish=self.outbox is not None
+        )
+        for position, error in write_errors.items():
+            errors[valid[position]] = error
+        if self.outbox is not None:
+            for position, shipping_id in enumerate(created_ids):
+                if shipping_id is not None:
+                    self.outbox.enqueue(shipping_id, requests[valid[position]]['shipping_type'])
+                    self._track(shipping_id, requests[valid[position]]['due_date'])
+                    shipping_ids[valid[position]] = shipping_id
+            return shipping_ids, errors
+        created = {
+            shipping_id: valid[position]
+            for position, shipping_id in enumerate(created_ids)
+            if shipping_id is not None
+        }
+        params = {}
+        if self.scheduler is not None:
+            params['delays'] = {
+                shipping_id: self.scheduler.processing_delay(requests[index]['due_date'])
+                for shipping_id, index in created.items()
+            }
+        if isinstance(self.publisher, ShardedPublisher):
+            params['shipping_types'] = {
+                shipping_id: requests[index]['shipping_type'] for shipping_id, index in created.items()
+            }
+        _, send_errors = self.publisher.send_new_shippings(list(created), **params)
+        for shipping_id, error in send_errors.items():
+            errors[created.pop(shipping_id)] = error
+        _, update_errors = self.repository.update_shipping_statuses(
+            {shipping_id: self.SHIPPING_IN_PROGRESS for shipping_id in created}
+        )
+        for shipping_id, index in created.items():
+            if shipping_id in update_errors:
+                errors[index] = str(update_errors[shipping_id])
+            else:
+                self._track(shipping_id, requests[index]['due_date'])
+            shipping_ids[index] = shipping_id
+        return shipping_ids, errors
     
+    @timed('service.process_shipping_batch')
     def process_shipping_batch(self):
-        result = []
-        shipping = self.publisher.poll_shipping()
-        for shipping_id in shipping:
-            shipping = self.process_shipping(shipping_id)
-            result.append(shipping)
-        return result
+        return self.process_shippings(self.publisher.poll_shipping())
+
+    @timed('service.process_shippings')
+    def process_shippings(self, shipping_ids):
+        if not shipping_ids:
+            return []
+        fresh = [shipping_id for shipping_id in shipping_ids if not self._seen(shipping_id, 'service.process_shippings')]
+        shippings = self.repository.get_shippings(fresh, fields=['due_at']) if fresh else {}
+        now = datetime.now(timezone.utc).timestamp()
+        statuses = {
+            shipping_id: self._resolve_status(shipping, now)
+            for shipping_id, shipping in shippings.items()
+        }
+        responses, errors = self.repository.update_shipping_statuses(statuses, expected_status=self.ACTIVE_STATUSES)
+        for shipping_id in responses:
+            self._finished(shipping_id)
+        for shipping_id, error in list(errors.items()):
+            if is_condition_failure(error):
+                del errors[shipping_id]
+                self._finished(shipping_id)
+                metrics.increment('service.process_shippings', 'duplicates')
+            else:
+                metrics.increment('service.process_shippings', 'errors')
+        results = []
+        for shipping_id in shipping_ids:
+            if shipping_id in responses:
+                results.append(responses[shipping_id]['ResponseMetadata'])
+            elif shipping_id in errors:
+                results.append(errors[shipping_id])
+            else:
+                results.append(self.PROCESSING_SKIPPED)
+        return results
     
+    @timed('service.process_shipping')
     def process_shipping(self, shipping_id):
-        shipping = self.repository.get_shipping(shipping_id)
-        if datetime.fromisoformat(shipping['due_date']) < datetime.now(timezone.utc):
-            return self.fail_shipping(shipping_id)
-        return self.complete_shipping(shipping_id)
+        if self._seen(shipping_id, 'service.process_shipping'):
+            return self.PROCESSING_SKIPPED
+        # The due check is part of the write condition, so processing needs no read. An overdue shipment fails
+        # the first condition and is failed by the second; a finished or missing one fails both.
+        now = datetime.now(timezone.utc)
+        response = self._update_if_active(shipping_id, self.SHIPPING_COMPLETED, due_not_before=now)
+        if response is None:
+            response = self._update_if_active(shipping_id, self.SHIPPING_FAILED, due_before=now)
+        self._finished(shipping_id)
+        if response is None:
+            metrics.increment('service.process_shipping', 'duplicates')
+            return self.PROCESSING_SKIPPED
+        return response['ResponseMetadata']
+
+    def _update_if_active(self, shipping_id, status, **due):
+        try:
+            return self.repository.update_shipping_status(
+                shipping_id, status, expected_status=self.ACTIVE_STATUSES, **due
+            )
+        except ClientError as error:
+            if not is_condition_failure(error):
+                raise
+            return None
+
+    def _resolve_status(self, shipping, now):
+        if decode_due_at(shipping) < now:
+            return self.SHIPPING_FAILED
+        return self.SHIPPING_COMPLETED
     
+    @timed('service.check_status')
     def check_status(self, shipping_id):
-        shipping = self.repository.get_shipping(shipping_id)
+        shipping = self.repository.get_shipping(shipping_id, fields=['shipping_status'])
         return shipping['shipping_status']
     
+    @timed('service.fail_shipping')
     def fail_shipping(self, shipping_id):
         response = self.repository.update_shipping_status(shipping_id, self.SHIPPING_FAILED)
+        self._untrack(shipping_id)
         return response['ResponseMetadata']
     
+    @timed('service.complete_shipping')
     def complete_shipping(self, shipping_id):
         response = self.repository.update_shipping_status(shipping_id, self.SHIPPING_COMPLETED)
-        return response['ResponseMetadata']
\ No newline at end of file
+        self._untrack(shipping_id)
+        return response['ResponseMetadata']
+
+    def _published(self, shipping_id, future):
+        if future.exception() is None:
+            return
+        metrics.increment('service.create_shipping', 'errors')
+        self.fail_shipping(shipping_id)
+
+    def _seen(self, shipping_id, operation):
+        if self.processed is None or self.processed.get(shipping_id) is None:
+            return False
+        metrics.increment(operation, 'duplicates')
+        return True
+
+    def _finished(self, shipping_id):
+        self._untrack(shipping_id)
+        if self.processed is not None:
+            self.processed.put(shipping_id, True)
+
+    def _track(self, shipping_id, due_date):
+        if self.scheduler is not None:
+            self.scheduler.track(shipping_id, due_date)
+
+    def _untrack(self, shipping_id):
+        if self.scheduler is not None:
+            self.scheduler.untrack(shipping_id)
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""Run shipping workers in several processes and keep them alive.
+
+Usage: python -m services.supervisor [--processes 4] [--pollers 2] [--processors 8]
+
+With CARRIER_QUEUES_ENABLED=1 every process runs a CarrierConsumer over the per-carrier queues.
+"""
+from .config import (
+    CARRIER_QUEUES_ENABLED, WORKER_PROCESSES, WORKER_POLLERS, WORKER_PROCESSORS, WORKER_START_METHOD, WORKER_STATS_INTERVAL_SECONDS,
+    WORKER_HEARTBEAT_TIMEOUT_SECONDS, WORKER_RESTART_DELAY_SECONDS, WORKER_SHUTDOWN_TIMEOUT_SECONDS
+)
+from .carriers import CarrierConsumer
+from .publisher import ShippingPublisher, ShardedPublisher
+from .repository import ShippingRepository
+from .service import ShippingService
+from .worker import ShippingWorker
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+COUNTERS = ('received', 'processed', 'failed', 'acknowledged', 'ack_failed', 'extended')
+MAX_RESTART_DELAY_SECONDS = 30
+CARRIER_OPTIONS = ('processors', 'visibility_timeout', 'ack_linger')
+
+
+def build_service():
+    if CARRIER_QUEUES_ENABLED:
+        publisher = ShardedPublisher(ShippingService.list_available_shipping_type())
+    else:
+        publisher = ShippingPublisher()
+    return ShippingService(ShippingRepository(), publisher)
+
+
+def build_worker(service, worker_options: dict):
+    if isinstance(service.publisher, ShardedPublisher):
+        return CarrierConsumer(service, **{
+            option: value for option, value in worker_options.items() if option in CARRIER_OPTIONS
+        })
+    return ShippingWorker(service, **worker_options)
+
+
+class _Slot:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.started_at = None
+        self.heartbeat_at = None
+        self.stats = {}
+        self.retired = dict.fromkeys(COUNTERS, 0)
+        self.restarts = 0
+        self.crashes = 0
+        self.restart_at = None
+
+
+class WorkerSupervisor:
+    def __init__(self, processes: int = WORKER_PROCESSES, service_factory=build_service, worker_options: dict = None,
+                 stats_interval: float = WORKER_STATS_INTERVAL_SECONDS,
+                 heartbeat_timeout: float = WORKER_HEARTBEAT_TIMEOUT_SECONDS,
+                 restart_delay: float = WORKER_RESTART_DELAY_SECONDS,
+                 shutdown_timeout: float = WORKER_SHUTDOWN_TIMEOUT_SECONDS, start_method: str = WORKER_START_METHOD):
+        self.processes = processes
+        self.service_factory = service_factory
+        self.worker_options = worker_options or {}
+        self.stats_interval = stats_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._stop_event = None
+        self._reports = None
+        self._slots = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor = None
+        self._started_at = None
+
+    @property
+    def running(self):
+        return self._monitor is not None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._monitor is not None:
+            raise RuntimeError("Worker supervisor is already running")
+        self._stopping.clear()
+        self._stop_event = self._context.Event()
+        self._reports = self._context.Queue()
+        self._slots = [_Slot(index) for index in range(self.processes)]
+        self._started_at = time.monotonic()
+        for slot in self._slots:
+            self._spawn(slot)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="shipping-supervisor", daemon=True)
+        self._monitor.start()
+
+    def stop(self, timeout: float = None):
+        if self._monitor is None:
+            return self.stats()
+        self._stopping.set()
+        self._monitor.join()
+        self._monitor = None
+        self._stop_event.set()
+        deadline = time.monotonic() + (self.shutdown_timeout if timeout is None else timeout)
+        while any(slot.process.is_alive() for slot in self._slots) and time.monotonic() < deadline:
+            self._drain_reports(timeout=0.1)
+        for slot in self._slots:
+            if slot.process.is_alive():
+                slot.process.terminate()
+            slot.process.join()
+        self._drain_reports()
+        self._reports.close()
+        return self.stats()
+
+    def run(self):
+        stopped = threading.Event()
+
+        def request_stop(signum, frame):
+            stopped.set()
+
+        previous = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            with self:
+                while not stopped.wait(self.stats_interval):
+                    pass
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        return self.stats()
+
+    def stats(self):
+        with self._lock:
+            processes = []
+            totals = dict.fromkeys(COUNTERS, 0)
+            for slot in self._slots:
+                process = {counter: slot.retired[counter] + slot.stats.get(counter, 0) for counter in COUNTERS}
+                process['index'] = slot.index
+                process['pid'] = slot.process.pid if slot.process is not None else None
+                process['alive'] = slot.process is not None and slot.process.is_alive()
+                process['restarts'] = slot.restarts
+                process['in_flight'] = slot.stats.get('in_flight', 0)
+                process['throughput'] = slot.stats.get('throughput', 0.0)
+                processes.append(process)
+                for counter in COUNTERS:
+                    totals[counter] += process[counter]
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        totals['restarts'] = sum(process['restarts'] for process in processes)
+        totals['throughput'] = totals['processed'] / elapsed if elapsed else 0.0
+        totals['processes'] = processes
+        return totals
+
+    def _spawn(self, slot):
+        slot.process = self._context.Process(
+            target=_run_worker,
+            args=(slot.index, self.service_factory, self.worker_options, self._stop_event, self._reports,
+                  self.stats_interval),
+            name="shipping-worker-%d" % slot.index,
+            daemon=True,
+        )
+        slot.process.start()
+        slot.started_at = slot.heartbeat_at = time.monotonic()
+        slot.restart_at = None
+
+    def _monitor_loop(self):
+        while not self._stopping.is_set():
+            self._drain_reports(timeout=self.stats_interval)
+            now = time.monotonic()
+            with self._lock:
+                for slot in self._slots:
+                    self._check(slot, now)
+
+    def _check(self, slot, now):
+        if slot.restart_at is not None:
+            if now >= slot.restart_at:
+                slot.restarts += 1
+                self._spawn(slot)
+            return
+        if slot.process.is_alive() and now - slot.heartbeat_at < self.heartbeat_timeout:
+            return
+        if slot.process.is_alive():
+            slot.process.kill()
+        slot.process.join()
+        for counter in COUNTERS:
+            slot.retired[counter] += slot.stats.get(counter, 0)
+        slot.stats = {}
+        slot.crashes = slot.crashes + 1 if now - slot.started_at < MAX_RESTART_DELAY_SECONDS * 2 else 1
+        slot.restart_at = now + min(MAX_RESTART_DELAY_SECONDS, self.restart_delay * 2 ** (slot.crashes - 1))
+
+    def _drain_reports(self, timeout: float = 0):
+        try:
+            report = self._reports.get(timeout=timeout) if timeout else self._reports.get_nowait()
+            while True:
+                self._record(*report)
+                report = self._reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _record(self, index, pid, stats):
+        with self._lock:
+            slot = self._slots[index]
+            if slot.restart_at is None and slot.process is not None and slot.process.pid == pid:
+                slot.stats = stats
+                slot.heartbeat_at = time.monotonic()
+
+
+def _run_worker(index, service_factory, worker_options, stop_event, reports, stats_interval):
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker = build_worker(service_factory(), worker_options)
+    with worker:
+        reports.put((index, os.getpid(), worker.stats()))
+        while not stopped.is_set() and not stop_event.wait(stats_interval):
+            reports.put((index, os.getpid(), worker.stats()))
+    reports.put((index, os.getpid(), worker.stats()))
+    reports.close()
+    reports.join_thread()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run shipping workers in several processes")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES)
+    parser.add_argument("--pollers", type=int, default=WORKER_POLLERS, help="receive threads per process")
+    parser.add_argument("--processors", type=int, default=WORKER_PROCESSORS, help="processing threads per process")
+    args = parser.parse_args(argv)
+    supervisor = WorkerSupervisor(args.processes, worker_options={"pollers": args.pollers, "processors": args.processors})
+    stats = supervisor.run()
+    sys.stdout.write(json.dumps(stats, indent=2, sort_keys=True) + "\n")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from .config import (
+    RATE_LIMIT_READ_PER_SECOND, RATE_LIMIT_WRITE_PER_SECOND, RATE_LIMIT_SEND_PER_SECOND,
+    RATE_LIMIT_RECEIVE_PER_SECOND, RATE_LIMIT_ACK_PER_SECOND, RATE_LIMIT_BURST_SECONDS,
+    RATE_LIMIT_MIN_PER_SECOND, RATE_LIMIT_INCREASE_PER_SECOND, RATE_LIMIT_DECREASE_FACTOR,
+    THROTTLE_MAX_ATTEMPTS, THROTTLE_BASE_DELAY_SECONDS, THROTTLE_MAX_DELAY_SECONDS
+)
+from .metrics import metrics, is_throttle
+import os
+import random
+import threading
+import time
+
+READ_OPERATIONS = frozenset({"dynamodb.get_item", "dynamodb.batch_get_item", "dynamodb.query", "dynamodb.scan"})
+SEND_OPERATIONS = frozenset({"sqs.send_message", "sqs.send_message_batch"})
+ACK_OPERATIONS = frozenset({
+    "sqs.delete_message", "sqs.delete_message_batch",
+    "sqs.change_message_visibility", "sqs.change_message_visibility_batch",
+})
+
+
+def budget_for(operation: str):
+    if operation in SEND_OPERATIONS:
+        return "send"
+    if operation in ACK_OPERATIONS:
+        return "ack"
+    if operation.startswith("sqs."):
+        return "receive"
+    return "read" if operation in READ_OPERATIONS else "write"
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 0.0, burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+                 min_rate: float = RATE_LIMIT_MIN_PER_SECOND, max_rate: float = None,
+                 increase: float = RATE_LIMIT_INCREASE_PER_SECOND, decrease: float = RATE_LIMIT_DECREASE_FACTOR,
+                 cooldown: float = 1.0, clock=time.monotonic, sleep=time.sleep):
+        self.configured_rate = float(rate)
+        self.burst_seconds = burst_seconds
+        self.min_rate = min_rate
+        self.max_rate = rate if max_rate is None else max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        now = self.clock()
+        self.rate = self.configured_rate
+        self._tokens = self._capacity()
+        self._updated = now
+        self._adjusted = now
+        self._decreased = None
+        self._window_started = now
+        self._window_tokens = 0.0
+        self._measured = 0.0
+        self._counters = {'acquired': 0, 'waits': 0, 'throttles': 0, 'decreases': 0}
+        self._waited = 0.0
+
+    def acquire(self, cost: float = 1):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                if not self.rate:
+                    self._record(now, cost, waited)
+                    return waited
+                self._refill(now)
+                needed = min(cost, self._capacity())
+                if self._tokens >= needed - 1e-9:
+                    self._tokens -= needed
+                    self._record(now, cost, waited)
+                    return waited
+                wait = (needed - self._tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
+
+    def throttled(self):
+        with self._lock:
+            now = self.clock()
+            self._counters['throttles'] += 1
+            if self._decreased is not None and now - self._decreased < self.cooldown:
+                return
+            self._refill(now)
+            current = self.rate or self._observed_rate(now) or self.min_rate
+            self.rate = max(self.min_rate, current * self.decrease)
+            self._tokens = min(self._tokens, self._capacity())
+            self._decreased = now
+            self._adjusted = now
+            self._counters['decreases'] += 1
+
+    def succeeded(self):
+        if not self.rate or self._decreased is None:
+            return
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            rate = self.rate + self.increase * (now - self._adjusted)
+            self.rate = min(rate, self.max_rate) if self.max_rate else rate
+            self._adjusted = now
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['rate'] = self.rate
+            stats['measured_rate'] = self._observed_rate(self.clock())
+            stats['waited_seconds'] = self._waited
+        return stats
+
+    def _capacity(self):
+        return max(1.0, self.rate * self.burst_seconds)
+
+    def _refill(self, now):
+        self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _record(self, now, cost, waited):
+        self._counters['acquired'] += 1
+        if waited:
+            self._counters['waits'] += 1
+            self._waited += waited
+        if now - self._window_started >= 1.0:
+            self._measured = self._window_tokens / (now - self._window_started)
+            self._window_started = now
+            self._window_tokens = 0.0
+        self._window_tokens += cost
+
+    def _observed_rate(self, now):
+        elapsed = now - self._window_started
+        if elapsed >= 0.1:
+            return max(self._measured, self._window_tokens / elapsed)
+        return self._measured
+
+
+class RateLimiter:
+    def __init__(self, buckets: dict, max_attempts: int = THROTTLE_MAX_ATTEMPTS,
+                 base_delay: float = THROTTLE_BASE_DELAY_SECONDS, max_delay: float = THROTTLE_MAX_DELAY_SECONDS,
+                 sleep=time.sleep, jitter=random.uniform):
+        self.buckets = buckets
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.jitter = jitter
+
+    def bucket(self, operation: str):
+        return self.buckets[budget_for(operation)]
+
+    def call(self, operation: str, method, cost: int = 1, **params):
+        bucket = self.bucket(operation)
+        attempt = 0
+        while True:
+            attempt += 1
+            bucket.acquire(cost)
+            try:
+                response = metrics.call(operation, method, **params)
+            except Exception as error:
+                # A throttled request was rejected before it ran, so it is always safe to send again. Other
+                # failures may have been applied and are left to botocore, which retries within one call and
+                # keeps its idempotency token.
+                if not is_throttle(error):
+                    raise
+                bucket.throttled()
+                if attempt >= self.max_attempts:
+                    raise
+                metrics.increment(operation, "retries")
+                self.backoff(attempt)
+                continue
+            bucket.succeeded()
+            return response
+
+    def throttled(self, operation: str):
+        self.bucket(operation).throttled()
+
+    def reset(self):
+        for bucket in self.buckets.values():
+            bucket.reset()
+
+    def backoff(self, attempt: int):
+        delay = self.jitter(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self.sleep(delay)
+        return delay
+
+    def stats(self):
+        return {name: bucket.stats() for name, bucket in sorted(self.buckets.items())}
+
+
+limiter = RateLimiter({
+    "read": TokenBucket(RATE_LIMIT_READ_PER_SECOND),
+    "write": TokenBucket(RATE_LIMIT_WRITE_PER_SECOND),
+    "send": TokenBucket(RATE_LIMIT_SEND_PER_SECOND),
+    "receive": TokenBucket(RATE_LIMIT_RECEIVE_PER_SECOND),
+    "ack": TokenBucket(RATE_LIMIT_ACK_PER_SECOND),
+})
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=limiter.reset)
@@ -0,0 +1,205 @@
+"""Export ShippingTable to gzip NDJSON shards and import them back.
+
+Usage: python -m services.transfer export DIRECTORY [--segments 8]
+       python -m services.transfer import DIRECTORY [--workers 8]
+"""
+from .config import (
+    SHIPPING_TABLE_NAME, EXPORT_SEGMENTS, EXPORT_SHARD_ROWS, IMPORT_WORKERS, IMPORT_CHECKPOINT_ROWS
+)
+from .repository import ShippingRepository, DYNAMODB_BATCH_WRITE_LIMIT
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+MANIFEST_NAME = "manifest.json"
+CHECKPOINT_NAME = "import-checkpoint.json"
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def encode_line(item):
+    return json.dumps({"Item": {name: _serializer.serialize(value) for name, value in item.items()}},
+                      ensure_ascii=False, sort_keys=True)
+
+
+def decode_line(line):
+    return {name: _deserializer.deserialize(value) for name, value in json.loads(line)["Item"].items()}
+
+
+def export_shippings(repository, directory: str, segments: int = EXPORT_SEGMENTS,
+                     shard_rows: int = EXPORT_SHARD_ROWS, page_size: int = None):
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        shards = [
+            shard
+            for segment_shards in executor.map(
+                lambda segment: _export_segment(repository, directory, segment, segments, shard_rows, page_size),
+                range(segments)
+            )
+            for shard in segment_shards
+        ]
+    rows = sum(shard["rows"] for shard in shards)
+    _write_json(os.path.join(directory, MANIFEST_NAME), {
+        "table": SHIPPING_TABLE_NAME,
+        "format": "dynamodb-json",
+        "segments": segments,
+        "rows": rows,
+        "shards": shards,
+    })
+    return _report(rows, len(shards), time.perf_counter() - started)
+
+
+def import_shippings(repository, directory: str, workers: int = IMPORT_WORKERS, checkpoint_path: str = None,
+                     checkpoint_rows: int = IMPORT_CHECKPOINT_ROWS):
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    checkpoint = ImportCheckpoint(checkpoint_path or os.path.join(directory, CHECKPOINT_NAME))
+    shards = [shard for shard in manifest["shards"] if not checkpoint.is_done(shard["name"])]
+    started = time.perf_counter()
+    rows = 0
+    failed = []
+    if shards:
+        with ThreadPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+            for shard_rows, shard_failed in executor.map(
+                lambda shard: _import_shard(repository, directory, shard, checkpoint, checkpoint_rows), shards
+            ):
+                rows += shard_rows
+                failed.extend(shard_failed)
+    report = _report(rows, len(shards), time.perf_counter() - started)
+    report["skipped_shards"] = len(manifest["shards"]) - len(shards)
+    report["failed"] = failed
+    return report
+
+
+class ImportCheckpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                self._state = json.load(checkpoint_file)
+
+    def offset(self, shard_name: str):
+        with self._lock:
+            return self._state.get(shard_name, {}).get("rows", 0)
+
+    def is_done(self, shard_name: str):
+        with self._lock:
+            return self._state.get(shard_name, {}).get("done", False)
+
+    def advance(self, shard_name: str, rows: int, done: bool = False):
+        with self._lock:
+            self._state[shard_name] = {"rows": rows, "done": done}
+            _write_json(self.path, self._state)
+
+
+class _ShardWriter:
+    def __init__(self, directory, segment, shard_rows):
+        self.directory = directory
+        self.segment = segment
+        self.shard_rows = shard_rows
+        self.shards = []
+        self._file = None
+        self._name = None
+        self._rows = 0
+
+    def write(self, item):
+        if self._file is None or self._rows >= self.shard_rows:
+            self.close()
+            self._name = "shipping-%04d-%04d.ndjson.gz" % (self.segment, len(self.shards))
+            self._file = gzip.open(os.path.join(self.directory, self._name + ".tmp"), "wt", encoding="utf-8")
+            self._rows = 0
+        self._file.write(encode_line(item) + "\n")
+        self._rows += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(os.path.join(self.directory, self._name + ".tmp"), os.path.join(self.directory, self._name))
+        self.shards.append({"name": self._name, "segment": self.segment, "rows": self._rows})
+        self._file = None
+
+
+def _export_segment(repository, directory, segment, segments, shard_rows, page_size):
+    writer = _ShardWriter(directory, segment, shard_rows)
+    try:
+        for item in repository.scan_shippings(segment, segments, page_size):
+            writer.write(item)
+    finally:
+        writer.close()
+    return writer.shards
+
+
+def _import_shard(repository, directory, shard, checkpoint, checkpoint_rows):
+    name = shard["name"]
+    position = safe_position = checkpoint.offset(name)
+    imported = 0
+    failed = []
+    since_checkpoint = 0
+    with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as shard_file:
+        lines = islice(shard_file, position, None)
+        while True:
+            batch = [decode_line(line) for line in islice(lines, DYNAMODB_BATCH_WRITE_LIMIT)]
+            if not batch:
+                break
+            failed.extend(repository.put_shippings(batch))
+            position += len(batch)
+            imported += len(batch)
+            if failed:
+                # Rows at and after the first failed batch stay behind the checkpoint so a rerun retries them.
+                continue
+            since_checkpoint += len(batch)
+            if since_checkpoint >= checkpoint_rows:
+                checkpoint.advance(name, position)
+                since_checkpoint = 0
+            safe_position = position
+    checkpoint.advance(name, safe_position, done=not failed)
+    return imported, failed
+
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w", encoding="utf-8") as output:
+        json.dump(data, output, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _report(rows, shards, seconds):
+    return {
+        "rows": rows,
+        "shards": shards,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import %s as gzip NDJSON shards" % SHIPPING_TABLE_NAME)
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("directory")
+    parser.add_argument("--segments", type=int, default=EXPORT_SEGMENTS, help="parallel scan segments for export")
+    parser.add_argument("--shard-rows", type=int, default=EXPORT_SHARD_ROWS, help="maximum rows per export shard")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="shards imported in parallel")
+    parser.add_argument("--checkpoint", help="import checkpoint file (default: inside the export directory)")
+    args = parser.parse_args(argv)
+    repository = ShippingRepository()
+    if args.command == "export":
+        report = export_shippings(repository, args.directory, args.segments, args.shard_rows)
+    else:
+        report = import_shippings(repository, args.directory, args.workers, args.checkpoint)
+    sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
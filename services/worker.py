@@ -0,0 +1,194 @@
+from .config import WORKER_POLLERS, WORKER_PROCESSORS, WORKER_VISIBILITY_TIMEOUT
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+
+SQS_MAX_BATCH = 10
+
+
+class ShippingWorker:
+    def __init__(self, service, pollers: int = WORKER_POLLERS, processors: int = WORKER_PROCESSORS,
+                 visibility_timeout: int = WORKER_VISIBILITY_TIMEOUT, wait_time: int = 10, ack_linger: float = 0.5):
+        self.service = service
+        self.publisher = service.publisher
+        self.pollers = pollers
+        self.processors = processors
+        self.visibility_timeout = visibility_timeout
+        self.wait_time = wait_time
+        self.ack_linger = ack_linger
+        self.max_in_flight = processors * 2
+        self._stopping = threading.Event()
+        self._drained = threading.Event()
+        self._condition = threading.Condition()
+        self._in_flight = {}
+        self._receipts = {}
+        self._acks = queue.Queue()
+        self._threads = []
+        self._executor = None
+        self._started_at = None
+        self._counters = {
+            'received': 0,
+            'processed': 0,
+            'failed': 0,
+            'acknowledged': 0,
+            'ack_failed': 0,
+            'extended': 0,
+            'duplicates': 0,
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._executor is not None:
+            raise RuntimeError("Worker is already running")
+        self._stopping.clear()
+        self._drained.clear()
+        self._started_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.processors, thread_name_prefix="shipping-processor")
+        self._threads = [
+            threading.Thread(target=self._poll_loop, name="shipping-poller-%d" % index, daemon=True)
+            for index in range(self.pollers)
+        ]
+        self._maintenance = threading.Thread(target=self._maintenance_loop, name="shipping-maintenance", daemon=True)
+        for thread in self._threads:
+            thread.start()
+        self._maintenance.start()
+
+    def stop(self, timeout: float = None):
+        if self._executor is None:
+            return
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._drained.set()
+        self._maintenance.join(timeout)
+        self._executor = None
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._in_flight)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        stats['throughput'] = stats['processed'] / elapsed if elapsed else 0.0
+        return stats
+
+    def _increment(self, counter, amount=1):
+        with self._condition:
+            self._counters[counter] += amount
+
+    def _poll_loop(self):
+        while not self._stopping.is_set():
+            with self._condition:
+                while len(self._in_flight) >= self.max_in_flight and not self._stopping.is_set():
+                    self._condition.wait()
+                capacity = min(SQS_MAX_BATCH, self.max_in_flight - len(self._in_flight))
+            if self._stopping.is_set():
+                break
+            try:
+                messages = self.publisher.receive_shippings(capacity, self.wait_time, self.visibility_timeout)
+            except Exception:
+                self._stopping.wait(1)
+                continue
+            with self._condition:
+                self._counters['received'] += len(messages)
+                accepted = []
+                for message in messages:
+                    message_id = message.get('MessageId')
+                    receipt_handle = message['ReceiptHandle']
+                    if message_id is not None and message_id in self._receipts:
+                        # SQS delivers at least once, so a message can arrive again while its first copy is
+                        # still processing. Only the newest receipt handle can delete the message or extend its
+                        # visibility, so the first copy carries on under that handle.
+                        self._in_flight.pop(self._receipts[message_id], None)
+                        self._in_flight[receipt_handle] = time.monotonic()
+                        self._receipts[message_id] = receipt_handle
+                        self._counters['duplicates'] += 1
+                        continue
+                    accepted.append(message)
+                    self._in_flight[receipt_handle] = time.monotonic()
+                    if message_id is not None:
+                        self._receipts[message_id] = receipt_handle
+            for message in accepted:
+                try:
+                    self._executor.submit(self._process, message)
+                except RuntimeError:
+                    with self._condition:
+                        self._release(message)
+
+    def _process(self, message):
+        processed = False
+        try:
+            self.service.process_shipping(message['Body'])
+            processed = True
+        except Exception:
+            self._increment('failed')
+        finally:
+            with self._condition:
+                receipt_handle = self._release(message)
+                self._condition.notify_all()
+        if processed:
+            self._increment('processed')
+            self._acks.put(receipt_handle)
+
+    def _release(self, message):
+        receipt_handle = self._receipts.pop(message.get('MessageId'), message['ReceiptHandle'])
+        self._in_flight.pop(receipt_handle, None)
+        return receipt_handle
+
+    def _maintenance_loop(self):
+        pending = []
+        flush_at = None
+        heartbeat_at = time.monotonic() + self.visibility_timeout / 3
+        while True:
+            try:
+                pending.append(self._acks.get(timeout=self.ack_linger / 2))
+                if flush_at is None:
+                    flush_at = time.monotonic() + self.ack_linger
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            drained = self._drained.is_set() and self._acks.empty()
+            if pending and (len(pending) >= SQS_MAX_BATCH or now >= flush_at or drained):
+                self._acknowledge(pending)
+                pending = []
+                flush_at = None
+            if now >= heartbeat_at:
+                self._extend_visibility(now)
+                heartbeat_at = now + self.visibility_timeout / 3
+            if drained and not pending:
+                break
+
+    def _acknowledge(self, receipt_handles):
+        try:
+            errors = self.publisher.delete_shippings(receipt_handles)
+        except Exception:
+            errors = receipt_handles
+        self._increment('acknowledged', len(receipt_handles) - len(errors))
+        self._increment('ack_failed', len(errors))
+
+    def _extend_visibility(self, now):
+        with self._condition:
+            slow = [
+                receipt_handle for receipt_handle, started in self._in_flight.items()
+                if now - started >= self.visibility_timeout / 2
+            ]
+        if not slow:
+            return
+        try:
+            errors = self.publisher.extend_visibility(slow, self.visibility_timeout)
+        except Exception:
+            return
+        with self._condition:
+            for receipt_handle in slow:
+                if receipt_handle not in errors and receipt_handle in self._in_flight:
+                    self._in_flight[receipt_handle] = now
+        self._increment('extended', len(slow) - len(errors))
@@ -0,0 +1,163 @@
+from .config import WRITE_BEHIND_MAX_ATTEMPTS
+import threading
+import time
+
+
+class WriteBehindBuffer:
+    def __init__(self, writer, max_pending: int, linger: float, max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS):
+        self.writer = writer
+        self.max_pending = max_pending
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._in_flight = {}
+        self._attempts = {}
+        self._dead_letters = {}
+        self._first_at = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+        self._stats = {'puts': 0, 'coalesced': 0, 'written': 0, 'failed': 0, 'dead_lettered': 0, 'flushes': 0}
+        self._flush_seconds = 0.0
+        self._flush_max = 0.0
+        self._flush_last = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def __enter__(self):
+        if not self.running:
+            self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Write-behind buffer is already running")
+        self._stopping = False
+        self._thread = threading.Thread(target=self._flush_loop, name="shipping-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        if self._thread is None:
+            return {}
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        return self.flush()
+
+    def put(self, key, value):
+        with self._condition:
+            self._stats['puts'] += 1
+            if key in self._pending:
+                self._stats['coalesced'] += 1
+            elif not self._pending:
+                self._first_at = time.monotonic()
+                self._condition.notify_all()
+            self._pending[key] = value
+            if len(self._pending) >= self.max_pending:
+                self._condition.notify_all()
+
+    def get(self, key):
+        with self._condition:
+            if key in self._pending:
+                return self._pending[key]
+            return self._in_flight.get(key)
+
+    def flush(self, keys=None):
+        errors = {}
+        with self._flush_lock:
+            with self._condition:
+                if keys is None:
+                    pending = self._pending
+                    self._pending = {}
+                else:
+                    pending = {key: self._pending.pop(key) for key in keys if key in self._pending}
+                if not self._pending:
+                    self._first_at = None
+            keys = list(pending)
+            for start in range(0, len(keys), self.max_pending):
+                errors.update(self._write({key: pending[key] for key in keys[start:start + self.max_pending]}))
+        return errors
+
+    def dead_letters(self):
+        with self._condition:
+            dead_letters = self._dead_letters
+            self._dead_letters = {}
+        return dead_letters
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+            stats['dead_letters'] = len(self._dead_letters)
+            stats['coalescing_ratio'] = stats['coalesced'] / stats['puts'] if stats['puts'] else 0.0
+            stats['flush_mean_ms'] = self._flush_seconds / stats['flushes'] * 1000 if stats['flushes'] else 0.0
+            stats['flush_max_ms'] = self._flush_max * 1000
+            stats['flush_last_ms'] = self._flush_last * 1000
+        return stats
+
+    def _write(self, batch):
+        with self._condition:
+            self._in_flight = batch
+        started = time.monotonic()
+        try:
+            _, errors = self.writer(batch)
+        except Exception as error:
+            errors = {key: error for key in batch}
+        elapsed = time.monotonic() - started
+        with self._condition:
+            self._in_flight = {}
+            for key in batch:
+                attempts = self._attempts.pop(key, 0) + 1
+                if key not in errors or key in self._pending:
+                    continue
+                if self._stopping or attempts >= self.max_attempts:
+                    self._dead_letters[key] = (batch[key], errors[key])
+                    self._stats['dead_lettered'] += 1
+                    continue
+                if not self._pending:
+                    self._first_at = time.monotonic()
+                self._pending[key] = batch[key]
+                self._attempts[key] = attempts
+            self._stats['written'] += len(batch) - len(errors)
+            self._stats['failed'] += len(errors)
+            self._stats['flushes'] += 1
+            self._flush_seconds += elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+            self._flush_last = elapsed
+        return errors
+
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                while not self._stopping and not self._flush_due():
+                    self._condition.wait(self._wait_time())
+                if self._stopping:
+                    return
+            self._flush_due_batch()
+
+    def _flush_due(self):
+        if not self._pending:
+            return False
+        return len(self._pending) >= self.max_pending or time.monotonic() - self._first_at >= self.linger
+
+    def _wait_time(self):
+        if not self._pending:
+            return None
+        return max(0.0, self.linger - (time.monotonic() - self._first_at))
+
+    def _flush_due_batch(self):
+        with self._flush_lock:
+            with self._condition:
+                keys = list(self._pending)[:self.max_pending]
+                batch = {key: self._pending.pop(key) for key in keys}
+                self._first_at = time.monotonic() if self._pending else None
+            if batch:
+                self._write(batch)
@@ -1,10 +1,19 @@
+import time
 import pytest
 import boto3
 from services.config import *
 from services.db import get_dynamodb_resource
+from services.backends import MemoryBackend, get_client
+from services.publisher import ShippingPublisher
+from services.repository import ShippingRepository
+from services.schema import shipping_table_definition, inventory_table_definition
+from services.throttle import limiter
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_localstack_resources():
+    if SHIPPING_BACKEND == "memory":
+        yield  # The memory backend provisions its own table and queue
+        return
     dynamo_client = boto3.client(
         "dynamodb",
         endpoint_url=AWS_ENDPOINT_URL,
@@ -14,13 +23,13 @@ def setup_localstack_resources():
     )
     existing_tables = dynamo_client.list_tables()["TableNames"]
     if SHIPPING_TABLE_NAME not in existing_tables:
-        dynamo_client.create_table(
-            TableName=SHIPPING_TABLE_NAME,
-            KeySchema=[{"AttributeName": "shipping_id", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "shipping_id", "AttributeType": "S"}],
-            BillingMode="PAY_PER_REQUEST",
-        )
+        dynamo_client.create_table(**shipping_table_definition())
         dynamo_client.get_waiter("table_exists").wait(TableName=SHIPPING_TABLE_NAME)
+    else:
+        ShippingRepository().ensure_indexes()
+    if INVENTORY_TABLE_NAME not in existing_tables:
+        dynamo_client.create_table(**inventory_table_definition())
+        dynamo_client.get_waiter("table_exists").wait(TableName=INVENTORY_TABLE_NAME)
     
     sqs_client = boto3.client(
         "sqs",
@@ -35,8 +44,81 @@ def setup_localstack_resources():
     yield  # All tests run here
     
     dynamo_client.delete_table(TableName=SHIPPING_TABLE_NAME)
+    dynamo_client.delete_table(TableName=INVENTORY_TABLE_NAME)
     sqs_client.delete_queue(QueueUrl=queue_url)
 
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    limiter.reset()
+    yield
+    limiter.reset()
+
 @pytest.fixture
 def dynamo_resource():
-    return get_dynamodb_resource()
\ No newline at end of file
+    return get_dynamodb_resource()
+
+def drain_shipping_queue():
+    sqs_client = get_client("sqs")
+    queue_url = sqs_client.get_queue_url(QueueName=SHIPPING_QUEUE)["QueueUrl"]
+    while True:
+        messages = sqs_client.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=0
+        ).get("Messages", [])
+        if not messages:
+            break
+        sqs_client.delete_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]}
+                for index, message in enumerate(messages)
+            ]
+        )
+
+@pytest.fixture
+def drain_queue():
+    drain_shipping_queue()
+    yield
+    drain_shipping_queue()
+
+@pytest.fixture
+def wait_for():
+    def wait(condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+    return wait
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def backend():
+    return MemoryBackend()
+
+@pytest.fixture
+def repository(backend):
+    repository = ShippingRepository()
+    repository._table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    return repository
+
+@pytest.fixture
+def publisher(backend):
+    publisher = ShippingPublisher()
+    publisher._client = backend.client("sqs")
+    return publisher
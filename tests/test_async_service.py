@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.eshop import Product, ShoppingCart, Order
+from services import ShippingService
+from services.aio import AsyncBridge, AsyncShippingRepository, AsyncShippingPublisher, AsyncShippingService
+from services.cache import TTLCache
+from services.metrics import metrics
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def bridge():
+    bridge = AsyncBridge(max_workers=8, max_concurrency=8)
+    yield bridge
+    bridge.shutdown()
+
+
+@pytest.fixture
+def service(bridge, repository, publisher):
+    return AsyncShippingService(
+        AsyncShippingRepository(repository, bridge), AsyncShippingPublisher(publisher, bridge),
+        processed=TTLCache(1000, 60)
+    )
+
+
+def due_date():
+    return datetime.now(timezone.utc) + timedelta(minutes=1)
+
+
+def test_place_order_async_creates_shipment(service):
+    cart = ShoppingCart()
+    cart.add_product(Product(available_amount=10, name="Async Laptop", price=1000.0), 1)
+    order = Order(cart, service)
+    metrics.reset()
+
+    shipping_id = asyncio.run(order.place_order_async("Нова Пошта", due_date()))
+
+    assert asyncio.run(service.check_status(shipping_id)) == ShippingService.SHIPPING_IN_PROGRESS
+    assert service.publisher.publisher.poll_shipping() == [shipping_id]
+    assert metrics.snapshot()["order.place_order_async"]["count"] == 1
+
+
+def test_place_order_async_reserves_the_cart_off_the_event_loop(service, mocker):
+    cart = ShoppingCart()
+    cart.add_product(Product(available_amount=10, name="Async Phone", price=500.0), 1)
+    order = Order(cart, service)
+    submit = order._submit
+    threads = []
+
+    def tracked_submit(due):
+        threads.append(threading.get_ident())
+        return submit(due)
+
+    mocker.patch.object(order, "_submit", side_effect=tracked_submit)
+
+    async def place():
+        return threading.get_ident(), await order.place_order_async("Нова Пошта", due_date())
+
+    loop_thread, _ = asyncio.run(place())
+
+    assert threads and threads[0] != loop_thread
+
+
+def test_place_order_async_raises_for_an_empty_cart(service):
+    with pytest.raises(ValueError):
+        asyncio.run(Order(ShoppingCart(), service).place_order_async("Нова Пошта", due_date()))
+
+
+def test_concurrent_checkouts_are_bounded_by_the_bridge(service, mocker):
+    active = []
+    peak = []
+    lock = threading.Lock()
+    create = service.repository.repository.create_shipping
+
+    def tracked_create(*args):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.005)
+        try:
+            return create(*args)
+        finally:
+            with lock:
+                active.pop()
+
+    mocker.patch.object(service.repository.repository, "create_shipping", side_effect=tracked_create)
+
+    async def checkouts():
+        return await asyncio.gather(*(
+            service.create_shipping("Укр Пошта", ["Phone"], "order_async_%d" % index, due_date())
+            for index in range(200)
+        ))
+
+    shipping_ids = asyncio.run(checkouts())
+
+    assert len(set(shipping_ids)) == 200
+    assert max(peak) <= 8
+    assert all(
+        item["shipping_status"] == ShippingService.SHIPPING_IN_PROGRESS
+        for item in service.repository.repository.get_shippings(shipping_ids).values()
+    )
+
+
+def test_batch_is_processed_with_gather(service):
+    async def scenario():
+        shipping_ids = await asyncio.gather(*(
+            service.create_shipping("Meest Express", ["Case"], "order_async_batch", due_date()) for _ in range(5)
+        ))
+        results = await service.process_shippings(shipping_ids + [shipping_ids[0], "missing"])
+        statuses = await asyncio.gather(*(service.check_status(shipping_id) for shipping_id in shipping_ids))
+        return results, statuses
+
+    results, statuses = asyncio.run(scenario())
+
+    assert [result["HTTPStatusCode"] for result in results[:6]] == [200] * 6
+    assert results[6] == ShippingService.PROCESSING_SKIPPED
+    assert statuses == [ShippingService.SHIPPING_COMPLETED] * 5
+    assert asyncio.run(service.process_shipping_batch()) == [ShippingService.PROCESSING_SKIPPED] * 5
@@ -0,0 +1,132 @@
+import pytest
+from services import ShippingService
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def shipping_service(drain_queue):
+    return ShippingService(ShippingRepository(), ShippingPublisher())
+
+
+def shipping_request(shipping_type="Нова Пошта", minutes=1):
+    return {
+        "shipping_type": shipping_type,
+        "product_ids": ["Laptop", "Phone"],
+        "order_id": "order_bulk",
+        "due_date": datetime.now(timezone.utc) + timedelta(minutes=minutes),
+    }
+
+
+def test_create_shippings_returns_ids_in_input_order(shipping_service):
+    requests = [shipping_request() for _ in range(30)]
+    shipping_ids, errors = shipping_service.create_shippings(requests)
+
+    assert errors == {}
+    assert len(shipping_ids) == 30
+    assert len(set(shipping_ids)) == 30
+    for shipping_id in (shipping_ids[0], shipping_ids[-1]):
+        assert shipping_service.check_status(shipping_id) == ShippingService.SHIPPING_IN_PROGRESS
+
+
+def test_create_shippings_reports_invalid_items(shipping_service):
+    requests = [
+        shipping_request(),
+        shipping_request(shipping_type="Космічна доставка"),
+        shipping_request(minutes=-1),
+    ]
+    shipping_ids, errors = shipping_service.create_shippings(requests)
+
+    assert shipping_ids[0] is not None
+    assert shipping_ids[1] is None and shipping_ids[2] is None
+    assert errors[1] == "Shipping type is not available"
+    assert errors[2] == "Shipping due datetime must be greater than datetime now"
+
+
+def test_create_shippings_retries_unprocessed_items(mocker):
+    mocker.patch('services.repository.time.sleep')
+    repository = ShippingRepository()
+    repository._table = mocker.Mock()
+    client = repository._table.meta.client
+    calls = []
+
+    def batch_write_item(RequestItems):
+        requests = list(RequestItems.values())[0]
+        calls.append(len(requests))
+        if len(calls) == 1:
+            return {"UnprocessedItems": {"ShippingTable": requests[:2]}}
+        return {"UnprocessedItems": {}}
+
+    client.batch_write_item.side_effect = batch_write_item
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_ids, errors = repository.create_shippings(
+        [("Нова Пошта", ["Laptop"], "order", due_date)] * 5, ShippingService.SHIPPING_CREATED
+    )
+
+    assert calls == [5, 2]
+    assert errors == {}
+    assert None not in shipping_ids
+
+
+def test_send_new_shippings_reports_failed_entries(mocker):
+    publisher = ShippingPublisher()
+    publisher._client = mocker.Mock()
+    publisher._queue_url = "queue"
+    publisher._client.send_message_batch.return_value = {
+        "Successful": [{"Id": "0", "MessageId": "message_1"}],
+        "Failed": [{"Id": "1", "Code": "InternalError", "Message": "Try again"}],
+    }
+    message_ids, errors = publisher.send_new_shippings(["shipping_1", "shipping_2"])
+
+    assert message_ids == {"shipping_1": "message_1"}
+    assert errors == {"shipping_2": "Try again"}
+
+
+def test_send_new_shippings_reports_every_id_when_a_chunk_raises(mocker):
+    publisher = ShippingPublisher()
+    publisher._client = mocker.Mock()
+    publisher._queue_url = "queue"
+    publisher._client.send_message_batch.side_effect = [
+        {"Successful": [{"Id": str(index), "MessageId": "message_%d" % index} for index in range(10)]},
+        RuntimeError("queue unavailable"),
+        {"Successful": [{"Id": "0", "MessageId": "message_20"}]},
+    ]
+    shipping_ids = ["shipping_%d" % index for index in range(21)]
+
+    message_ids, errors = publisher.send_new_shippings(shipping_ids)
+
+    assert sorted(message_ids) == sorted(shipping_ids[:10] + shipping_ids[20:])
+    assert errors == {shipping_id: "queue unavailable" for shipping_id in shipping_ids[10:20]}
+
+
+def test_process_shipping_batch_reads_once_and_keeps_message_order(mocker):
+    repository = mocker.Mock()
+    publisher = mocker.Mock()
+    shipping_service = ShippingService(repository, publisher)
+    now = datetime.now(timezone.utc)
+    publisher.poll_shipping.return_value = ["late", "on_time", "missing", "late"]
+    repository.get_shippings.return_value = {
+        "late": {"shipping_id": "late", "due_date": (now - timedelta(minutes=1)).isoformat()},
+        "on_time": {"shipping_id": "on_time", "due_date": (now + timedelta(minutes=1)).isoformat()},
+    }
+    repository.update_shipping_statuses.side_effect = lambda statuses, expected_status=None: (
+        {shipping_id: {"ResponseMetadata": status} for shipping_id, status in statuses.items()}, {}
+    )
+    result = shipping_service.process_shipping_batch()
+
+    repository.get_shippings.assert_called_once_with(["late", "on_time", "missing", "late"], fields=["due_at"])
+    repository.get_shipping.assert_not_called()
+    assert result == [
+        ShippingService.SHIPPING_FAILED,
+        ShippingService.SHIPPING_COMPLETED,
+        ShippingService.PROCESSING_SKIPPED,
+        ShippingService.SHIPPING_FAILED,
+    ]
+
+
+def test_get_shippings_reads_polled_shipments(shipping_service):
+    shipping_ids, _ = shipping_service.create_shippings([shipping_request() for _ in range(3)])
+    shippings = shipping_service.repository.get_shippings(shipping_ids + [shipping_ids[0], "unknown"])
+
+    assert set(shippings) == set(shipping_ids)
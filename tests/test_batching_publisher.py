@@ -0,0 +1,169 @@
+import queue
+import threading
+import pytest
+from app.eshop import Product, ShoppingCart, Order
+from services import ShippingService
+from services.publisher import BatchingPublisher, ShardedPublisher, carrier_queue_name
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def publisher(backend):
+    publisher = BatchingPublisher(linger=0.05)
+    publisher._client = backend.client("sqs")
+    return publisher
+
+
+def test_messages_are_sent_in_batches_of_ten(publisher, mocker):
+    send_batch = mocker.spy(publisher.client, "send_message_batch")
+
+    with publisher:
+        futures = [publisher.send_new_shipping("shipping_%d" % index) for index in range(25)]
+        message_ids = [future.result(timeout=2) for future in futures]
+
+    assert len(set(message_ids)) == 25
+    assert send_batch.call_count == 3
+    assert sorted(message["Body"] for message in publisher.receive_shippings(10, 0) +
+                  publisher.receive_shippings(10, 0) + publisher.receive_shippings(10, 0)) == \
+        sorted("shipping_%d" % index for index in range(25))
+    assert publisher.stats()["messages_per_request"] > 8
+
+
+def test_only_failed_entries_are_retried(mocker):
+    client = mocker.Mock()
+    client.send_message_batch.side_effect = [
+        {"Successful": [{"Id": "0", "MessageId": "message_0"}],
+         "Failed": [{"Id": "1", "Code": "InternalError", "SenderFault": False},
+                    {"Id": "2", "Code": "InvalidMessageContents", "SenderFault": True}]},
+        {"Successful": [{"Id": "0", "MessageId": "message_1"}]},
+    ]
+    publisher = BatchingPublisher(linger=0.2)
+    publisher._client = client
+    publisher._queue_url = "queue"
+
+    with publisher:
+        futures = [publisher.send_new_shipping("shipping_%d" % index) for index in range(3)]
+
+    assert futures[0].result() == "message_0"
+    assert futures[1].result() == "message_1"
+    with pytest.raises(RuntimeError):
+        futures[2].result()
+    assert [entry["MessageBody"] for entry in client.send_message_batch.call_args.kwargs["Entries"]] == ["shipping_1"]
+    assert publisher.stats()["retried"] == 1
+    assert publisher.stats()["failed"] == 1
+
+
+def test_full_buffer_applies_backpressure(mocker):
+    sending = threading.Event()
+    release = threading.Event()
+
+    def send_message_batch(**params):
+        sending.set()
+        release.wait(2)
+        return {"Successful": [{"Id": entry["Id"], "MessageId": entry["Id"]} for entry in params["Entries"]]}
+
+    publisher = BatchingPublisher(linger=0, buffer_size=2)
+    publisher._client = mocker.Mock(send_message_batch=send_message_batch)
+    publisher._queue_url = "queue"
+
+    with publisher:
+        publisher.send_new_shipping("shipping_1")
+        assert sending.wait(2)
+        publisher.send_new_shipping("shipping_2")
+        publisher.send_new_shipping("shipping_3")
+        with pytest.raises(queue.Full):
+            publisher.send_new_shipping("shipping_4", timeout=0.01)
+        release.set()
+
+
+def test_send_fails_fast_when_publisher_is_not_running():
+    publisher = BatchingPublisher()
+
+    with pytest.raises(RuntimeError):
+        publisher.send_new_shipping("shipping_1")
+
+
+def test_place_order_does_not_wait_for_sqs(repository, publisher):
+    service = ShippingService(repository, publisher)
+    cart = ShoppingCart()
+    cart.add_product(Product("Laptop", 1000, 5), 1)
+
+    with publisher:
+        shipping_id = Order(cart, service).place_order("Нова Пошта", datetime.now(timezone.utc) + timedelta(minutes=1))
+
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_IN_PROGRESS
+    assert [message["Body"] for message in publisher.receive_shippings(10, 0)] == [shipping_id]
+
+
+def test_failed_publish_fails_the_shipping(repository, mocker):
+    publisher = BatchingPublisher(linger=0.01, max_attempts=1)
+    publisher._client = mocker.Mock()
+    publisher._client.send_message_batch.side_effect = RuntimeError("queue unavailable")
+    publisher._queue_url = "queue"
+    service = ShippingService(repository, publisher)
+
+    with publisher:
+        shipping_id = service.create_shipping(
+            "Нова Пошта", ["Laptop"], "order_batching", datetime.now(timezone.utc) + timedelta(minutes=1)
+        )
+
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_FAILED
+
+
+def test_batching_publishers_can_be_sharded_by_carrier(backend):
+    publisher = ShardedPublisher(["Нова Пошта"], queue_name="BatchingShardQueue", publisher_class=BatchingPublisher)
+    for carrier in publisher.publishers():
+        carrier._client = backend.client("sqs")
+
+    with publisher:
+        future = publisher.send_new_shipping("shipping_1", shipping_type="Нова Пошта")
+        assert future.result(timeout=2)
+
+    assert publisher.for_carrier("Нова Пошта").queue_name == "BatchingShardQueue-nova-poshta"
+    assert [message["Body"] for message in publisher.for_carrier("Нова Пошта").receive_shippings(10, 0)] == [
+        "shipping_1"
+    ]
+    assert publisher.default.receive_shippings(10, 0) == []
+
+
+def test_batched_sends_are_routed_by_shipping_type(backend):
+    publisher = BatchingPublisher(linger=0.01, queue_name="BatchingRouteQueue")
+    publisher._client = backend.client("sqs")
+
+    with publisher:
+        routed = publisher.send_new_shipping("shipping_1", shipping_type="Укр Пошта")
+        default = publisher.send_new_shipping("shipping_2")
+        assert routed.result(timeout=2) and default.result(timeout=2)
+
+    carrier_queue = publisher.client.get_queue_url(QueueName=carrier_queue_name("Укр Пошта", "BatchingRouteQueue"))
+    messages = publisher.client.receive_message(QueueUrl=carrier_queue["QueueUrl"], MaxNumberOfMessages=10)
+    assert [message["Body"] for message in messages.get("Messages", [])] == ["shipping_1"]
+    assert [message["Body"] for message in publisher.receive_shippings(10, 0)] == ["shipping_2"]
+
+
+def test_every_accepted_send_is_resolved_when_stop_races(mocker):
+    publisher = BatchingPublisher(linger=0)
+    publisher._client = mocker.Mock()
+    publisher._client.send_message_batch.side_effect = lambda **params: {
+        "Successful": [{"Id": entry["Id"], "MessageId": entry["MessageBody"]} for entry in params["Entries"]]
+    }
+    publisher._queue_url = "queue"
+    accepted = []
+
+    def send(thread_index):
+        for index in range(200):
+            try:
+                accepted.append(publisher.send_new_shipping("shipping_%d_%d" % (thread_index, index)))
+            except RuntimeError:
+                return
+
+    publisher.start()
+    threads = [threading.Thread(target=send, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    publisher.stop()
+    for thread in threads:
+        thread.join()
+
+    assert all(future.done() for future in accepted)
+
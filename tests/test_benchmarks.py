@@ -0,0 +1,38 @@
+import json
+from benchmarks.hot_path import main, measure, percentile, summarize
+
+
+def test_percentiles_follow_sorted_timings():
+    summary = summarize("operation", [0.004, 0.001, 0.002, 0.003, 0.010])
+
+    assert percentile([1, 2, 3, 4, 5], 0.5) == 3
+    assert summary["p50_ms"] == 3.0
+    assert summary["p99_ms"] == 10.0
+    assert summary["calls"] == 5
+
+
+def test_throughput_counts_the_operations_each_call_performed():
+    batches = iter([[1] * 10, [1] * 3, [1] * 7, [], [1] * 5])
+
+    summary = measure("batch", lambda _: next(batches), 3, warmup=2, count=len)
+
+    assert summary["calls"] == 3
+    assert summary["operations"] == 12
+
+
+def test_benchmark_report_covers_hot_path_for_each_backend(tmp_path):
+    output = tmp_path / "bench.json"
+    main(["--backend", "mock", "--backend", "memory", "--iterations", "5", "--cart-size", "20",
+          "--output", str(output)])
+    report = json.loads(output.read_text(encoding="utf-8"))
+
+    assert [result["name"] for result in report["cart"]] == [
+        "ShoppingCart.add_product", "ShoppingCart.calculate_total", "ShoppingCart.submit_cart_order"
+    ]
+    for backend in ("mock", "memory"):
+        names = [result["name"] for result in report["backends"][backend]["results"]]
+        assert names == [
+            "Order.place_order", "ShippingService.create_shipping",
+            "ShippingService.process_shipping_batch", "ShippingService.check_status"
+        ]
+        assert all(result["throughput_per_second"] > 0 for result in report["backends"][backend]["results"])
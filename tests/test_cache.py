@@ -0,0 +1,68 @@
+import threading
+from services import ShippingService
+from services.cache import TTLCache
+from services.repository import ShippingRepository
+from datetime import datetime, timedelta, timezone
+
+
+def test_cache_expires_entries_after_ttl(clock):
+    cache = TTLCache(max_size=10, ttl=5, clock=clock)
+    cache.put("shipping_1", {"shipping_status": "created"})
+
+    assert cache.get("shipping_1") == {"shipping_status": "created"}
+    clock.now = 6
+    assert cache.get("shipping_1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(max_size=10, ttl=60)
+    release = threading.Event()
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        release.wait(5)
+        return {"shipping_id": key}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("shipping_1", loader)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["shared_loads"] < 4:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["shipping_1"]
+    assert results == [{"shipping_id": "shipping_1"}] * 5
+
+
+def test_repository_serves_status_from_cache_after_writes(mocker):
+    repository = ShippingRepository(cache=TTLCache(max_size=100, ttl=60))
+    repository._table = mocker.MagicMock()
+    service = ShippingService(repository, mocker.Mock())
+    shipping_id = service.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_cache", datetime.now(timezone.utc) + timedelta(minutes=1)
+    )
+
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_IN_PROGRESS
+    service.complete_shipping(shipping_id)
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+    repository._table.get_item.assert_not_called()
@@ -0,0 +1,117 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from services import ShippingService
+from services.carriers import CarrierConsumer, parse_weights
+from services.publisher import ShardedPublisher, carrier_queue_name
+from datetime import datetime, timedelta, timezone
+
+
+class FakeQueue:
+    def __init__(self, name, messages=0):
+        self.name = name
+        self.remaining = messages
+        self.sent = 0
+        self.deleted = []
+
+    def receive_shippings(self, batch_size, wait_time, visibility_timeout=None, attributes=None):
+        count = batch_size if self.remaining is None else min(batch_size, self.remaining)
+        if self.remaining is not None:
+            self.remaining -= count
+        messages = []
+        for _ in range(count):
+            self.sent += 1
+            messages.append({
+                "Body": "%s_%d" % (self.name, self.sent),
+                "ReceiptHandle": "receipt_%s_%d" % (self.name, self.sent),
+                "Attributes": {"SentTimestamp": str(int((time.time() - 2) * 1000))},
+            })
+        return messages
+
+    def delete_shippings(self, receipt_handles):
+        self.deleted.extend(receipt_handles)
+        return {}
+
+    def queue_depth(self):
+        return self.remaining or 0
+
+
+def fake_publisher(**queues):
+    carriers = {
+        "Нова Пошта": queues.get("nova", FakeQueue("nova")),
+        "Укр Пошта": queues.get("ukr", FakeQueue("ukr")),
+    }
+    return SimpleNamespace(default=queues.get("default", FakeQueue("default")), carriers=carriers)
+
+
+def test_weights_are_parsed_from_configuration():
+    assert parse_weights("nova-poshta=4, ukr-poshta=2") == {"nova-poshta": 4.0, "ukr-poshta": 2.0}
+    assert parse_weights("") == {}
+
+
+def test_carrier_queue_names_are_valid_sqs_names():
+    assert carrier_queue_name("Нова Пошта") == "ShippingQueue-nova-poshta"
+    assert carrier_queue_name("Самовивіз", "Orders") == "Orders-pickup"
+    assert carrier_queue_name("Нова Експрес").startswith("ShippingQueue-")
+    assert carrier_queue_name("Нова Експрес").isascii()
+
+
+def test_busy_carriers_share_polls_by_weight(mocker):
+    service = mocker.Mock()
+    service.publisher = fake_publisher(nova=FakeQueue("nova", None), ukr=FakeQueue("ukr", None))
+    consumer = CarrierConsumer(service, weights={"nova-poshta": 3}, max_in_flight=10, idle_backoff=60)
+
+    for _ in range(100):
+        consumer.poll_once()
+
+    carriers = consumer.stats()["carriers"]
+    assert carriers["default"]["received"] == 0
+    assert carriers["nova-poshta"]["received"] == pytest.approx(3 * carriers["ukr-poshta"]["received"], rel=0.1)
+    assert consumer.stats()["processed"] == consumer.stats()["received"]
+
+
+def test_slow_carrier_is_capped_and_does_not_starve_others(mocker, wait_for):
+    release = threading.Event()
+    service = mocker.Mock()
+    service.publisher = fake_publisher(nova=FakeQueue("nova", None), ukr=FakeQueue("ukr", 5))
+    service.process_shipping.side_effect = lambda shipping_id: shipping_id.startswith("nova") and release.wait(5)
+
+    with CarrierConsumer(service, max_in_flight={"nova-poshta": 2}, processors=8, ack_linger=0.05) as consumer:
+        assert wait_for(lambda: consumer.stats()["carriers"]["ukr-poshta"]["acknowledged"] == 5)
+        nova = consumer.stats()["carriers"]["nova-poshta"]
+        assert nova["in_flight"] == 2
+        assert nova["received"] == 2
+        release.set()
+
+    assert service.publisher.carriers["Укр Пошта"].deleted == ["receipt_ukr_%d" % index for index in range(1, 6)]
+    lag = consumer.lag()["ukr-poshta"]
+    assert 1.5 < lag["lag_seconds"] <= lag["max_lag_seconds"]
+
+
+def test_shipments_are_routed_to_their_carrier_queue(backend, repository):
+    publisher = ShardedPublisher(ShippingService.list_available_shipping_type())
+    for carrier_publisher in publisher.publishers():
+        carrier_publisher._client = backend.client("sqs")
+    service = ShippingService(repository, publisher)
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+
+    nova_id = service.create_shipping("Нова Пошта", ["Laptop"], "order_carrier", due_date)
+    shipping_ids, errors = service.create_shippings([
+        {"shipping_type": "Укр Пошта", "product_ids": ["Phone"], "order_id": "order_carrier", "due_date": due_date},
+        {"shipping_type": "Самовивіз", "product_ids": ["Case"], "order_id": "order_carrier", "due_date": due_date},
+    ])
+
+    assert errors == {}
+    assert publisher.queue_depths() == {
+        "ShippingQueue": 0, "ShippingQueue-nova-poshta": 1, "ShippingQueue-ukr-poshta": 1,
+        "ShippingQueue-meest-express": 0, "ShippingQueue-pickup": 1,
+    }
+    consumer = CarrierConsumer(service, weights={})
+    while consumer.poll_once() is not None:
+        pass
+    consumer.stop()
+
+    assert consumer.stats()["acknowledged"] == 3
+    for shipping_id in [nova_id] + shipping_ids:
+        assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
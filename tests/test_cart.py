@@ -0,0 +1,66 @@
+import json
+from decimal import Decimal
+import pytest
+from app.eshop import Catalog, CartLine, Product, ShoppingCart
+
+
+def test_running_total_is_exact_and_follows_updates():
+    cart = ShoppingCart()
+    first = Product("First", 0.1, 10)
+    second = Product("Second", 0.2, 10)
+
+    cart.add_product(first, 1)
+    cart.add_product(second, 1)
+    assert cart.calculate_total() == Decimal("0.3")
+
+    cart.add_product(first, 3)
+    assert cart.calculate_total() == Decimal("0.5")
+    cart.remove_product(second)
+    assert cart.calculate_total() == Decimal("0.3")
+    assert cart.products == {first: 3}
+
+
+def test_products_view_is_read_only_and_prices_are_captured_on_add():
+    cart = ShoppingCart()
+    laptop = Product("Laptop", 1000, 5)
+    cart.add_product(laptop, 1)
+
+    with pytest.raises(TypeError):
+        cart.products[laptop] = 3
+    laptop.price = 1200
+    assert cart.calculate_total() == Decimal(1000)
+
+    cart.add_product(laptop, 2)
+    assert cart.calculate_total() == Decimal(2400)
+
+
+def test_bulk_add_is_all_or_nothing_and_bulk_remove():
+    cart = ShoppingCart()
+    laptop = Product("Laptop", 999.99, 2)
+    phone = Product("Phone", 499.5, 1)
+    mouse = Product("Mouse", 19.99, 50)
+
+    with pytest.raises(ValueError):
+        cart.add_products({laptop: 1, phone: 2})
+    assert len(cart) == 0
+
+    cart.add_products({laptop: 2, phone: 1, mouse: 3})
+    assert cart.calculate_total() == Decimal("2559.45")
+    cart.remove_products([laptop, mouse])
+    assert cart.calculate_total() == Decimal("499.5")
+    assert isinstance(cart.lines["Phone"], CartLine)
+    assert not hasattr(cart.lines["Phone"], "__dict__")
+
+
+def test_snapshot_round_trips_through_json():
+    catalog = Catalog([Product("Laptop", 1000, 5), Product("Mouse", 25.5, 100)])
+    cart = ShoppingCart()
+    cart.add_products({catalog["Laptop"]: 1, catalog["Mouse"]: 2})
+
+    restored = ShoppingCart.from_snapshot(json.loads(json.dumps(cart.snapshot())), catalog)
+
+    assert restored.calculate_total() == cart.calculate_total() == Decimal("1051.0")
+    assert restored.products == cart.products
+    assert restored.submit_cart_order() == ["Laptop", "Mouse"]
+    assert catalog["Mouse"].available_amount == 98
+    assert restored.calculate_total() == 0
@@ -0,0 +1,80 @@
+import pytest
+from decimal import Decimal
+from app.eshop import Catalog, CatalogProduct, Product, ShoppingCart
+
+
+@pytest.fixture
+def catalog():
+    return Catalog([
+        Product("Laptop", 1000.0, 5),
+        Product("Phone", 500.0, 0),
+        Product("Mouse", 25.0, 100),
+        Product("Monitor", 300.0, 7),
+    ])
+
+
+def test_products_are_slotted_views_over_the_arrays(catalog):
+    laptop = catalog["Laptop"]
+
+    assert isinstance(laptop, CatalogProduct)
+    assert laptop == Product("Laptop", 1, 1)
+    assert not hasattr(laptop, "__dict__")
+    laptop.buy(2)
+    assert catalog.stock[catalog["Laptop"].row] == 3
+    laptop.price = 900.0
+    assert catalog["Laptop"].price == 900.0
+    assert len(catalog) == 4
+    assert "Mouse" in catalog and "Keyboard" not in catalog
+
+
+def test_price_range_uses_the_sorted_index(catalog):
+    assert [product.name for product in catalog.in_price_range(100, 600)] == ["Monitor", "Phone"]
+
+    catalog.set_price("Mouse", 150.0)
+    catalog.add("Keyboard", 45.0, 10)
+
+    assert [product.name for product in catalog.in_price_range(high=200)] == ["Keyboard", "Mouse"]
+
+
+def test_bulk_availability_and_totals(catalog):
+    carts = [
+        {"Laptop": 2, "Mouse": 4},
+        {catalog["Phone"]: 1},
+        catalog.compile({"Monitor": 7, "Laptop": 5}),
+    ]
+
+    assert catalog.are_available(carts) == [True, False, True]
+    assert catalog.totals(carts) == [2100.0, 500.0, 7100.0]
+
+
+def test_prices_are_stored_as_exact_cents():
+    catalog = Catalog([Product("Pen", 0.1, 10), Product("Paper", 0.2, 10)])
+
+    assert catalog.cents.typecode == "q"
+    assert catalog["Pen"].price == Decimal("0.10")
+    assert catalog.totals([{"Pen": 1, "Paper": 1}]) == [Decimal("0.30")]
+    assert [product.name for product in catalog.in_price_range(0.2, 0.2)] == ["Paper"]
+    with pytest.raises(ValueError):
+        catalog.set_price("Pen", Decimal("0.105"))
+
+
+def test_non_string_names_are_stored_under_their_string_form():
+    catalog = Catalog()
+    catalog.add(42, 10, 1)
+    catalog.add(42, 12, 3)
+
+    assert len(catalog) == 1
+    assert 42 in catalog
+    assert catalog["42"].available_amount == 3
+    assert catalog.totals([{"42": 2}]) == [Decimal("24")]
+
+
+def test_catalog_products_work_in_shopping_carts(catalog):
+    cart = ShoppingCart()
+    cart.add_product(catalog["Laptop"], 2)
+    cart.add_product(catalog["Mouse"], 10)
+
+    assert cart.calculate_total() == 2250.0
+    assert cart.submit_cart_order() == ["Laptop", "Mouse"]
+    assert catalog["Laptop"].available_amount == 3
+    assert catalog["Mouse"].available_amount == 90
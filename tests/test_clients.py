@@ -0,0 +1,78 @@
+import threading
+import pytest
+from services.clients import ClientRegistry, registry
+from services.config import AWS_MAX_ATTEMPTS, AWS_MAX_POOL_CONNECTIONS, AWS_RETRY_MODE, SHIPPING_BACKEND
+from services.db import get_dynamodb_resource
+from services.publisher import ShippingPublisher
+from services.repository import ShippingRepository
+
+
+def test_registry_hands_out_one_client_per_service_across_threads():
+    clients_registry = ClientRegistry()
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(clients_registry.client("sqs"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+    assert clients_registry.stats()["created"] == 1
+    assert clients_registry.stats()["requests"] == 8
+
+
+def test_registry_hands_out_one_resource_per_thread():
+    clients_registry = ClientRegistry()
+    resources = []
+
+    def fetch():
+        resources.append(clients_registry.resource("dynamodb"))
+        resources.append(clients_registry.resource("dynamodb"))
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(resource) for resource in resources}) == 4
+    assert len({id(resource.meta.client) for resource in resources}) == 1
+    assert clients_registry.stats()["created"] == 4
+    assert clients_registry.stats()["requests"] == 8
+
+
+def test_clients_use_configured_pool_and_retries():
+    client = ClientRegistry().client("dynamodb")
+
+    assert client.meta.config.max_pool_connections == AWS_MAX_POOL_CONNECTIONS
+    assert client.meta.config.retries["mode"] == AWS_RETRY_MODE
+    assert client.meta.config.retries["total_max_attempts"] == AWS_MAX_ATTEMPTS
+
+
+@pytest.mark.skipif(SHIPPING_BACKEND != "aws", reason="registry clients are only used by the aws backend")
+def test_repository_and_publisher_share_registry_clients():
+    assert get_dynamodb_resource() is get_dynamodb_resource()
+    assert ShippingPublisher().client is ShippingPublisher().client
+    ShippingRepository().get_shipping("unknown")
+
+    assert "sqs" in registry.stats()["clients"]
+    pools = registry.stats()["pools"]
+    assert pools["dynamodb:resource"]["requests"] >= 1
+    assert pools["dynamodb:resource"]["max_pool_connections"] == AWS_MAX_POOL_CONNECTIONS
+
+
+@pytest.mark.skipif(SHIPPING_BACKEND != "aws", reason="registry clients are only used by the aws backend")
+def test_registry_reports_connection_pool_usage():
+    clients_registry = ClientRegistry()
+    client = clients_registry.client("sqs")
+
+    assert clients_registry.stats()["pools"]["sqs"] == {
+        "max_pool_connections": AWS_MAX_POOL_CONNECTIONS, "opened": 0, "in_use": 0, "requests": 0
+    }
+    client.list_queues()
+    client.list_queues()
+    usage = clients_registry.stats()["pools"]["sqs"]
+
+    assert usage["opened"] == 1
+    assert usage["requests"] == 2
+    assert usage["in_use"] == 0
@@ -0,0 +1,56 @@
+import pytest
+from services import ShippingService
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher
+from services.consumer import AdaptivePollTuner, PrefetchingConsumer
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def shipping_service(drain_queue):
+    return ShippingService(ShippingRepository(), ShippingPublisher())
+
+
+def test_tuner_uses_full_batches_without_waiting_when_queue_is_busy(mocker):
+    publisher = mocker.Mock()
+    publisher.queue_depth.return_value = 250
+    tuner = AdaptivePollTuner(publisher, min_wait=1, max_wait=20)
+
+    assert tuner.next_params() == (10, 0)
+
+
+def test_tuner_backs_off_long_poll_when_receives_are_empty(mocker):
+    publisher = mocker.Mock()
+    publisher.queue_depth.return_value = 0
+    tuner = AdaptivePollTuner(publisher, min_wait=1, max_wait=20, depth_interval=0)
+    waits = []
+    for _ in range(20):
+        _, wait_time = tuner.next_params()
+        waits.append(wait_time)
+        tuner.record(0)
+
+    assert waits[0] == 1
+    assert waits == sorted(waits)
+    assert waits[-1] > 15
+
+
+def test_prefetching_consumer_processes_and_acknowledges(shipping_service):
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_ids, _ = shipping_service.create_shippings([
+        {"shipping_type": "Укр Пошта", "product_ids": ["Phone"], "order_id": "order_consumer", "due_date": due_date}
+        for _ in range(15)
+    ])
+    tuner = AdaptivePollTuner(shipping_service.publisher, min_wait=0, max_wait=1)
+
+    with PrefetchingConsumer(shipping_service, buffer_size=2, tuner=tuner) as consumer:
+        for _ in range(20):
+            if consumer.stats()["processed"] >= 15:
+                break
+            consumer.process_next_batch(timeout=5)
+
+    assert consumer.stats()["processed"] == 15
+
+    assert shipping_service.publisher.receive_shippings(10, 0) == []
+    assert {shipping_service.check_status(shipping_id) for shipping_id in shipping_ids} == {
+        ShippingService.SHIPPING_COMPLETED
+    }
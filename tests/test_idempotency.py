@@ -0,0 +1,171 @@
+import pytest
+from services import ShippingService
+from services.cache import TTLCache
+from services.metrics import metrics
+from services.publisher import ShippingPublisher, BatchingPublisher
+from services.consumer import AdaptivePollTuner, PrefetchingConsumer
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def create(service, due_in=timedelta(minutes=1)):
+    return service.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_idempotent", datetime.now(timezone.utc) + due_in, allow_past_due=True
+    )
+
+
+def test_redelivered_message_is_suppressed(repository, publisher, mocker):
+    service = ShippingService(repository, publisher, processed=TTLCache(100, 60))
+    shipping_id = create(service)
+    update_item = mocker.spy(repository.table, "update_item")
+    get_item = mocker.spy(repository.table, "get_item")
+
+    assert service.process_shipping(shipping_id)["HTTPStatusCode"] == 200
+    assert service.process_shipping(shipping_id) == ShippingService.PROCESSING_SKIPPED
+
+    assert update_item.call_count == 1
+    assert get_item.call_count == 0
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+    assert metrics.snapshot()["service.process_shipping"]["duplicates"] == 1
+
+
+def test_processing_checks_the_due_date_in_the_write_condition(repository, publisher, mocker):
+    service = ShippingService(repository, publisher)
+    on_time, overdue = create(service), create(service, due_in=timedelta(minutes=-1))
+    update_item = mocker.spy(repository.table, "update_item")
+    get_item = mocker.spy(repository.table, "get_item")
+
+    assert service.process_shipping(on_time)["HTTPStatusCode"] == 200
+    assert update_item.call_count == 1
+    assert service.process_shipping(overdue)["HTTPStatusCode"] == 200
+    assert update_item.call_count == 3
+
+    get_item.assert_not_called()
+    assert service.check_status(on_time) == ShippingService.SHIPPING_COMPLETED
+    assert service.check_status(overdue) == ShippingService.SHIPPING_FAILED
+
+
+def test_items_without_due_at_are_checked_against_due_date(repository, publisher):
+    service = ShippingService(repository, publisher)
+    for shipping_id, due_in in (("legacy_on_time", timedelta(minutes=1)), ("legacy_overdue", timedelta(minutes=-1))):
+        repository.table.put_item(Item={
+            "shipping_id": shipping_id,
+            "shipping_status": ShippingService.SHIPPING_IN_PROGRESS,
+            "due_date": (datetime.now(timezone.utc) + due_in).isoformat(),
+        })
+
+    assert service.process_shipping("legacy_on_time")["HTTPStatusCode"] == 200
+    assert service.process_shipping("legacy_overdue")["HTTPStatusCode"] == 200
+
+    assert service.check_status("legacy_on_time") == ShippingService.SHIPPING_COMPLETED
+    assert service.check_status("legacy_overdue") == ShippingService.SHIPPING_FAILED
+
+
+def test_terminal_status_is_never_overwritten(repository, publisher):
+    shipping_id = create(ShippingService(repository, publisher), due_in=timedelta(minutes=-1))
+    ShippingService(repository, publisher).complete_shipping(shipping_id)
+
+    restarted = ShippingService(repository, publisher, processed=TTLCache(100, 60))
+    assert restarted.process_shipping(shipping_id) == ShippingService.PROCESSING_SKIPPED
+    assert restarted.process_shippings([shipping_id]) == [ShippingService.PROCESSING_SKIPPED]
+
+    assert restarted.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+    assert metrics.snapshot()["service.process_shipping"]["duplicates"] == 1
+    assert metrics.snapshot()["service.process_shippings"]["duplicates"] == 1
+
+
+def test_batch_processing_skips_already_processed_ids(repository, publisher, mocker):
+    service = ShippingService(repository, publisher, processed=TTLCache(100, 60))
+    first, second = create(service), create(service)
+    service.process_shipping(first)
+    get_shippings = mocker.spy(repository, "get_shippings")
+
+    result = service.process_shippings([first, second])
+
+    get_shippings.assert_called_once_with([second], fields=["due_at"])
+    assert result[0] == ShippingService.PROCESSING_SKIPPED
+    assert result[1]["HTTPStatusCode"] == 200
+    assert service.check_status(second) == ShippingService.SHIPPING_COMPLETED
+
+
+def test_missing_shipping_is_skipped(repository, publisher):
+    service = ShippingService(repository, publisher)
+
+    assert service.process_shipping("missing") == ShippingService.PROCESSING_SKIPPED
+    assert service.process_shippings(["missing"]) == [ShippingService.PROCESSING_SKIPPED]
+    assert repository.get_shipping("missing") is None
+
+
+def test_batch_write_errors_are_returned(repository, publisher, mocker):
+    service = ShippingService(repository, publisher)
+    first, second = create(service), create(service)
+    error = RuntimeError("write failed")
+    write_status = repository._write_status
+
+    def fail_second(shipping_id, *args):
+        if shipping_id == second:
+            raise error
+        return write_status(shipping_id, *args)
+
+    mocker.patch.object(repository, "_write_status", side_effect=fail_second)
+
+    result = service.process_shippings([first, second])
+
+    assert result[0]["HTTPStatusCode"] == 200
+    assert result[1] is error
+    assert service.check_status(second) == ShippingService.SHIPPING_IN_PROGRESS
+    assert metrics.snapshot()["service.process_shippings"]["errors"] == 1
+
+
+def test_consumer_acknowledges_redelivered_messages(repository, publisher):
+    service = ShippingService(repository, publisher, processed=TTLCache(100, 60))
+    shipping_id = create(service)
+    tuner = AdaptivePollTuner(publisher, min_wait=0, max_wait=0)
+
+    with PrefetchingConsumer(service, tuner=tuner) as consumer:
+        results = consumer.process_next_batch(timeout=2)
+        publisher.send_new_shipping(shipping_id)
+        results += consumer.process_next_batch(timeout=2)
+
+    assert results[0]["HTTPStatusCode"] == 200
+    assert results[1] == ShippingService.PROCESSING_SKIPPED
+    assert consumer.stats()["processed"] == 2
+    assert publisher.queue_depth() == 0
+    assert publisher.client.get_queue_attributes(
+        QueueUrl=publisher.queue_url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+    )["Attributes"]["ApproximateNumberOfMessagesNotVisible"] == "0"
+
+
+def test_publisher_suppresses_repeated_sends(backend, mocker):
+    publisher = ShippingPublisher(sent=TTLCache(100, 60))
+    publisher._client = backend.client("sqs")
+    send_batch = mocker.spy(publisher.client, "send_message_batch")
+
+    first = publisher.send_new_shipping("shipping_1")
+    assert publisher.send_new_shipping("shipping_1") == first
+    message_ids, errors = publisher.send_new_shippings(["shipping_1", "shipping_2"])
+
+    assert message_ids["shipping_1"] == first
+    assert errors == {}
+    assert send_batch.call_args.kwargs["Entries"] == [{"Id": "0", "MessageBody": "shipping_2"}]
+    assert sorted(message["Body"] for message in publisher.receive_shippings(10, 0)) == ["shipping_1", "shipping_2"]
+    assert metrics.snapshot()["sqs.send_message"]["duplicates"] == 1
+
+
+def test_batching_publisher_resolves_repeated_sends_immediately(backend):
+    publisher = BatchingPublisher(linger=0.01, sent=TTLCache(100, 60))
+    publisher._client = backend.client("sqs")
+
+    with publisher:
+        first = publisher.send_new_shipping("shipping_1").result(timeout=2)
+        repeated = publisher.send_new_shipping("shipping_1")
+        assert repeated.done()
+        assert repeated.result() == first
+
+    assert publisher.stats()["submitted"] == 1
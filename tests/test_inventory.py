@@ -0,0 +1,100 @@
+import threading
+import pytest
+from app.eshop import INVENTORY, Product, ShoppingCart, InventoryReservationEngine
+
+
+def test_failed_checkout_leaves_stock_untouched():
+    laptop = Product("Laptop", 1000, 5)
+    phone = Product("Phone", 500, 1)
+    cart = ShoppingCart()
+    cart.add_product(laptop, 2)
+    cart.add_product(phone, 1)
+    phone.available_amount = 0
+
+    with pytest.raises(ValueError, match="Not enough Phone available"):
+        cart.submit_cart_order()
+
+    assert laptop.available_amount == 5
+    assert cart.contains_product(laptop)
+
+
+def test_concurrent_checkouts_never_oversell():
+    inventory = InventoryReservationEngine(stripes=4)
+    products = [Product("SKU-%d" % index, 10, 50) for index in range(8)]
+    sold = []
+    rejected = []
+    start = threading.Barrier(16)
+
+    def checkout(worker):
+        start.wait()
+        for attempt in range(20):
+            cart = ShoppingCart()
+            cart.products = {
+                products[(worker + attempt) % 8]: 1,
+                products[(worker + attempt + 3) % 8]: 2,
+                products[(worker * 5 + attempt) % 8]: 1,
+            }
+            try:
+                sold.append(dict(cart.products))
+                cart.submit_cart_order(inventory)
+            except ValueError:
+                rejected.append(sold.pop())
+
+    threads = [threading.Thread(target=checkout, args=(worker,)) for worker in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for product in products:
+        assert product.available_amount >= 0
+        assert product.available_amount == 50 - sum(items.get(product, 0) for items in sold)
+    stats = inventory.stats()
+    assert stats["committed"] == len(sold)
+    assert stats["rejected"] == len(rejected)
+    assert stats["lock_acquisitions"] > 0
+    assert 0 <= stats["contention_ratio"] <= 1
+
+
+def test_reservations_hold_stock_until_released():
+    inventory = InventoryReservationEngine()
+    laptop = Product("Laptop", 1000, 3)
+
+    reservation = inventory.reserve({laptop: 2})
+    assert inventory.available(laptop) == 1
+    with pytest.raises(ValueError):
+        inventory.reserve({laptop: 2})
+
+    assert inventory.release(reservation) is True
+    assert inventory.release(reservation) is False
+    assert inventory.available(laptop) == 3
+    assert laptop.available_amount == 3
+
+
+def test_expired_reservations_are_released():
+    now = [0.0]
+    inventory = InventoryReservationEngine(reservation_timeout=10, clock=lambda: now[0])
+    laptop = Product("Laptop", 1000, 2)
+    reservation = inventory.reserve({laptop: 2})
+
+    now[0] = 11.0
+    assert inventory.expire_reservations() == 1
+    assert inventory.available(laptop) == 2
+    with pytest.raises(ValueError, match="not active"):
+        inventory.commit(reservation)
+    assert inventory.commit(inventory.reserve({laptop: 1})) == ["Laptop"]
+    assert laptop.available_amount == 1
+    assert inventory.stats()["expired"] == 1
+
+
+def test_engine_commits_against_its_own_reservations():
+    laptop = Product("Laptop", 1000, 5)
+    inventory = InventoryReservationEngine()
+    held = INVENTORY.reserve({laptop: 3})
+    try:
+        assert inventory.checkout({laptop: 4}) == ["Laptop"]
+    finally:
+        INVENTORY.release(held)
+
+    assert laptop.available_amount == 1
+    assert inventory.stats()["committed"] == 1
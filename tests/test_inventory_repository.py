@@ -0,0 +1,112 @@
+import uuid
+import pytest
+from app.eshop import Product, ShoppingCart
+from botocore.exceptions import ClientError
+from services.backends import MemoryBackend
+from services.config import INVENTORY_TABLE_NAME
+from services.inventory import InventoryRepository
+
+
+def memory_inventory():
+    inventory = InventoryRepository()
+    inventory._table = MemoryBackend().resource("dynamodb").Table(INVENTORY_TABLE_NAME)
+    return inventory
+
+
+@pytest.fixture(params=["memory", "localstack"])
+def inventory(request):
+    if request.param == "memory":
+        return memory_inventory()
+    return InventoryRepository()
+
+
+def products(inventory, **stock):
+    suffix = uuid.uuid4().hex[:8]
+    created = {}
+    for name, amount in stock.items():
+        product = Product("%s-%s" % (name, suffix), 100, amount)
+        inventory.set_stock(product, amount)
+        created[name] = product
+    return created
+
+
+def test_checkout_decrements_all_lines_in_one_transaction(inventory, mocker):
+    catalog = products(inventory, laptop=5, phone=3)
+    transact = mocker.spy(inventory.table.meta.client, "transact_write_items")
+    cart = ShoppingCart(inventory)
+    cart.add_product(catalog["laptop"], 2)
+    cart.add_product(catalog["phone"], 3)
+
+    assert cart.submit_cart_order() == [str(catalog["laptop"]), str(catalog["phone"])]
+
+    assert transact.call_count == 1
+    assert inventory.get_stock(catalog["laptop"]) == 3
+    assert inventory.get_stock(catalog["phone"]) == 0
+    assert not inventory.is_available(catalog["phone"], 1)
+
+
+def test_retried_checkout_reuses_its_request_token(mocker):
+    inventory = memory_inventory()
+    catalog = products(inventory, laptop=5)
+    client = inventory.table.meta.client
+    transact = client.transact_write_items
+    tokens = []
+
+    def throttled_once(**params):
+        tokens.append(params["ClientRequestToken"])
+        if len(tokens) == 1:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Slow down"}}, "TransactWriteItems")
+        return transact(**params)
+
+    mocker.patch.object(client, "transact_write_items", side_effect=throttled_once)
+
+    inventory.checkout({catalog["laptop"]: 2})
+
+    assert len(tokens) == 2
+    assert tokens[0] == tokens[1]
+    assert inventory.get_stock(catalog["laptop"]) == 3
+
+
+def test_failed_line_cancels_the_whole_checkout(inventory):
+    catalog = products(inventory, laptop=5, phone=1)
+    cart = ShoppingCart(inventory)
+    cart.add_product(catalog["laptop"], 2)
+    cart.add_product(catalog["phone"], 1)
+    inventory.checkout({catalog["phone"]: 1})
+
+    with pytest.raises(ValueError, match="Not enough %s available" % catalog["phone"]):
+        cart.submit_cart_order()
+
+    assert inventory.get_stock(catalog["laptop"]) == 5
+    assert cart.contains_product(catalog["laptop"])
+
+
+def test_two_nodes_share_stock_without_overselling():
+    node_a = memory_inventory()
+    node_b = InventoryRepository()
+    node_b._table = node_a.table
+    catalog = products(node_a, laptop=1)
+    assert node_b.is_available(catalog["laptop"], 1)
+
+    node_a.checkout({catalog["laptop"]: 1})
+
+    assert node_b.is_available(catalog["laptop"], 1)
+    with pytest.raises(ValueError):
+        node_b.checkout({catalog["laptop"]: 1})
+    assert not node_b.is_available(catalog["laptop"], 1)
+    assert node_b.restock(catalog["laptop"], 4) == 4
+
+
+def test_add_product_uses_cached_stock(mocker):
+    inventory = memory_inventory()
+    catalog = products(inventory, laptop=2)
+    inventory.cache.clear()
+    get_item = mocker.spy(inventory.table, "get_item")
+    cart = ShoppingCart(inventory)
+
+    for _ in range(5):
+        cart.add_product(catalog["laptop"], 1)
+    with pytest.raises(ValueError):
+        cart.add_product(catalog["laptop"], 3)
+
+    assert get_item.call_count == 1
@@ -0,0 +1,83 @@
+import pytest
+from services import ShippingService
+from services.codec import (
+    COMPACT_ITEM_FORMAT, LEGACY_ITEM_FORMAT, encode_shipping_item, decode_shipping_item, decode_due_at
+)
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+
+@pytest.mark.parametrize("item_format", [LEGACY_ITEM_FORMAT, COMPACT_ITEM_FORMAT])
+def test_item_formats_decode_to_same_values(item_format):
+    due_date = datetime(2030, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+    item = encode_shipping_item("id", "Нова Пошта", ["Laptop", "Phone"], "order", "created", due_date, item_format)
+
+    assert decode_due_at(item) == due_date.timestamp()
+    assert decode_due_at({"due_date": due_date.isoformat()}) == due_date.timestamp()
+    decoded = decode_shipping_item(item)
+    assert decoded["product_ids"] == ["Laptop", "Phone"]
+    assert decoded["due_date"] == due_date.isoformat()
+    assert decoded["due_at"] == Decimal("%.6f" % due_date.timestamp())
+    assert datetime.fromisoformat(decoded["created_date"]).tzinfo == timezone.utc
+    assert "item_format" not in decoded
+
+
+def test_items_written_before_due_at_decode_to_the_read_shape():
+    due_date = datetime(2030, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    item = {"shipping_id": "id", "product_ids": "", "created_date": due_date.isoformat(),
+            "due_date": due_date.isoformat()}
+
+    assert decode_shipping_item(item) == dict(item, product_ids=[], due_at=Decimal("%.6f" % due_date.timestamp()))
+
+
+def test_compact_item_stores_native_values():
+    item = encode_shipping_item(
+        "id", "Нова Пошта", ["Laptop"], "order", "created", datetime.now(timezone.utc), COMPACT_ITEM_FORMAT
+    )
+
+    assert item["item_format"] == COMPACT_ITEM_FORMAT
+    assert isinstance(item["due_at"], Decimal)
+    assert "due_date" not in item
+    assert item["product_ids"] == ["Laptop"]
+
+
+@pytest.mark.parametrize("item_format", [LEGACY_ITEM_FORMAT, COMPACT_ITEM_FORMAT])
+def test_projected_reads_return_requested_fields(drain_queue, item_format):
+    repository = ShippingRepository(item_format=item_format)
+    service = ShippingService(repository, ShippingPublisher())
+    shipping_id = service.create_shipping(
+        "Укр Пошта", ["Laptop"], "order_projection", datetime.now(timezone.utc) + timedelta(minutes=1)
+    )
+
+    assert repository.get_shipping(shipping_id, fields=["shipping_status"]) == {
+        "shipping_id": shipping_id,
+        "shipping_status": ShippingService.SHIPPING_IN_PROGRESS,
+    }
+    assert set(repository.get_shippings([shipping_id], fields=["due_at"])[shipping_id]) == {
+        "shipping_id", "due_at"
+    }
+    service.process_shipping(shipping_id)
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+
+
+@pytest.mark.parametrize("item_format", [LEGACY_ITEM_FORMAT, COMPACT_ITEM_FORMAT])
+def test_reads_return_the_same_shape_for_both_formats(repository, item_format):
+    repository.item_format = item_format
+    due_date = datetime(2030, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+    shipping_id = repository.create_shipping(
+        "Нова Пошта", ["Laptop", "Phone"], "order_shape", ShippingService.SHIPPING_CREATED, due_date
+    )
+
+    shipping = repository.get_shipping(shipping_id)
+    assert set(shipping) == {
+        "shipping_id", "shipping_type", "order_id", "product_ids", "shipping_status", "created_date", "due_date",
+        "due_at"
+    }
+    assert shipping["product_ids"] == ["Laptop", "Phone"]
+    assert shipping["due_date"] == due_date.isoformat()
+    assert repository.get_shippings([shipping_id])[shipping_id] == shipping
+    assert repository.get_shipping(shipping_id, fields=["due_date"]) == {
+        "shipping_id": shipping_id, "due_date": due_date.isoformat()
+    }
@@ -0,0 +1,118 @@
+import time
+import pytest
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from services import ShippingService
+from services.config import SHIPPING_TABLE_NAME, SHIPPING_QUEUE, SHIPPING_STATUS_INDEX
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def shipping_service(repository, publisher):
+    return ShippingService(repository, publisher)
+
+
+def test_order_to_shipment_flow_runs_in_memory(shipping_service):
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_id = shipping_service.create_shipping("Нова Пошта", ["Laptop"], "order_memory", due_date)
+    bulk_ids, errors = shipping_service.create_shippings([
+        {"shipping_type": "Укр Пошта", "product_ids": ["Phone"], "order_id": "order_memory", "due_date": due_date}
+        for _ in range(30)
+    ])
+
+    assert errors == {}
+    assert shipping_service.check_status(shipping_id) == ShippingService.SHIPPING_IN_PROGRESS
+    results = []
+    for _ in range(4):
+        results.extend(shipping_service.process_shipping_batch())
+    assert len(results) == 31
+    assert all(result["HTTPStatusCode"] == 200 for result in results)
+    assert shipping_service.check_status(bulk_ids[-1]) == ShippingService.SHIPPING_COMPLETED
+
+
+def test_memory_queue_redelivers_after_visibility_timeout(backend):
+    sqs = backend.client("sqs")
+    queue_url = sqs.get_queue_url(QueueName=SHIPPING_QUEUE)["QueueUrl"]
+    sqs.send_message(QueueUrl=queue_url, MessageBody="shipping_1")
+    first = sqs.receive_message(QueueUrl=queue_url, VisibilityTimeout=0.05)["Messages"][0]
+
+    assert "Messages" not in sqs.receive_message(QueueUrl=queue_url)
+    second = sqs.receive_message(QueueUrl=queue_url, WaitTimeSeconds=1)["Messages"][0]
+    assert second["Body"] == "shipping_1"
+    assert second["ReceiptHandle"] != first["ReceiptHandle"]
+    assert second["Attributes"]["ApproximateReceiveCount"] == "2"
+
+    sqs.delete_message_batch(QueueUrl=queue_url, Entries=[{"Id": "0", "ReceiptHandle": second["ReceiptHandle"]}])
+    time.sleep(0.1)
+    assert sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["All"])["Attributes"][
+        "ApproximateNumberOfMessagesNotVisible"] == "0"
+
+
+def test_memory_table_enforces_conditions(backend):
+    table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    table.put_item(Item={"shipping_id": "shipping_1", "shipping_status": "completed", "attempts": 1})
+    table.update_item(
+        Key={"shipping_id": "shipping_1"},
+        UpdateExpression="SET attempts = attempts + :one REMOVE missing",
+        ExpressionAttributeValues={":one": 1}
+    )
+
+    with pytest.raises(ClientError) as excinfo:
+        table.update_item(
+            Key={"shipping_id": "shipping_1"},
+            UpdateExpression="SET shipping_status = :failed",
+            ConditionExpression="NOT shipping_status IN (:completed, :failed)",
+            ExpressionAttributeValues={":failed": "failed", ":completed": "completed"}
+        )
+    assert excinfo.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    assert table.get_item(Key={"shipping_id": "shipping_1"})["Item"] == {
+        "shipping_id": "shipping_1", "shipping_status": "completed", "attempts": 2
+    }
+
+
+def test_memory_table_scans_segments_with_pagination(backend):
+    table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    for index in range(250):
+        table.put_item(Item={"shipping_id": "shipping_%d" % index})
+    seen = []
+    for segment in range(4):
+        params = {"Segment": segment, "TotalSegments": 4, "Limit": 40}
+        while True:
+            response = table.scan(**params)
+            seen.extend(item["shipping_id"] for item in response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    assert sorted(seen) == sorted("shipping_%d" % index for index in range(250))
+
+
+def test_memory_index_query_pages_in_sort_order(backend):
+    table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    for index in range(60):
+        table.put_item(Item={"shipping_id": "shipping_%d" % index, "shipping_status": "created", "due_at": index % 30})
+    table.delete_item(Key={"shipping_id": "shipping_10"})
+    table.update_item(
+        Key={"shipping_id": "shipping_11"}, UpdateExpression="SET shipping_status = :failed",
+        ExpressionAttributeValues={":failed": "failed"}
+    )
+
+    def query(forward):
+        params = {
+            "IndexName": SHIPPING_STATUS_INDEX, "Limit": 7, "ScanIndexForward": forward,
+            "KeyConditionExpression": Key("shipping_status").eq("created") & Key("due_at").between(5, 14),
+        }
+        found = []
+        while True:
+            response = table.query(**params)
+            found.extend((item["due_at"], item["shipping_id"]) for item in response["Items"])
+            if "LastEvaluatedKey" not in response:
+                return found
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    expected = sorted(
+        (index % 30, "shipping_%d" % index) for index in range(60)
+        if 5 <= index % 30 <= 14 and index not in (10, 11)
+    )
+    assert query(True) == expected
+    assert query(False) == expected[::-1]
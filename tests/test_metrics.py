@@ -0,0 +1,81 @@
+import threading
+import pytest
+from botocore.exceptions import ClientError
+from services import ShippingService
+from services.metrics import MetricsRegistry, Histogram, metrics
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def service(repository, publisher):
+    enabled = metrics.enabled
+    metrics.enabled = True
+    metrics.reset()
+    yield ShippingService(repository, publisher)
+    metrics.enabled = enabled
+    metrics.reset()
+
+
+def test_service_and_aws_calls_are_timed(service):
+    service.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_metrics", datetime.now(timezone.utc) + timedelta(minutes=1)
+    )
+
+    snapshot = metrics.snapshot()
+    assert snapshot["service.create_shipping"]["count"] == 1
+    assert snapshot["dynamodb.put_item"]["count"] == 1
+    assert snapshot["sqs.send_message"]["count"] == 1
+    assert snapshot["service.create_shipping"]["p99_ms"] >= snapshot["service.create_shipping"]["p50_ms"] > 0
+
+
+def test_errors_and_throttles_are_counted():
+    registry = MetricsRegistry()
+
+    def throttled(**params):
+        raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "Query")
+
+    with pytest.raises(ClientError):
+        registry.call("dynamodb.query", throttled, TableName="ShippingTable")
+    registry.call("dynamodb.get_item", lambda **params: {"ResponseMetadata": {"RetryAttempts": 2}})
+
+    snapshot = registry.snapshot()
+    assert snapshot["dynamodb.query"]["errors"] == 1
+    assert snapshot["dynamodb.query"]["throttles"] == 1
+    assert snapshot["dynamodb.get_item"]["retries"] == 2
+    assert snapshot["dynamodb.get_item"]["errors"] == 0
+
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry()
+    with registry.timer("order.place_order"):
+        pass
+
+    text = registry.prometheus()
+    assert "# TYPE shipping_operation_duration_seconds histogram" in text
+    assert 'shipping_operation_duration_seconds_bucket{operation="order.place_order",le="+Inf"} 1' in text
+    assert 'shipping_operation_duration_seconds_count{operation="order.place_order"} 1' in text
+    assert 'shipping_operation_errors_total{operation="order.place_order"} 0' in text
+
+
+def test_histogram_merges_observations_from_all_threads():
+    histogram = Histogram(max_shards=2)
+    threads = [
+        threading.Thread(target=lambda: [histogram.observe(0.002) for _ in range(100)]) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+        thread.join()
+
+    counts, total, _, _ = histogram.state()
+    assert total == 500
+    assert sum(counts) == 500
+    assert histogram.quantile(0.5) == 0.0025
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    assert registry.call("dynamodb.get_item", lambda **params: {"Item": {}}) == {"Item": {}}
+    with registry.timer("service.check_status"):
+        pass
+    registry.increment("dynamodb.get_item", "retries")
+    assert registry.snapshot() == {}
@@ -0,0 +1,137 @@
+import time
+import pytest
+from services import ShippingService
+from services.backends import MemoryBackend
+from services.config import SHIPPING_TABLE_NAME
+from services.outbox import OutboxRelay
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher, ShardedPublisher
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def repository(drain_queue):
+    return ShippingRepository()
+
+
+def received_ids(publisher, expected, timeout=5):
+    ids = []
+    deadline = time.monotonic() + timeout
+    while len(ids) < expected and time.monotonic() < deadline:
+        ids.extend(message["Body"] for message in publisher.receive_shippings(10, 1))
+    return ids
+
+
+def test_outbox_creation_writes_once_and_relays_message(mocker, repository):
+    publisher = ShippingPublisher()
+    relay = OutboxRelay(repository, publisher, linger=0.01)
+    service = ShippingService(repository, publisher, outbox=relay)
+    update = mocker.spy(repository, "update_shipping_status")
+
+    with relay:
+        shipping_id = service.create_shipping(
+            "Нова Пошта", ["Laptop"], "order_outbox", datetime.now(timezone.utc) + timedelta(minutes=1)
+        )
+    item = repository.get_shipping(shipping_id)
+
+    assert item["shipping_status"] == ShippingService.SHIPPING_IN_PROGRESS
+    assert "publish_pending" not in item
+    update.assert_not_called()
+    assert received_ids(publisher, 1) == [shipping_id]
+
+
+def test_outbox_recovers_unpublished_shipments(repository):
+    publisher = ShippingPublisher()
+    shipping_id = repository.create_shipping(
+        "Укр Пошта", ["Phone"], "order_outbox", ShippingService.SHIPPING_IN_PROGRESS,
+        datetime.now(timezone.utc) + timedelta(minutes=1), pending_publish=True
+    )
+    relay = OutboxRelay(repository, publisher)
+
+    assert relay.recover(grace_seconds=0) >= 1
+    relay.flush()
+    assert shipping_id in received_ids(publisher, relay.stats()["published"])
+
+
+def test_pending_publish_is_found_through_the_sparse_index(mocker):
+    repository = ShippingRepository()
+    repository._table = MemoryBackend().resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    pending_ids, _ = repository.create_shippings(
+        [("Нова Пошта", ["Laptop"], "order_outbox", due_date)] * 6, ShippingService.SHIPPING_IN_PROGRESS,
+        pending_publish=True
+    )
+    repository.create_shippings([("Нова Пошта", ["Laptop"], "order_outbox", due_date)] * 4,
+                                ShippingService.SHIPPING_CREATED)
+    repository.update_shipping_status(pending_ids[0], ShippingService.SHIPPING_COMPLETED)
+    scan = mocker.spy(repository.table, "scan")
+
+    found = list(repository.find_pending_publish(datetime.now(timezone.utc) + timedelta(seconds=1)))
+
+    assert sorted(item["shipping_id"] for item in found) == sorted(pending_ids[1:])
+    assert {item["shipping_type"] for item in found} == {"Нова Пошта"}
+    scan.assert_not_called()
+    assert list(repository.find_pending_publish(datetime.now(timezone.utc) - timedelta(minutes=1))) == []
+
+
+def test_outbox_publishes_to_the_carrier_queue():
+    backend = MemoryBackend()
+    repository = ShippingRepository()
+    repository._table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    publisher = ShardedPublisher(["Нова Пошта"], queue_name="OutboxShardQueue")
+    for carrier in publisher.publishers():
+        carrier._client = backend.client("sqs")
+    relay = OutboxRelay(repository, publisher)
+    service = ShippingService(repository, publisher, outbox=relay)
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+
+    enqueued_id = service.create_shipping("Нова Пошта", ["Laptop"], "order_outbox", due_date)
+    relay.flush()
+    recovered_id = repository.create_shipping(
+        "Нова Пошта", ["Phone"], "order_outbox", ShippingService.SHIPPING_IN_PROGRESS, due_date, pending_publish=True
+    )
+    repository.update_shipping_status(enqueued_id, ShippingService.SHIPPING_COMPLETED)
+    assert relay.recover(grace_seconds=0) == 1
+    relay.flush()
+
+    carrier_queue = publisher.for_carrier("Нова Пошта")
+    assert sorted(message["Body"] for message in carrier_queue.receive_shippings(10, 0)) == \
+        sorted([enqueued_id, recovered_id])
+    assert publisher.default.receive_shippings(10, 0) == []
+
+
+def test_published_shipments_are_not_recovered_after_a_restart(backend, publisher):
+    repository = ShippingRepository()
+    repository._table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    relay = OutboxRelay(repository, publisher)
+    service = ShippingService(repository, publisher, outbox=relay)
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    published_id = service.create_shipping("Нова Пошта", ["Laptop"], "order_outbox", due_date)
+    relay.flush()
+    unpublished_id = repository.create_shipping(
+        "Нова Пошта", ["Phone"], "order_outbox", ShippingService.SHIPPING_IN_PROGRESS, due_date, pending_publish=True
+    )
+
+    found = list(repository.find_pending_publish(datetime.now(timezone.utc) + timedelta(seconds=1)))
+
+    assert [item["shipping_id"] for item in found] == [unpublished_id]
+    assert "publish_pending" not in repository.get_shipping(published_id)
+    assert repository.clear_publish_pending([published_id]) == {}
+
+
+def test_outbox_retries_failed_publishes(mocker):
+    publisher = mocker.Mock()
+    publisher.send_new_shippings.side_effect = [({}, {"shipping_1": "Try again"}), ({"shipping_1": "message"}, {})]
+    repository = mocker.Mock()
+    repository.clear_publish_pending.return_value = {}
+    relay = OutboxRelay(repository, publisher, linger=0.01, retry_delay=0.01)
+    relay.start(recover=False)
+    relay.enqueue("shipping_1")
+    deadline = time.monotonic() + 5
+    while relay.stats()["published"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    relay.stop()
+
+    assert relay.stats()["published"] == 1
+    assert relay.stats()["publish_failed"] == 1
+    repository.clear_publish_pending.assert_called_once_with(["shipping_1"])
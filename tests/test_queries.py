@@ -0,0 +1,68 @@
+import types
+import uuid
+import pytest
+from botocore.exceptions import ClientError
+from services import ShippingService
+from services.backends import MemoryBackend
+from services.config import SHIPPING_TABLE_NAME
+from services.repository import ShippingRepository
+from services.schema import SHIPPING_INDEXES
+from services.publisher import ShippingPublisher
+from datetime import datetime, timedelta, timezone
+
+
+@pytest.fixture
+def shipping_service(drain_queue):
+    return ShippingService(ShippingRepository(), ShippingPublisher())
+
+
+def test_find_shippings_by_order_streams_pages(shipping_service):
+    order_id = str(uuid.uuid4())
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_ids, _ = shipping_service.create_shippings([
+        {"shipping_type": "Нова Пошта", "product_ids": ["Laptop"], "order_id": order_id, "due_date": due_date}
+        for _ in range(5)
+    ])
+    shippings = shipping_service.repository.find_shippings_by_order(order_id, fields=["shipping_status"], page_size=2)
+
+    assert isinstance(shippings, types.GeneratorType)
+    shippings = list(shippings)
+    assert sorted(shipping["shipping_id"] for shipping in shippings) == sorted(shipping_ids)
+    assert all(set(shipping) == {"shipping_id", "shipping_status"} for shipping in shippings)
+
+
+def test_find_shippings_by_status_filters_by_due_date(shipping_service):
+    now = datetime.now(timezone.utc)
+    soon = shipping_service.create_shipping("Укр Пошта", ["Phone"], "order_due", now + timedelta(minutes=2))
+    later = shipping_service.create_shipping("Укр Пошта", ["Phone"], "order_due", now + timedelta(days=30))
+    found = {
+        shipping["shipping_id"]
+        for shipping in shipping_service.repository.find_shippings_by_status(
+            ShippingService.SHIPPING_IN_PROGRESS, due_before=now + timedelta(minutes=5), fields=["due_at"]
+        )
+    }
+
+    assert soon in found
+    assert later not in found
+
+
+def test_memory_index_rejects_mistyped_key_attributes():
+    table = MemoryBackend().resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+
+    with pytest.raises(ClientError) as excinfo:
+        table.put_item(Item={"shipping_id": "shipping_1", "shipping_status": "created", "due_at": "tomorrow"})
+    assert excinfo.value.response["Error"]["Code"] == "ValidationException"
+
+
+def test_ensure_indexes_adds_missing_indexes():
+    backend = MemoryBackend(provision=False)
+    backend.dynamodb.create_table(
+        TableName=SHIPPING_TABLE_NAME,
+        KeySchema=[{"AttributeName": "shipping_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "shipping_id", "AttributeType": "S"}],
+    )
+    repository = ShippingRepository()
+    repository._table = backend.resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+
+    assert repository.ensure_indexes() == [index["IndexName"] for index in SHIPPING_INDEXES]
+    assert repository.ensure_indexes() == []
@@ -0,0 +1,111 @@
+import time
+from services import ShippingService
+from services.scheduler import ExpiryScheduler
+from datetime import datetime, timedelta, timezone
+
+
+def test_scheduler_expires_overdue_shipments_in_batches(repository, publisher):
+    scheduler = ExpiryScheduler(repository, batch_size=2)
+    service = ShippingService(repository, publisher, scheduler=scheduler)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    overdue, _ = service.create_shippings([
+        {"shipping_type": "Нова Пошта", "product_ids": ["Laptop"], "order_id": "order_expiry", "due_date": past}
+        for _ in range(5)
+    ], allow_past_due=True)
+    future_id = service.create_shipping(
+        "Укр Пошта", ["Phone"], "order_expiry", datetime.now(timezone.utc) + timedelta(minutes=5)
+    )
+
+    assert scheduler.pending() == 6
+    assert scheduler.lag() > 0
+    assert sorted(scheduler.expire_due()) == sorted(overdue)
+    assert all(service.check_status(shipping_id) == ShippingService.SHIPPING_FAILED for shipping_id in overdue)
+    assert service.check_status(future_id) == ShippingService.SHIPPING_IN_PROGRESS
+    stats = scheduler.stats()
+    assert stats["pending"] == 1
+    assert stats["expired"] == 5
+    assert stats["lag"] == 0
+
+
+def test_scheduler_never_overwrites_completed_shipments(repository, publisher):
+    scheduler = ExpiryScheduler(repository)
+    service = ShippingService(repository, publisher, scheduler=scheduler)
+    shipping_id = service.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_expiry", datetime.now(timezone.utc) - timedelta(seconds=1),
+        allow_past_due=True
+    )
+    repository.update_shipping_status(shipping_id, ShippingService.SHIPPING_COMPLETED)
+
+    assert scheduler.expire_due() == []
+    assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+    assert scheduler.stats()["skipped"] == 1
+
+
+def test_processed_shipments_are_untracked(repository, publisher):
+    scheduler = ExpiryScheduler(repository)
+    service = ShippingService(repository, publisher, scheduler=scheduler)
+    service.create_shipping("Нова Пошта", ["Laptop"], "order_expiry", datetime.now(timezone.utc) + timedelta(seconds=2))
+
+    assert scheduler.pending() == 1
+    assert len(service.process_shipping_batch()) == 1
+    assert scheduler.pending() == 0
+
+
+def test_scheduler_recovers_in_progress_shipments(repository):
+    due_date = datetime.now(timezone.utc) - timedelta(seconds=1)
+    shipping_id = repository.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_expiry", ShippingService.SHIPPING_IN_PROGRESS, due_date
+    )
+    repository.create_shipping("Нова Пошта", ["Laptop"], "order_expiry", ShippingService.SHIPPING_COMPLETED, due_date)
+    scheduler = ExpiryScheduler(repository, tick=0.05)
+
+    with scheduler:
+        assert scheduler.stats()["recovered"] == 1
+        deadline = time.monotonic() + 2
+        while scheduler.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert repository.get_shipping(shipping_id)["shipping_status"] == ShippingService.SHIPPING_FAILED
+
+
+def test_messages_are_delayed_until_near_the_due_date(mocker):
+    publisher = mocker.Mock()
+    repository = mocker.Mock()
+    repository.create_shipping.return_value = "shipping_1"
+    scheduler = ExpiryScheduler(repository, lead=5, clock=lambda: 1000.0)
+    service = ShippingService(repository, publisher, scheduler=scheduler)
+
+    service.create_shipping("Нова Пошта", ["Laptop"], "order_1", datetime.fromtimestamp(1065, tz=timezone.utc),
+                            allow_past_due=True)
+
+    publisher.send_new_shipping.assert_called_with("shipping_1", delay_seconds=60)
+    assert scheduler.processing_delay(datetime.fromtimestamp(5000, tz=timezone.utc)) == 900
+    assert scheduler.processing_delay(datetime.fromtimestamp(1002, tz=timezone.utc)) == 0
+
+
+def test_failed_expiry_batch_is_tracked_again_and_logged(repository, caplog):
+    due_date = datetime.now(timezone.utc) - timedelta(seconds=1)
+    shipping_id = repository.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_expiry", ShippingService.SHIPPING_IN_PROGRESS, due_date
+    )
+    update = repository.update_shipping_statuses
+    calls = {"count": 0}
+
+    def flaky_update(*args, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise RuntimeError("table unavailable")
+        return update(*args, **kwargs)
+
+    repository.update_shipping_statuses = flaky_update
+    scheduler = ExpiryScheduler(repository, tick=0.05)
+    scheduler.track(shipping_id, due_date)
+
+    with caplog.at_level("ERROR", logger="services.scheduler"), scheduler:
+        deadline = time.monotonic() + 2
+        while scheduler.stats()["expired"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert scheduler.stats()["expire_failed"] == 1
+    assert repository.get_shipping(shipping_id)["shipping_status"] == ShippingService.SHIPPING_FAILED
+    assert "table unavailable" in caplog.text
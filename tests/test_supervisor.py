@@ -0,0 +1,95 @@
+import os
+import signal
+import threading
+import time
+import pytest
+from services import ShippingService
+from services.config import SHIPPING_BACKEND
+from services.supervisor import WorkerSupervisor, build_service
+from datetime import datetime, timedelta, timezone
+
+FAST_WORKER = {"pollers": 1, "processors": 2, "wait_time": 1, "ack_linger": 0.1}
+
+
+class IdlePublisher:
+    def receive_shippings(self, *args):
+        time.sleep(0.05)
+        return []
+
+    def delete_shippings(self, receipt_handles):
+        return {}
+
+    def extend_visibility(self, receipt_handles, visibility_timeout):
+        return {}
+
+
+class IdleService:
+    publisher = IdlePublisher()
+
+
+def fail_first_start(marker, failure):
+    def factory():
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            failure()
+        return IdleService()
+    return factory
+
+
+@pytest.mark.skipif(SHIPPING_BACKEND == "memory", reason="worker processes cannot share the in-memory backend")
+def test_processes_share_the_queue_and_report_stats(drain_queue, wait_for):
+    service = build_service()
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_ids, _ = service.create_shippings([
+        {"shipping_type": "Нова Пошта", "product_ids": ["Laptop"], "order_id": "order_supervisor", "due_date": due_date}
+        for _ in range(20)
+    ])
+
+    with WorkerSupervisor(processes=2, worker_options=FAST_WORKER, stats_interval=0.1) as supervisor:
+        assert wait_for(lambda: supervisor.stats()["acknowledged"] >= 20, timeout=30)
+    stats = supervisor.stats()
+
+    assert stats["processed"] >= 20
+    assert stats["restarts"] == 0
+    assert [process["index"] for process in stats["processes"]] == [0, 1]
+    assert not any(process["alive"] for process in stats["processes"])
+    for shipping_id in shipping_ids:
+        assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+
+
+def test_crashed_worker_is_restarted(tmp_path, wait_for):
+    supervisor = WorkerSupervisor(
+        processes=1, service_factory=fail_first_start(str(tmp_path / "crashed"), lambda: os._exit(3)),
+        stats_interval=0.05, restart_delay=0.05
+    )
+
+    with supervisor:
+        assert wait_for(lambda: supervisor.stats()["restarts"] == 1 and supervisor.stats()["processes"][0]["alive"])
+        pid = supervisor.stats()["processes"][0]["pid"]
+        time.sleep(0.3)
+        assert supervisor.stats()["processes"][0]["pid"] == pid
+
+
+def test_hung_worker_is_killed_and_restarted(tmp_path, wait_for):
+    supervisor = WorkerSupervisor(
+        processes=1, service_factory=fail_first_start(str(tmp_path / "hung"), lambda: time.sleep(60)),
+        stats_interval=0.05, heartbeat_timeout=0.5, restart_delay=0.05
+    )
+
+    with supervisor:
+        assert wait_for(lambda: supervisor.stats()["restarts"] == 1)
+        assert wait_for(lambda: supervisor.stats()["processes"][0]["alive"])
+
+
+def test_sigterm_stops_workers_gracefully():
+    supervisor = WorkerSupervisor(processes=2, service_factory=IdleService, stats_interval=0.05)
+    timer = threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGTERM))
+    timer.start()
+
+    stats = supervisor.run()
+
+    timer.join()
+    assert stats["restarts"] == 0
+    assert len(stats["processes"]) == 2
+    assert not any(process["alive"] for process in stats["processes"])
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
@@ -0,0 +1,147 @@
+import pytest
+from botocore.exceptions import ClientError
+from services.backends import MemoryBackend
+from services.config import SHIPPING_TABLE_NAME, INVENTORY_TABLE_NAME
+from services.inventory import InventoryRepository
+from services.repository import ShippingRepository
+from services.throttle import TokenBucket, RateLimiter, budget_for, limiter
+
+
+def throttling_error():
+    return ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}}, "PutItem")
+
+
+def test_operations_map_to_their_own_budgets():
+    assert budget_for("dynamodb.query") == "read"
+    assert budget_for("dynamodb.batch_get_item") == "read"
+    assert budget_for("dynamodb.update_item") == "write"
+    assert budget_for("dynamodb.transact_write_items") == "write"
+    assert budget_for("sqs.send_message_batch") == "send"
+    assert budget_for("sqs.receive_message") == "receive"
+    assert budget_for("sqs.get_queue_attributes") == "receive"
+    assert budget_for("sqs.delete_message_batch") == "ack"
+    assert budget_for("sqs.change_message_visibility_batch") == "ack"
+
+
+def test_throttled_receives_do_not_slow_down_publishing():
+    limiter.throttled("sqs.receive_message")
+
+    stats = limiter.stats()
+    assert stats["receive"]["decreases"] == 1
+    assert stats["send"]["decreases"] == 0
+
+
+def test_bucket_paces_requests_at_the_configured_rate(clock):
+    bucket = TokenBucket(rate=10, burst_seconds=0.5, clock=clock, sleep=clock.sleep)
+
+    for _ in range(15):
+        bucket.acquire()
+
+    assert clock.now == pytest.approx(1.0)
+    assert bucket.stats()["waits"] == 10
+
+
+def test_throttles_decrease_multiplicatively_and_successes_recover_additively(clock):
+    bucket = TokenBucket(rate=100, increase=10, decrease=0.5, cooldown=1.0, clock=clock, sleep=clock.sleep)
+
+    bucket.throttled()
+    bucket.throttled()
+    assert bucket.rate == 50
+    clock.now += 2
+    bucket.succeeded()
+    assert bucket.rate == 70
+    clock.now += 10
+    bucket.succeeded()
+    assert bucket.rate == 100
+    assert bucket.stats()["decreases"] == 1
+
+
+def test_unlimited_bucket_engages_at_the_observed_rate(clock):
+    bucket = TokenBucket(rate=0, decrease=0.5, clock=clock, sleep=clock.sleep)
+    for _ in range(40):
+        bucket.acquire()
+        clock.now += 0.025
+
+    bucket.throttled()
+
+    assert bucket.rate == pytest.approx(20)
+    assert bucket.max_rate == 0
+
+
+def test_limiter_retries_throttled_calls_with_jittered_backoff(clock):
+    bucket = TokenBucket(rate=0, clock=clock, sleep=clock.sleep)
+    limiter = RateLimiter({"read": bucket, "write": bucket, "send": bucket}, max_attempts=3,
+                          base_delay=0.1, sleep=clock.sleep, jitter=lambda low, high: high / 2)
+    responses = [throttling_error(), throttling_error(), {"Attributes": {}}]
+
+    def put_item(**params):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call("dynamodb.put_item", put_item, Item={}) == {"Attributes": {}}
+    assert clock.sleeps == pytest.approx([0.1, 0.2, 0.8])
+    assert bucket.rate == pytest.approx(1 + 10 * 1.1)
+    assert bucket.stats()["throttles"] == 2
+    assert bucket.stats()["decreases"] == 1
+
+
+def test_limiter_gives_up_after_max_attempts_and_does_not_retry_other_errors():
+    limiter = RateLimiter({"read": TokenBucket(), "write": TokenBucket(), "send": TokenBucket()},
+                          max_attempts=2, sleep=lambda seconds: None)
+    calls = []
+
+    def throttled(**params):
+        calls.append(params)
+        raise throttling_error()
+
+    def invalid(**params):
+        calls.append(params)
+        raise ClientError({"Error": {"Code": "ValidationException", "Message": "Bad"}}, "PutItem")
+
+    with pytest.raises(ClientError):
+        limiter.call("dynamodb.put_item", throttled)
+    with pytest.raises(ClientError):
+        limiter.call("dynamodb.put_item", invalid)
+    assert len(calls) == 3
+
+
+def test_limiter_leaves_transient_errors_to_botocore(clock):
+    bucket = TokenBucket(rate=100, clock=clock, sleep=clock.sleep)
+    limiter = RateLimiter({"read": bucket, "write": bucket, "send": bucket}, max_attempts=3,
+                          sleep=clock.sleep, jitter=lambda low, high: high)
+    calls = []
+
+    def update_item(**params):
+        calls.append(params)
+        raise ClientError({"Error": {"Code": "InternalServerError", "Message": "Oops"},
+                           "ResponseMetadata": {"HTTPStatusCode": 500}}, "UpdateItem")
+
+    with pytest.raises(ClientError):
+        limiter.call("dynamodb.update_item", update_item)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+    assert bucket.stats()["throttles"] == 0
+
+
+def test_repository_calls_draw_from_the_shared_budgets():
+    repository = ShippingRepository()
+    repository._table = MemoryBackend().resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+
+    repository.get_shippings(["missing_%d" % index for index in range(5)])
+    repository.get_shipping("missing")
+
+    stats = limiter.stats()
+    assert stats["read"]["acquired"] == 2
+    assert stats["write"]["acquired"] == 0
+
+
+def test_inventory_writes_draw_from_the_write_budget():
+    inventory = InventoryRepository(cache=None)
+    inventory._table = MemoryBackend().resource("dynamodb").Table(INVENTORY_TABLE_NAME)
+
+    inventory.set_stock("Laptop", 5)
+    assert inventory.restock("Laptop", 2) == 7
+
+    assert limiter.stats()["write"]["acquired"] == 2
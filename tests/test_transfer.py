@@ -0,0 +1,108 @@
+import gzip
+import json
+import os
+import pytest
+from services import ShippingService
+from services.backends import MemoryBackend
+from services.codec import COMPACT_ITEM_FORMAT
+from services.config import SHIPPING_TABLE_NAME
+from services.repository import ShippingRepository
+from services.transfer import export_shippings, import_shippings, ImportCheckpoint, MANIFEST_NAME
+from datetime import datetime, timedelta, timezone
+
+
+def memory_repository(item_format=1):
+    repository = ShippingRepository(item_format=item_format)
+    repository._table = MemoryBackend().resource("dynamodb").Table(SHIPPING_TABLE_NAME)
+    return repository
+
+
+@pytest.fixture
+def source():
+    repository = memory_repository()
+    due_date = datetime.now(timezone.utc) + timedelta(days=1)
+    repository.create_shippings([("Нова Пошта", ["Laptop", "Phone"], "order_export", due_date)] * 40,
+                                ShippingService.SHIPPING_IN_PROGRESS)
+    compact = memory_repository(COMPACT_ITEM_FORMAT)
+    compact._table = repository.table
+    compact.create_shippings([("Укр Пошта", ["Phone"], "order_export", due_date)] * 17, ShippingService.SHIPPING_CREATED)
+    return repository
+
+
+def all_items(repository):
+    return sorted(repository.scan_shippings(), key=lambda item: item["shipping_id"])
+
+
+def test_export_writes_segmented_gzip_shards(source, tmp_path):
+    report = export_shippings(source, str(tmp_path), segments=3, shard_rows=10)
+
+    with open(os.path.join(str(tmp_path), MANIFEST_NAME), encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    assert report["rows"] == manifest["rows"] == 57
+    assert report["rows_per_second"] > 0
+    assert {shard["segment"] for shard in manifest["shards"]} == {0, 1, 2}
+    assert all(shard["rows"] <= 10 for shard in manifest["shards"])
+    with gzip.open(os.path.join(str(tmp_path), manifest["shards"][0]["name"]), "rt", encoding="utf-8") as shard:
+        assert "shipping_id" in json.loads(shard.readline())["Item"]
+
+
+def test_import_restores_exported_items(source, tmp_path):
+    export_shippings(source, str(tmp_path), segments=4, shard_rows=25)
+    target = memory_repository()
+
+    report = import_shippings(target, str(tmp_path), workers=2)
+
+    assert report["rows"] == 57
+    assert report["failed"] == []
+    assert all_items(target) == all_items(source)
+
+
+def test_import_resumes_from_checkpoint(source, tmp_path, mocker):
+    export_shippings(source, str(tmp_path), segments=1, shard_rows=100)
+    target = memory_repository()
+    checkpoint_path = os.path.join(str(tmp_path), "checkpoint.json")
+    put_shippings = target.put_shippings
+    writes = {"count": 0}
+
+    def interrupted_put(items):
+        writes["count"] += 1
+        if writes["count"] == 2:
+            raise RuntimeError("connection lost")
+        return put_shippings(items)
+
+    mocker.patch.object(target, "put_shippings", side_effect=interrupted_put)
+    with pytest.raises(RuntimeError):
+        import_shippings(target, str(tmp_path), checkpoint_path=checkpoint_path, checkpoint_rows=25)
+    assert ImportCheckpoint(checkpoint_path).offset("shipping-0000-0000.ndjson.gz") == 25
+
+    report = import_shippings(target, str(tmp_path), checkpoint_path=checkpoint_path, checkpoint_rows=25)
+    assert report["rows"] == 57 - 25
+    assert all_items(target) == all_items(source)
+    assert import_shippings(target, str(tmp_path), checkpoint_path=checkpoint_path)["skipped_shards"] == 1
+
+
+def test_import_does_not_checkpoint_past_failed_rows(source, tmp_path, mocker):
+    export_shippings(source, str(tmp_path), segments=1, shard_rows=100)
+    target = memory_repository()
+    checkpoint_path = os.path.join(str(tmp_path), "checkpoint.json")
+    put_shippings = target.put_shippings
+    writes = {"count": 0}
+
+    def partially_failed_put(items):
+        writes["count"] += 1
+        unprocessed = put_shippings(items[1:] if writes["count"] == 2 else items)
+        return unprocessed | {items[0]["shipping_id"]} if writes["count"] == 2 else unprocessed
+
+    mocker.patch.object(target, "put_shippings", side_effect=partially_failed_put)
+    report = import_shippings(target, str(tmp_path), checkpoint_path=checkpoint_path, checkpoint_rows=25)
+
+    assert len(report["failed"]) == 1
+    checkpoint = ImportCheckpoint(checkpoint_path)
+    assert not checkpoint.is_done("shipping-0000-0000.ndjson.gz")
+    assert checkpoint.offset("shipping-0000-0000.ndjson.gz") == 25
+
+    mocker.stopall()
+    report = import_shippings(target, str(tmp_path), checkpoint_path=checkpoint_path)
+    assert report["failed"] == []
+    assert all_items(target) == all_items(source)
+    assert ImportCheckpoint(checkpoint_path).is_done("shipping-0000-0000.ndjson.gz")
@@ -0,0 +1,101 @@
+import time
+import pytest
+from services import ShippingService
+from services.repository import ShippingRepository
+from services.publisher import ShippingPublisher
+from services.worker import ShippingWorker
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+
+@pytest.fixture
+def shipping_service():
+    publisher = ShippingPublisher(queue_name="WorkerQueue-%s" % uuid4().hex)
+    yield ShippingService(ShippingRepository(), publisher)
+    publisher.client.delete_queue(QueueUrl=publisher.queue_url)
+
+
+def test_worker_processes_and_acknowledges_messages(shipping_service, wait_for):
+    due_date = datetime.now(timezone.utc) + timedelta(minutes=1)
+    shipping_ids, _ = shipping_service.create_shippings([
+        {"shipping_type": "Нова Пошта", "product_ids": ["Laptop"], "order_id": "order_worker", "due_date": due_date}
+        for _ in range(12)
+    ])
+
+    with ShippingWorker(shipping_service, pollers=2, processors=4, wait_time=1, ack_linger=0.1) as worker:
+        assert wait_for(lambda: worker.stats()["acknowledged"] >= 12)
+    stats = worker.stats()
+
+    assert stats["processed"] == 12
+    assert stats["in_flight"] == 0
+    assert shipping_service.publisher.receive_shippings(10, 0) == []
+    for shipping_id in shipping_ids:
+        assert shipping_service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+
+
+def test_worker_keeps_failed_messages_and_extends_slow_ones(mocker, wait_for):
+    service = mocker.Mock()
+    publisher = service.publisher
+    messages = [{"Body": "slow", "ReceiptHandle": "receipt_slow"}, {"Body": "broken", "ReceiptHandle": "receipt_broken"}]
+    publisher.receive_shippings.side_effect = lambda *args: [messages.pop()] if messages else []
+    publisher.delete_shippings.return_value = {}
+    publisher.extend_visibility.return_value = {}
+
+    def process_shipping(shipping_id):
+        if shipping_id == "broken":
+            raise RuntimeError("boom")
+        time.sleep(1.5)
+
+    service.process_shipping.side_effect = process_shipping
+    worker = ShippingWorker(service, pollers=1, processors=2, visibility_timeout=1, ack_linger=0.1)
+    worker.start()
+    assert wait_for(lambda: worker.stats()["processed"] == 1)
+    worker.stop()
+    stats = worker.stats()
+
+    assert stats["failed"] == 1
+    assert stats["extended"] >= 1
+    publisher.delete_shippings.assert_called_once_with(["receipt_slow"])
+
+
+def test_worker_skips_messages_redelivered_while_in_flight(mocker, wait_for):
+    service = mocker.Mock()
+    publisher = service.publisher
+    batches = [[{"Body": "shipping_1", "MessageId": "message_1", "ReceiptHandle": "receipt_1"}],
+               [{"Body": "shipping_1", "MessageId": "message_1", "ReceiptHandle": "receipt_2"}]]
+    publisher.receive_shippings.side_effect = lambda *args: batches.pop(0) if batches else []
+    publisher.delete_shippings.return_value = {}
+    service.process_shipping.side_effect = lambda shipping_id: time.sleep(0.5)
+
+    with ShippingWorker(service, pollers=1, processors=2, ack_linger=0.1) as worker:
+        assert wait_for(lambda: worker.stats()["acknowledged"] == 1)
+    stats = worker.stats()
+
+    assert stats["received"] == 2
+    assert stats["processed"] == 1
+    assert stats["duplicates"] == 1
+    assert stats["in_flight"] == 0
+    service.process_shipping.assert_called_once_with("shipping_1")
+    publisher.delete_shippings.assert_called_once_with(["receipt_2"])
+
+
+def test_worker_does_not_delete_a_redelivered_message_whose_first_copy_fails(mocker, wait_for):
+    service = mocker.Mock()
+    publisher = service.publisher
+    batches = [[{"Body": "shipping_1", "MessageId": "message_1", "ReceiptHandle": "receipt_1"}],
+               [{"Body": "shipping_1", "MessageId": "message_1", "ReceiptHandle": "receipt_2"}]]
+    publisher.receive_shippings.side_effect = lambda *args: batches.pop(0) if batches else []
+
+    def process_shipping(shipping_id):
+        time.sleep(0.3)
+        raise RuntimeError("table unavailable")
+
+    service.process_shipping.side_effect = process_shipping
+
+    with ShippingWorker(service, pollers=1, processors=2, ack_linger=0.1) as worker:
+        assert wait_for(lambda: worker.stats()["failed"] == 1)
+    stats = worker.stats()
+
+    assert stats["duplicates"] == 1
+    assert stats["in_flight"] == 0
+    publisher.delete_shippings.assert_not_called()
@@ -0,0 +1,135 @@
+import time
+from services import ShippingService
+from services.writebuffer import WriteBehindBuffer
+from datetime import datetime, timedelta, timezone
+
+
+def stored_status(repository, shipping_id):
+    return repository.table.get_item(Key={"shipping_id": shipping_id})["Item"]["shipping_status"]
+
+
+def create(repository):
+    return repository.create_shipping(
+        "Нова Пошта", ["Laptop"], "order_buffer", ShippingService.SHIPPING_CREATED,
+        datetime.now(timezone.utc) + timedelta(minutes=1)
+    )
+
+
+def test_status_changes_are_coalesced_and_readable_before_flush(repository, mocker):
+    shipping_id = create(repository)
+    update_item = mocker.spy(repository.table, "update_item")
+
+    with repository.write_behind(max_pending=100, linger=60) as buffer:
+        repository.update_shipping_status(shipping_id, ShippingService.SHIPPING_IN_PROGRESS)
+        repository.update_shipping_status(shipping_id, ShippingService.SHIPPING_COMPLETED)
+
+        assert repository.get_shipping(shipping_id)["shipping_status"] == ShippingService.SHIPPING_COMPLETED
+        assert repository.get_shippings([shipping_id], fields=["shipping_status"])[shipping_id] == {
+            "shipping_id": shipping_id, "shipping_status": ShippingService.SHIPPING_COMPLETED
+        }
+        assert stored_status(repository, shipping_id) == ShippingService.SHIPPING_CREATED
+
+    assert update_item.call_count == 1
+    assert stored_status(repository, shipping_id) == ShippingService.SHIPPING_COMPLETED
+    stats = buffer.stats()
+    assert stats["puts"] == 2
+    assert stats["written"] == 1
+    assert stats["coalescing_ratio"] == 0.5
+    assert stats["flush_max_ms"] > 0
+
+
+def test_buffer_flushes_on_size_and_linger(repository):
+    size_ids = [create(repository) for _ in range(3)]
+    with repository.write_behind(max_pending=3, linger=60) as buffer:
+        repository.update_shipping_statuses({shipping_id: ShippingService.SHIPPING_FAILED for shipping_id in size_ids})
+        deadline = time.monotonic() + 2
+        while buffer.stats()["written"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert all(stored_status(repository, shipping_id) == ShippingService.SHIPPING_FAILED for shipping_id in size_ids)
+
+    linger_id = create(repository)
+    with repository.write_behind(max_pending=100, linger=0.02) as buffer:
+        repository.update_shipping_status(linger_id, ShippingService.SHIPPING_IN_PROGRESS)
+        deadline = time.monotonic() + 2
+        while buffer.stats()["written"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stored_status(repository, linger_id) == ShippingService.SHIPPING_IN_PROGRESS
+
+
+def test_conditional_updates_flush_pending_writes_first(repository):
+    shipping_id = create(repository)
+    with repository.write_behind(linger=60):
+        repository.update_shipping_status(shipping_id, ShippingService.SHIPPING_IN_PROGRESS)
+        _, errors = repository.update_shipping_statuses(
+            {shipping_id: ShippingService.SHIPPING_FAILED}, expected_status=ShippingService.SHIPPING_IN_PROGRESS
+        )
+
+    assert errors == {}
+    assert stored_status(repository, shipping_id) == ShippingService.SHIPPING_FAILED
+
+
+def test_conditional_updates_flush_only_their_own_key(repository):
+    shipping_id, other_id = create(repository), create(repository)
+    with repository.write_behind(linger=60) as buffer:
+        repository.update_shipping_status(shipping_id, ShippingService.SHIPPING_IN_PROGRESS)
+        repository.update_shipping_status(other_id, ShippingService.SHIPPING_IN_PROGRESS)
+        repository.update_shipping_status(
+            shipping_id, ShippingService.SHIPPING_COMPLETED, expected_status=ShippingService.SHIPPING_IN_PROGRESS
+        )
+
+        assert stored_status(repository, shipping_id) == ShippingService.SHIPPING_COMPLETED
+        assert stored_status(repository, other_id) == ShippingService.SHIPPING_CREATED
+        assert buffer.get(other_id) == ShippingService.SHIPPING_IN_PROGRESS
+
+    assert stored_status(repository, other_id) == ShippingService.SHIPPING_IN_PROGRESS
+
+
+def test_failed_writes_are_retried_on_next_flush(mocker):
+    writer = mocker.Mock(side_effect=[({}, {"shipping_1": RuntimeError("throttled")}), ({"shipping_1": {}}, {})])
+    buffer = WriteBehindBuffer(writer, max_pending=10, linger=60)
+    buffer.put("shipping_1", ShippingService.SHIPPING_COMPLETED)
+
+    assert "shipping_1" in buffer.flush()
+    assert buffer.get("shipping_1") == ShippingService.SHIPPING_COMPLETED
+    assert buffer.flush() == {}
+    assert buffer.stats()["failed"] == 1
+    assert buffer.stats()["pending"] == 0
+
+
+def test_writes_that_keep_failing_are_dead_lettered(mocker):
+    error = RuntimeError("throttled")
+    writer = mocker.Mock(return_value=({}, {"shipping_1": error}))
+    buffer = WriteBehindBuffer(writer, max_pending=10, linger=60, max_attempts=2)
+    buffer.put("shipping_1", ShippingService.SHIPPING_COMPLETED)
+
+    assert "shipping_1" in buffer.flush()
+    assert "shipping_1" in buffer.flush()
+    assert buffer.flush() == {}
+    assert writer.call_count == 2
+    assert buffer.stats()["dead_letters"] == 1
+    assert buffer.dead_letters() == {"shipping_1": (ShippingService.SHIPPING_COMPLETED, error)}
+    assert buffer.dead_letters() == {}
+
+
+def test_stop_surfaces_failed_writes_instead_of_requeueing(mocker):
+    writer = mocker.Mock(return_value=({}, {"shipping_1": RuntimeError("throttled")}))
+    buffer = WriteBehindBuffer(writer, max_pending=10, linger=60)
+    buffer.start()
+    buffer.put("shipping_1", ShippingService.SHIPPING_COMPLETED)
+
+    assert "shipping_1" in buffer.stop()
+    assert buffer.stats()["pending"] == 0
+    assert "shipping_1" in buffer.dead_letters()
+
+
+def test_service_runs_with_write_behind(repository, mocker):
+    service = ShippingService(repository, mocker.Mock())
+    with repository.write_behind(linger=60):
+        shipping_id = service.create_shipping(
+            "Нова Пошта", ["Laptop"], "order_buffer", datetime.now(timezone.utc) + timedelta(minutes=1)
+        )
+        assert service.check_status(shipping_id) == ShippingService.SHIPPING_IN_PROGRESS
+        service.process_shipping(shipping_id)
+        assert service.check_status(shipping_id) == ShippingService.SHIPPING_COMPLETED
+
+    assert stored_status(repository, shipping_id) == ShippingService.SHIPPING_COMPLETED